@@ -0,0 +1,12 @@
+// PyObject *(PyObject *self, PyObject *args, PyObject *kwargs)
+//   -> PyObject_Call(handler, args, kwargs)
+    .text
+handler:
+    ldr x0, handler_address
+    ldr x3, PyObject_Call_address
+    br x3
+    .p2align 3
+PyObject_Call_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+handler_address:
+    .quad 0xaaaaaaaaaaaaaaaa
@@ -0,0 +1,31 @@
+// void (void *rw, void *rx, size_t size)
+// Makes instructions written through the rw view of a dual mapped page
+// visible to instruction fetches through its rx view.
+    .text
+clear_cache:
+    mrs x3, ctr_el0
+    mov x4, #4
+    ubfx x5, x3, #16, #4
+    lsl x5, x4, x5              // data cache line size
+    and x6, x3, #0xf
+    lsl x6, x4, x6              // instruction cache line size
+    add x7, x0, x2
+    sub x8, x5, #1
+    bic x8, x0, x8
+1:
+    dc cvau, x8
+    add x8, x8, x5
+    cmp x8, x7
+    b.lo 1b
+    dsb ish
+    add x7, x1, x2
+    sub x8, x6, #1
+    bic x8, x1, x8
+2:
+    ic ivau, x8
+    add x8, x8, x6
+    cmp x8, x7
+    b.lo 2b
+    dsb ish
+    isb
+    ret
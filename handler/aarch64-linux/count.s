@@ -0,0 +1,20 @@
+// PyObject *(PyObject *self, ...)
+//   -> ++counter->calls, ml_meth(m_self, ...)
+    .text
+handler:
+    ldr x16, counter_address
+1:
+    ldxr x17, [x16]
+    add x17, x17, #1
+    stxr w9, x17, [x16]
+    cbnz w9, 1b
+    ldr x0, m_self_address
+    ldr x16, ml_meth_address
+    br x16
+    .p2align 3
+ml_meth_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+m_self_address:
+    .quad 0xaaaaaaaaaaaaaaaa
+counter_address:
+    .quad 0xcccccccccccccccc
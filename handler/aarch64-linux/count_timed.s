@@ -0,0 +1,38 @@
+// PyObject *(PyObject *self, ...)
+//   -> start = cntvct_el0, result = ml_meth(m_self, ...),
+//      ++counter->calls, counter->ticks += cntvct_el0 - start, result
+    .text
+handler:
+    stp x29, x30, [sp, #-32]!
+    mov x29, sp
+    str x19, [sp, #16]
+    isb
+    mrs x19, cntvct_el0
+    ldr x0, m_self_address
+    ldr x16, ml_meth_address
+    blr x16
+    isb
+    mrs x9, cntvct_el0
+    sub x9, x9, x19
+    ldr x16, counter_address
+1:
+    ldxr x17, [x16]
+    add x17, x17, #1
+    stxr w10, x17, [x16]
+    cbnz w10, 1b
+    add x16, x16, #8
+2:
+    ldxr x17, [x16]
+    add x17, x17, x9
+    stxr w10, x17, [x16]
+    cbnz w10, 2b
+    ldr x19, [sp, #16]
+    ldp x29, x30, [sp], #32
+    ret
+    .p2align 3
+ml_meth_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+m_self_address:
+    .quad 0xaaaaaaaaaaaaaaaa
+counter_address:
+    .quad 0xcccccccccccccccc
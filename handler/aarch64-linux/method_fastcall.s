@@ -0,0 +1,39 @@
+// PyObject *(PyObject *self, PyObject *const *args, Py_ssize_t nargs)
+//   -> vectorcall(handler, [self, *args], nargs + 1, kwnames)
+    .text
+handler:
+    mov x3, xzr
+    stp x29, x30, [sp, #-16]!
+    mov x29, sp
+    mov x4, x2
+    cbz x3, 1f
+    ldr x5, [x3, #16]
+    add x4, x4, x5
+1:
+    add x5, x4, #2
+    and x5, x5, #-2
+    lsl x5, x5, #3
+    sub sp, sp, x5
+    str x0, [sp]
+    mov x6, xzr
+2:
+    cmp x6, x4
+    b.hs 3f
+    ldr x7, [x1, x6, lsl #3]
+    add x6, x6, #1
+    str x7, [sp, x6, lsl #3]
+    b 2b
+3:
+    ldr x0, handler_address
+    mov x1, sp
+    add x2, x2, #1
+    ldr x16, PyObject_Vectorcall_address
+    blr x16
+    mov sp, x29
+    ldp x29, x30, [sp], #16
+    ret
+    .p2align 3
+PyObject_Vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+handler_address:
+    .quad 0xaaaaaaaaaaaaaaaa
@@ -0,0 +1,20 @@
+// PyObject *(PyObject *self, PyObject *arg)
+//   -> vectorcall(handler, [self, arg], 2, NULL)
+    .text
+handler:
+    stp x29, x30, [sp, #-32]!
+    mov x29, sp
+    stp x0, x1, [sp, #16]
+    add x1, sp, #16
+    ldr x0, handler_address
+    mov x2, #2
+    mov x3, xzr
+    ldr x16, PyObject_Vectorcall_address
+    blr x16
+    ldp x29, x30, [sp], #32
+    ret
+    .p2align 3
+PyObject_Vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+handler_address:
+    .quad 0xaaaaaaaaaaaaaaaa
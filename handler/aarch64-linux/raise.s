@@ -0,0 +1,20 @@
+// PyObject *(PyObject *self, ...)
+//   -> PyErr_SetObject(exception_type, args), NULL
+    .text
+handler:
+    stp x29, x30, [sp, #-16]!
+    mov x29, sp
+    ldr x0, exception_type_address
+    ldr x1, args_address
+    ldr x16, PyErr_SetObject_address
+    blr x16
+    mov x0, xzr
+    ldp x29, x30, [sp], #16
+    ret
+    .p2align 3
+PyErr_SetObject_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+exception_type_address:
+    .quad 0xaaaaaaaaaaaaaaaa
+args_address:
+    .quad 0xcccccccccccccccc
@@ -0,0 +1,12 @@
+// PyObject *(PyObject *self, ...)
+//   -> ml_meth(m_self, ...)
+    .text
+handler:
+    ldr x0, m_self_address
+    ldr x16, ml_meth_address
+    br x16
+    .p2align 3
+ml_meth_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+m_self_address:
+    .quad 0xaaaaaaaaaaaaaaaa
@@ -0,0 +1,17 @@
+// PyObject *(PyObject *self, ...)
+//   -> Py_IncRef(value), value
+    .text
+handler:
+    stp x29, x30, [sp, #-16]!
+    mov x29, sp
+    ldr x0, value_address
+    ldr x16, Py_IncRef_address
+    blr x16
+    ldr x0, value_address
+    ldp x29, x30, [sp], #16
+    ret
+    .p2align 3
+Py_IncRef_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+value_address:
+    .quad 0xaaaaaaaaaaaaaaaa
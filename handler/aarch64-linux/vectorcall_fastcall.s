@@ -0,0 +1,13 @@
+// PyObject *(PyObject *self, PyObject *const *args, Py_ssize_t nargs)
+//   -> vectorcall(handler, args, nargs, NULL)
+    .text
+handler:
+    ldr x0, handler_address
+    mov x3, xzr
+    ldr x16, vectorcall_address
+    br x16
+    .p2align 3
+vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+handler_address:
+    .quad 0xaaaaaaaaaaaaaaaa
@@ -0,0 +1,12 @@
+// PyObject *(PyObject *self, PyObject *const *args, Py_ssize_t nargs, PyObject *kwnames)
+//   -> vectorcall(handler, args, nargs, kwnames)
+    .text
+handler:
+    ldr x0, handler_address
+    ldr x16, vectorcall_address
+    br x16
+    .p2align 3
+vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+handler_address:
+    .quad 0xaaaaaaaaaaaaaaaa
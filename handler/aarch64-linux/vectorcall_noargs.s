@@ -0,0 +1,15 @@
+// PyObject *(PyObject *self, PyObject *unused)
+//   -> vectorcall(handler, NULL, 0, NULL)
+    .text
+handler:
+    ldr x0, handler_address
+    mov x1, xzr
+    mov x2, xzr
+    mov x3, xzr
+    ldr x16, vectorcall_address
+    br x16
+    .p2align 3
+vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+handler_address:
+    .quad 0xaaaaaaaaaaaaaaaa
@@ -0,0 +1,26 @@
+// PyObject *(PyObject *self, PyObject *args, void *wrapped, PyObject *kwds)
+//   -> vectorcall(handler, [self, args, kwds or None], 3, NULL)
+    .text
+handler:
+    stp x29, x30, [sp, #-48]!
+    mov x29, sp
+    cbnz x3, 1f
+    ldr x3, none_address
+1:
+    stp x0, x1, [sp, #16]
+    str x3, [sp, #32]
+    add x1, sp, #16
+    ldr x0, handler_address
+    mov x2, #3
+    mov x3, xzr
+    ldr x16, PyObject_Vectorcall_address
+    blr x16
+    ldp x29, x30, [sp], #48
+    ret
+    .p2align 3
+PyObject_Vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+handler_address:
+    .quad 0xaaaaaaaaaaaaaaaa
+none_address:
+    .quad 0xcccccccccccccccc
@@ -0,0 +1,37 @@
+# PyObject *(PyObject *self, ...)
+#   -> start = rdtsc(), result = ml_meth(m_self, ...),
+#      ++counter->calls, counter->ticks += rdtsc() - start, result
+    .intel_syntax noprefix
+    .text
+handler:
+    push rbx
+    push r12
+    sub rsp, 8
+    mov r12, rdx
+    rdtsc
+    shl rdx, 32
+    or rax, rdx
+    mov rbx, rax
+    mov rdx, r12
+    mov rdi, qword ptr [rip + m_self_address]
+    call qword ptr [rip + ml_meth_address]
+    mov r12, rax
+    rdtsc
+    shl rdx, 32
+    or rax, rdx
+    sub rax, rbx
+    mov rcx, qword ptr [rip + counter_address]
+    lock inc qword ptr [rcx]
+    lock add qword ptr [rcx + 8], rax
+    mov rax, r12
+    add rsp, 8
+    pop r12
+    pop rbx
+    ret
+    .p2align 3
+ml_meth_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+m_self_address:
+    .quad 0xaaaaaaaaaaaaaaaa
+counter_address:
+    .quad 0xcccccccccccccccc
@@ -0,0 +1,31 @@
+# PyObject *(PyObject *callable, PyObject *const *args, size_t nargsf,
+#            PyObject *kwnames)
+#   -> PyInterpreterState_Get() == interpreter
+#      ? the handler trampoline that follows
+#      : vectorcall(callable, args, nargsf, kwnames)
+    .intel_syntax noprefix
+    .text
+handler:
+    push rdi
+    push rsi
+    push rdx
+    push rcx
+    push r8
+    call qword ptr [rip + get_interpreter_address]
+    pop r8
+    pop rcx
+    pop rdx
+    pop rsi
+    pop rdi
+    cmp rax, qword ptr [rip + interpreter_address]
+    je handled
+    jmp qword ptr [rip + vectorcall_address]
+    .p2align 3
+interpreter_address:
+    .quad 0xaaaaaaaaaaaaaaaa
+vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+get_interpreter_address:
+    .quad 0xcccccccccccccccc
+    .p2align 4
+handled:
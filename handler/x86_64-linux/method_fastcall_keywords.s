@@ -0,0 +1,36 @@
+# PyObject *(PyObject *self, PyObject *const *args, Py_ssize_t nargs, PyObject *kwnames)
+#   -> vectorcall(handler, [self, *args], nargs + 1, kwnames)
+    .intel_syntax noprefix
+    .text
+handler:
+    push rbp
+    mov rbp, rsp
+    mov r8, rdx
+    test rcx, rcx
+    jz 1f
+    add r8, qword ptr [rcx + 16]
+1:
+    lea rax, [8*r8 + 23]
+    and rax, -16
+    sub rsp, rax
+    mov qword ptr [rsp], rdi
+    xor eax, eax
+2:
+    cmp rax, r8
+    jae 3f
+    mov r9, qword ptr [rsi + 8*rax]
+    mov qword ptr [rsp + 8*rax + 8], r9
+    inc rax
+    jmp 2b
+3:
+    mov rdi, qword ptr [rip + handler_address]
+    mov rsi, rsp
+    inc rdx
+    call qword ptr [rip + PyObject_Vectorcall_address]
+    leave
+    ret
+    .p2align 3
+PyObject_Vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+handler_address:
+    .quad 0xaaaaaaaaaaaaaaaa
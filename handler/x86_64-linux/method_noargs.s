@@ -0,0 +1,18 @@
+# PyObject *(PyObject *self, PyObject *unused)
+#   -> vectorcall(handler, [self], 1, NULL)
+    .intel_syntax noprefix
+    .text
+handler:
+    push rdi
+    mov rsi, rsp
+    mov rdi, qword ptr [rip + handler_address]
+    mov edx, 1
+    xor ecx, ecx
+    call qword ptr [rip + PyObject_Vectorcall_address]
+    pop rcx
+    ret
+    .p2align 3
+PyObject_Vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+handler_address:
+    .quad 0xaaaaaaaaaaaaaaaa
@@ -0,0 +1,20 @@
+# PyObject *(PyObject *self, PyObject *arg)
+#   -> vectorcall(handler, [self, arg], 2, NULL)
+    .intel_syntax noprefix
+    .text
+handler:
+    sub rsp, 8
+    push rsi
+    push rdi
+    mov rsi, rsp
+    mov rdi, qword ptr [rip + handler_address]
+    mov edx, 2
+    xor ecx, ecx
+    call qword ptr [rip + PyObject_Vectorcall_address]
+    add rsp, 24
+    ret
+    .p2align 3
+PyObject_Vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+handler_address:
+    .quad 0xaaaaaaaaaaaaaaaa
@@ -0,0 +1,12 @@
+# PyObject *(PyObject *self, ...)
+#   -> ml_meth(m_self, ...)
+    .intel_syntax noprefix
+    .text
+handler:
+    mov rdi, qword ptr [rip + m_self_address]
+    jmp qword ptr [rip + ml_meth_address]
+    .p2align 3
+ml_meth_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+m_self_address:
+    .quad 0xaaaaaaaaaaaaaaaa
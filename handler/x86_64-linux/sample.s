@@ -0,0 +1,26 @@
+# PyObject *(PyObject *self, ...)
+#   -> --countdown[0] > 0 ? ml_meth(m_self, ...)
+#      : (countdown[0] = countdown[1], the handler trampoline that follows)
+# The countdown is decremented atomically, but threads that run it out at
+# the same time each reload it, so sampling is approximate without the GIL.
+    .intel_syntax noprefix
+    .text
+handler:
+    mov rax, qword ptr [rip + countdown_address]
+    lock sub qword ptr [rax], 1
+    jle sampled
+    mov rdi, qword ptr [rip + m_self_address]
+    jmp qword ptr [rip + ml_meth_address]
+sampled:
+    mov r11, qword ptr [rax + 8]
+    mov qword ptr [rax], r11
+    jmp handled
+    .p2align 3
+m_self_address:
+    .quad 0xaaaaaaaaaaaaaaaa
+ml_meth_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+countdown_address:
+    .quad 0xcccccccccccccccc
+    .p2align 4
+handled:
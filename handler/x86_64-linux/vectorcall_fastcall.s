@@ -0,0 +1,13 @@
+# PyObject *(PyObject *self, PyObject *const *args, Py_ssize_t nargs)
+#   -> vectorcall(handler, args, nargs, NULL)
+    .intel_syntax noprefix
+    .text
+handler:
+    mov rdi, qword ptr [rip + handler_address]
+    xor ecx, ecx
+    jmp qword ptr [rip + vectorcall_address]
+    .p2align 3
+vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+handler_address:
+    .quad 0xaaaaaaaaaaaaaaaa
@@ -0,0 +1,12 @@
+# PyObject *(PyObject *self, PyObject *const *args, Py_ssize_t nargs, PyObject *kwnames)
+#   -> vectorcall(handler, args, nargs, kwnames)
+    .intel_syntax noprefix
+    .text
+handler:
+    mov rdi, qword ptr [rip + handler_address]
+    jmp qword ptr [rip + vectorcall_address]
+    .p2align 3
+vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+handler_address:
+    .quad 0xaaaaaaaaaaaaaaaa
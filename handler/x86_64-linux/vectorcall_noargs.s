@@ -0,0 +1,15 @@
+# PyObject *(PyObject *self, PyObject *unused)
+#   -> vectorcall(handler, NULL, 0, NULL)
+    .intel_syntax noprefix
+    .text
+handler:
+    mov rdi, qword ptr [rip + handler_address]
+    xor esi, esi
+    xor edx, edx
+    xor ecx, ecx
+    jmp qword ptr [rip + vectorcall_address]
+    .p2align 3
+vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+handler_address:
+    .quad 0xaaaaaaaaaaaaaaaa
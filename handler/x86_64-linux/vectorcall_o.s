@@ -0,0 +1,18 @@
+# PyObject *(PyObject *self, PyObject *arg)
+#   -> vectorcall(handler, &arg, 1, NULL)
+    .intel_syntax noprefix
+    .text
+handler:
+    push rsi
+    mov rsi, rsp
+    mov rdi, qword ptr [rip + handler_address]
+    mov edx, 1
+    xor ecx, ecx
+    call qword ptr [rip + vectorcall_address]
+    pop rcx
+    ret
+    .p2align 3
+vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+handler_address:
+    .quad 0xaaaaaaaaaaaaaaaa
@@ -0,0 +1,27 @@
+# PyObject *(PyObject *self, PyObject *args, void *wrapped, PyObject *kwds)
+#   -> vectorcall(handler, [self, args, kwds or None], 3, NULL)
+    .intel_syntax noprefix
+    .text
+handler:
+    test rcx, rcx
+    jnz 1f
+    mov rcx, qword ptr [rip + none_address]
+1:
+    sub rsp, 24
+    mov qword ptr [rsp], rdi
+    mov qword ptr [rsp + 8], rsi
+    mov qword ptr [rsp + 16], rcx
+    mov rdi, qword ptr [rip + handler_address]
+    mov rsi, rsp
+    mov edx, 3
+    xor ecx, ecx
+    call qword ptr [rip + PyObject_Vectorcall_address]
+    add rsp, 24
+    ret
+    .p2align 3
+PyObject_Vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+handler_address:
+    .quad 0xaaaaaaaaaaaaaaaa
+none_address:
+    .quad 0xcccccccccccccccc
@@ -0,0 +1,16 @@
+# PyObject *(PyObject *self, ...)
+#   -> ++counter->calls, ml_meth(m_self, ...)
+    .intel_syntax noprefix
+    .text
+handler:
+    mov rax, qword ptr [rip + counter_address]
+    lock inc qword ptr [rax]
+    mov rcx, qword ptr [rip + m_self_address]
+    jmp qword ptr [rip + ml_meth_address]
+    .p2align 3
+ml_meth_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+m_self_address:
+    .quad 0xaaaaaaaaaaaaaaaa
+counter_address:
+    .quad 0xcccccccccccccccc
@@ -0,0 +1,37 @@
+# PyObject *(PyObject *self, ...)
+#   -> start = rdtsc(), result = ml_meth(m_self, ...),
+#      ++counter->calls, counter->ticks += rdtsc() - start, result
+    .intel_syntax noprefix
+    .text
+handler:
+    push rbx
+    push rsi
+    sub rsp, 40
+    mov rsi, rdx
+    rdtsc
+    shl rdx, 32
+    or rax, rdx
+    mov rbx, rax
+    mov rdx, rsi
+    mov rcx, qword ptr [rip + m_self_address]
+    call qword ptr [rip + ml_meth_address]
+    mov rsi, rax
+    rdtsc
+    shl rdx, 32
+    or rax, rdx
+    sub rax, rbx
+    mov rcx, qword ptr [rip + counter_address]
+    lock inc qword ptr [rcx]
+    lock add qword ptr [rcx + 8], rax
+    mov rax, rsi
+    add rsp, 40
+    pop rsi
+    pop rbx
+    ret
+    .p2align 3
+ml_meth_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+m_self_address:
+    .quad 0xaaaaaaaaaaaaaaaa
+counter_address:
+    .quad 0xcccccccccccccccc
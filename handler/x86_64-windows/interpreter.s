@@ -0,0 +1,31 @@
+# PyObject *(PyObject *callable, PyObject *const *args, size_t nargsf,
+#            PyObject *kwnames)
+#   -> PyInterpreterState_Get() == interpreter
+#      ? the handler trampoline that follows
+#      : vectorcall(callable, args, nargsf, kwnames)
+    .intel_syntax noprefix
+    .text
+handler:
+    push rcx
+    push rdx
+    push r8
+    push r9
+    sub rsp, 40
+    call qword ptr [rip + get_interpreter_address]
+    add rsp, 40
+    pop r9
+    pop r8
+    pop rdx
+    pop rcx
+    cmp rax, qword ptr [rip + interpreter_address]
+    je handled
+    jmp qword ptr [rip + vectorcall_address]
+    .p2align 3
+interpreter_address:
+    .quad 0xaaaaaaaaaaaaaaaa
+vectorcall_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+get_interpreter_address:
+    .quad 0xcccccccccccccccc
+    .p2align 4
+handled:
@@ -0,0 +1,19 @@
+# PyObject *(PyObject *self, ...)
+#   -> PyErr_SetObject(exception_type, args), NULL
+    .intel_syntax noprefix
+    .text
+handler:
+    sub rsp, 40
+    mov rcx, qword ptr [rip + exception_type_address]
+    mov rdx, qword ptr [rip + args_address]
+    call qword ptr [rip + PyErr_SetObject_address]
+    xor eax, eax
+    add rsp, 40
+    ret
+    .p2align 3
+PyErr_SetObject_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+exception_type_address:
+    .quad 0xaaaaaaaaaaaaaaaa
+args_address:
+    .quad 0xcccccccccccccccc
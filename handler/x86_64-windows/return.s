@@ -0,0 +1,16 @@
+# PyObject *(PyObject *self, ...)
+#   -> Py_IncRef(value), value
+    .intel_syntax noprefix
+    .text
+handler:
+    sub rsp, 40
+    mov rcx, qword ptr [rip + value_address]
+    call qword ptr [rip + Py_IncRef_address]
+    mov rax, qword ptr [rip + value_address]
+    add rsp, 40
+    ret
+    .p2align 3
+Py_IncRef_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+value_address:
+    .quad 0xaaaaaaaaaaaaaaaa
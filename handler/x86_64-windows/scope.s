@@ -0,0 +1,19 @@
+# PyObject *(PyObject *self, ...)
+#   -> *active ? the handler trampoline that follows : ml_meth(m_self, ...)
+    .intel_syntax noprefix
+    .text
+handler:
+    mov rax, qword ptr [rip + active_address]
+    cmp qword ptr [rax], 0
+    jne handled
+    mov rcx, qword ptr [rip + m_self_address]
+    jmp qword ptr [rip + ml_meth_address]
+    .p2align 3
+m_self_address:
+    .quad 0xaaaaaaaaaaaaaaaa
+ml_meth_address:
+    .quad 0xbbbbbbbbbbbbbbbb
+active_address:
+    .quad 0xcccccccccccccccc
+    .p2align 4
+handled:
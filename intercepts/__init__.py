@@ -18,6 +18,58 @@ Usage:
 :copyright: David Shriver, 2023
 """
 from .__version__ import __version__
-from .registration import register, unregister, unregister_all
+from ._handlers import arena_stats
+from .policies import (
+    CallCount,
+    Count,
+    Hooks,
+    Observe,
+    Policy,
+    Raise,
+    Redirect,
+    Return,
+    Scope,
+)
+from .registration import (
+    Intercept,
+    counters,
+    handlers,
+    intercepted,
+    is_registered,
+    iter_intercepts,
+    pause,
+    register,
+    register_many,
+    restore_at_exit,
+    resume,
+    unregister,
+    unregister_all,
+    unregister_many,
+)
 
-__all__ = ["register", "unregister", "unregister_all"]
+__all__ = [
+    "arena_stats",
+    "counters",
+    "handlers",
+    "intercepted",
+    "is_registered",
+    "iter_intercepts",
+    "pause",
+    "register",
+    "register_many",
+    "restore_at_exit",
+    "resume",
+    "unregister",
+    "unregister_all",
+    "unregister_many",
+    "CallCount",
+    "Count",
+    "Hooks",
+    "Intercept",
+    "Observe",
+    "Policy",
+    "Raise",
+    "Redirect",
+    "Return",
+    "Scope",
+]
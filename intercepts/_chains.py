@@ -0,0 +1,183 @@
+"""
+intercepts._chains
+~~~~~~~~~~~~~~~~~~
+
+This module compiles the python handlers registered on a callable into a
+single chain of functions.
+"""
+from __future__ import annotations
+
+import builtins
+import types
+from typing import Any, Callable, Optional, Tuple, Union, cast
+
+from ._inline import inline_call
+from ._utils import replace_load_global
+from .policies import (
+    _OBSERVE_HANDLER,
+    _OBSERVE_PREFIX,
+    Observe,
+    Policy,
+    _Filter,
+    _make_handler,
+    _Sample,
+    _Scoped,
+)
+
+# Policies that pass some calls on to the intercepted callable, and the others
+# to the handler they wrap
+_WRAPPERS = (_Filter, _Sample, _Scoped)
+
+
+class Chain(Tuple[Union[types.FunctionType, Policy], ...]):
+    r"""The python handlers of one intercepted callable, oldest first.
+
+    :ivar inline: Whether to inline the intercepted function into the
+        observers that call it.
+    """
+
+    inline: bool
+
+    def __new__(
+        cls, handlers: Tuple[Union[types.FunctionType, Policy], ...] = (), inline=False
+    ) -> Chain:
+        chain = cast(Chain, tuple.__new__(cls, handlers))
+        chain.inline = inline
+        return chain
+
+
+class _BoundGlobals(dict):
+    # the globals of a handler whose code has no room to load ``_`` as a
+    # constant, in which ``_`` is bound and other names are looked up in the
+    # module of the handler
+    __slots__ = ("_module",)
+
+    def __init__(self, module: dict, original: Any):
+        super().__init__(_=original, __builtins__=module.get("__builtins__", builtins))
+        self._module = module
+
+    def __missing__(self, name: str) -> Any:
+        return self._module[name]
+
+
+def bind_handler(handler: types.FunctionType, original: Any) -> types.FunctionType:
+    r"""Binds the name ``_`` in a handler to the callable it intercepts.
+
+    The loads of ``_`` are replaced with a constant. Before Python 3.11, code
+    with more than 256 constants may have no room for the load of another
+    one, and then looks ``_`` up in globals of its own instead, which only
+    fall back to those of its module for reading.
+    """
+    try:
+        code = replace_load_global(handler.__code__, "_", original)
+        _globals = handler.__globals__
+    except ValueError:
+        code = handler.__code__
+        _globals = _BoundGlobals(handler.__globals__, original)
+    _handler = types.FunctionType(
+        code=code,
+        globals=_globals,
+        name=handler.__name__,
+        argdefs=handler.__defaults__,
+        closure=handler.__closure__,
+    )
+    _handler.__kwdefaults__ = handler.__kwdefaults__
+    return _handler
+
+
+def compile_chain(
+    chain: Chain, original: Callable, signature: Optional[types.FunctionType] = None
+) -> types.FunctionType:
+    r"""Compiles a chain of handlers into the function that handles a call.
+
+    Each handler calls the next older one directly as ``_``, rather than
+    through a copy of the intercepted callable, and the oldest one calls the
+    original. Consecutive observers are called from one loop. The handlers of
+    policies take the parameters of the signature, if there is one, so that
+    calls are passed on without packing their arguments. If the chain is
+    inlined, the body of the function is spliced into the observers, samples
+    and scopes that call it.
+
+    :param chain: The handlers and policies, oldest first.
+    :param original: The callable that the oldest handler intercepts.
+    :param signature: (optional) The python function that is intercepted.
+    :returns: The function that handles calls, starting with the newest
+        handler.
+    """
+    handler: Any = original
+    # each handler sees the next one as the intercepted callable
+    name = getattr(original, "__name__", None)
+    qualname = getattr(original, "__qualname__", name)
+    i, end = 0, chain.__len__()
+    while i < end:
+        if chain[i].__class__ is Observe:
+            observers = []
+            while i < end and chain[i].__class__ is Observe:
+                observers.append(cast(Observe, chain[i]).callback)
+                i += 1
+            # newer observers are called first, as if each intercepted the last
+            observers.reverse()
+            inlined = None
+            if chain.inline and handler is signature:
+                inlined = _inline_observers(observers, handler)
+            handler = inlined or _make_handler(
+                _OBSERVE_HANDLER,
+                "_observe_handler",
+                signature,
+                _=handler,
+                _observers=observers,
+            )
+        else:
+            handler = _compile_entry(chain[i], handler, signature, chain.inline)
+            i += 1
+        if name.__class__ is str:
+            handler.__name__, handler.__qualname__ = name, qualname
+    return handler
+
+
+def _compile_entry(
+    entry: Union[types.FunctionType, Policy],
+    handler: Any,
+    signature: Optional[types.FunctionType],
+    inline: bool = False,
+) -> types.FunctionType:
+    if entry.__class__ in _WRAPPERS:
+        # matching calls go to the wrapped handler, and others skip it
+        wrapper = cast(Union[_Filter, _Sample, _Scoped], entry)
+        matched = _compile_entry(wrapper.handler, handler, signature, inline)
+        if inline and entry.__class__ is not _Filter and handler is signature:
+            # other calls run the body of the function in the same frame
+            function = cast(types.FunctionType, signature)
+            guard = cast(Union[_Sample, _Scoped], entry)
+            inlined = _inline_prefix(guard._prefix(function, matched), function)
+            if inlined is not None:
+                return inlined
+        return bind_handler(wrapper._handler(signature, matched), handler)
+    if isinstance(entry, Policy):
+        return bind_handler(entry._handler(signature), handler)
+    return bind_handler(entry, handler)
+
+
+def _inline_observers(
+    observers: list, function: types.FunctionType
+) -> Optional[types.FunctionType]:
+    prefix = _make_handler(
+        _OBSERVE_PREFIX, "_observe_handler", function, _observers=observers
+    )
+    return _inline_prefix(prefix, function)
+
+
+def _inline_prefix(
+    prefix: types.FunctionType, function: types.FunctionType
+) -> Optional[types.FunctionType]:
+    code = inline_call(prefix.__code__, function.__code__)
+    if code is None:
+        return None
+    handler = types.FunctionType(
+        code, function.__globals__, function.__name__, function.__defaults__
+    )
+    handler.__kwdefaults__ = function.__kwdefaults__
+    return handler
+
+
+__all__ = ["bind_handler", "compile_chain", "Chain"]
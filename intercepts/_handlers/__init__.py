@@ -1,10 +1,48 @@
 from __future__ import annotations
 
+import ctypes
 import sys
 import types
 import typing
 
-from .base import PTR_SIZE, get_addr, replace_cfunction_base
+from .arena import Arena, ArenaStats
+from .base import (
+    CLEAR_CACHE_INSTR,
+    GENERIC_VECTORCALL_INSTR_TEMPLATE,
+    HEAD_WORDS,
+    INTERPRETER,
+    MAIN_INTERPRETER,
+    PTR_SIZE,
+    SAMPLE_INSTR_TEMPLATE,
+    SCOPE_INSTR_TEMPLATE,
+    VECTORCALL_INSTR_TEMPLATE,
+    Py_GIL_DISABLED,
+    PyWrapperFlag_KEYWORDS,
+    call_vectorcall_instr,
+    count_instr,
+    get_addr,
+    is_shared,
+    make_immortal,
+    new_vectorcall_caller_base,
+    raise_instr,
+    read_vectorcall,
+    redirect_instr,
+    replace_cfunction_base,
+    replace_cfunction_guard_base,
+    replace_cfunction_instr_base,
+    replace_method_descriptor_base,
+    replace_method_descriptor_instr_base,
+    replace_vectorcall_base,
+    replace_vectorcall_instr_base,
+    replace_wrapper_descriptor_base,
+    replace_wrapper_descriptor_instr_base,
+    return_instr,
+    state_view,
+    vectorcall_offset,
+    wrapper_descriptor_flags,
+)
+from .counters import CounterTable
+from .slots import generic_slots, patch_type_slots, restore_type_slots
 
 if sys.byteorder != "little":  # pragma: no cover
     raise ImportError(
@@ -12,17 +50,218 @@ if sys.byteorder != "little":  # pragma: no cover
     )
 
 if sys.platform.startswith("linux"):
-    from .linux import malloc, mprotect
+    from .linux import PAGESIZE, malloc, mprotect, unprotect
 elif sys.platform.startswith("win32"):
-    from .windows import malloc, mprotect
+    from .windows import PAGESIZE, malloc, mprotect, unprotect
 else:  # pragma: no cover
     raise ImportError(f"Unfortunately {sys.platform} is not currently supported.")
 
+_ARENA = Arena(malloc, mprotect, unprotect, PAGESIZE, flush_instr=CLEAR_CACHE_INSTR)
+batch = _ARENA.batch
+trim_arena = _ARENA.trim
+_COUNTERS = CounterTable(PAGESIZE)
+
 
 def replace_cfunction(
     obj: types.BuiltinFunctionType, handler: typing.Callable
 ) -> typing.Tuple[bytes, typing.Callable[[], int]]:
-    return replace_cfunction_base(obj, handler, malloc, mprotect)
+    vectorcall_instr_templates = (
+        VECTORCALL_INSTR_TEMPLATE
+        if isinstance(handler, types.FunctionType)
+        else GENERIC_VECTORCALL_INSTR_TEMPLATE
+    )
+    return replace_cfunction_base(
+        obj,
+        handler,
+        _ARENA.malloc,
+        _ARENA.write,
+        vectorcall_instr_templates=vectorcall_instr_templates,
+    )
+
+
+def replace_cfunction_instr(
+    obj: types.BuiltinFunctionType, instr: bytes
+) -> typing.Tuple[bytes, typing.Callable[[], int]]:
+    return replace_cfunction_instr_base(obj, instr, _ARENA.malloc, _ARENA.write)
+
+
+def _replace_descriptor(
+    obj: typing.Union[types.MethodDescriptorType, types.WrapperDescriptorType],
+    replace: typing.Callable[..., typing.Tuple[bytes, typing.Callable[[], int]]],
+    value: typing.Any,
+) -> typing.Tuple[bytes, typing.Callable[[], int], typing.Callable[[], None]]:
+    # The generic slots are probed before the descriptor is replaced, since
+    # new types only inherit the specific slot of an unmodified slot wrapper.
+    generic_slots(obj.__name__)
+    handler_method_def, dealloc = replace(obj, value, _ARENA.malloc, _ARENA.write)
+    patches = patch_type_slots(obj.__objclass__, obj.__name__)
+    # the slots are restored when the descriptor is, which may be before its
+    # trampoline is freed
+    return handler_method_def, dealloc, lambda: restore_type_slots(patches)
+
+
+def replace_method_descriptor(
+    obj: types.MethodDescriptorType, handler: typing.Callable
+) -> typing.Tuple[bytes, typing.Callable[[], int], typing.Callable[[], None]]:
+    return _replace_descriptor(obj, replace_method_descriptor_base, handler)
+
+
+def replace_method_descriptor_instr(
+    obj: types.MethodDescriptorType, instr: bytes
+) -> typing.Tuple[bytes, typing.Callable[[], int], typing.Callable[[], None]]:
+    return _replace_descriptor(obj, replace_method_descriptor_instr_base, instr)
+
+
+def replace_wrapper_descriptor(
+    obj: types.WrapperDescriptorType, handler: typing.Callable
+) -> typing.Tuple[bytes, typing.Callable[[], int], typing.Callable[[], None]]:
+    return _replace_descriptor(obj, replace_wrapper_descriptor_base, handler)
+
+
+def replace_wrapper_descriptor_instr(
+    obj: types.WrapperDescriptorType, instr: bytes
+) -> typing.Tuple[bytes, typing.Callable[[], int], typing.Callable[[], None]]:
+    return _replace_descriptor(obj, replace_wrapper_descriptor_instr_base, instr)
+
+
+def replace_vectorcall(
+    obj: typing.Callable, handler: typing.Callable
+) -> typing.Tuple[bytes, typing.Callable[[], int]]:
+    vectorcall_instr_templates = (
+        VECTORCALL_INSTR_TEMPLATE
+        if isinstance(handler, types.FunctionType)
+        else GENERIC_VECTORCALL_INSTR_TEMPLATE
+    )
+    return replace_vectorcall_base(
+        obj,
+        handler,
+        _ARENA.malloc,
+        _ARENA.write,
+        vectorcall_instr_templates=vectorcall_instr_templates,
+    )
+
+
+def replace_vectorcall_instr(
+    obj: typing.Callable, instr: bytes
+) -> typing.Tuple[bytes, typing.Callable[[], int]]:
+    return replace_vectorcall_instr_base(obj, instr, _ARENA.malloc, _ARENA.write)
+
+
+def new_vectorcall_caller(
+    obj: typing.Callable, vectorcall: int
+) -> typing.Optional[
+    typing.Tuple[types.BuiltinFunctionType, typing.Any, typing.Callable[[], int]]
+]:
+    return new_vectorcall_caller_base(obj, vectorcall, _ARENA.malloc, _ARENA.write)
+
+
+def replace_cfunction_count(
+    obj: types.BuiltinFunctionType,
+    timed: bool,
+    original: types.BuiltinFunctionType,
+) -> typing.Optional[typing.Tuple[bytes, typing.Callable[[], None], int]]:
+    counter = _COUNTERS.alloc()
+    instr = count_instr(obj, _COUNTERS.address(counter), timed, original)
+    if instr is None:  # pragma: no cover
+        _COUNTERS.free(counter)
+        return None
+    handler_method_def, dealloc = replace_cfunction_instr(obj, instr)
+
+    def _dealloc() -> None:
+        dealloc()
+        _COUNTERS.free(counter)
+
+    return handler_method_def, _dealloc, counter
+
+
+def alloc_counter(
+    *values: int,
+) -> typing.Tuple[ctypes.Array, typing.Callable[[], None]]:
+    # words that guards read, in a slot of the counter table
+    counter = _COUNTERS.alloc()
+    words = (ctypes.c_int64 * values.__len__()).from_address(_COUNTERS.address(counter))
+    words[:] = typing.cast(list, values)
+    return words, lambda: _COUNTERS.free(counter)
+
+
+def replace_cfunction_sample(
+    obj: types.BuiltinFunctionType, handler: typing.Callable, countdown: ctypes.Array
+) -> typing.Optional[typing.Tuple[bytes, typing.Callable[[], int]]]:
+    # the countdown holds the calls left and the number it is reset to
+    return replace_cfunction_guard_base(
+        obj,
+        handler,
+        SAMPLE_INSTR_TEMPLATE,
+        ctypes.addressof(countdown),
+        _ARENA.malloc,
+        _ARENA.write,
+    )
+
+
+def replace_cfunction_scope(
+    obj: types.BuiltinFunctionType, handler: typing.Callable, active: ctypes.Array
+) -> typing.Optional[typing.Tuple[bytes, typing.Callable[[], int]]]:
+    # the handler is only called while a context is in the scope
+    return replace_cfunction_guard_base(
+        obj,
+        handler,
+        SCOPE_INSTR_TEMPLATE,
+        ctypes.addressof(active),
+        _ARENA.malloc,
+        _ARENA.write,
+    )
+
+
+def read_counters() -> typing.List[typing.Tuple[int, int]]:
+    return _COUNTERS.read()
+
+
+def arena_stats() -> ArenaStats:
+    r"""Returns memory statistics for the trampolines of builtin intercepts.
+
+    Trampolines are packed into shared executable pages, and the slots of
+    unregistered intercepts are reused by later registrations.
+
+    :returns: The number of pages mapped, the number of slots in use and free,
+        and the number of bytes used and wasted by live trampolines.
+    """
+    return _ARENA.stats()
 
 
-__all__ = ["get_addr", "replace_cfunction", "PTR_SIZE"]
+__all__ = [
+    "alloc_counter",
+    "arena_stats",
+    "batch",
+    "call_vectorcall_instr",
+    "get_addr",
+    "is_shared",
+    "make_immortal",
+    "new_vectorcall_caller",
+    "raise_instr",
+    "read_counters",
+    "read_vectorcall",
+    "redirect_instr",
+    "replace_cfunction",
+    "replace_cfunction_count",
+    "replace_cfunction_instr",
+    "replace_cfunction_sample",
+    "replace_cfunction_scope",
+    "replace_method_descriptor",
+    "replace_method_descriptor_instr",
+    "replace_vectorcall",
+    "replace_vectorcall_instr",
+    "replace_wrapper_descriptor",
+    "replace_wrapper_descriptor_instr",
+    "return_instr",
+    "state_view",
+    "trim_arena",
+    "vectorcall_offset",
+    "wrapper_descriptor_flags",
+    "ArenaStats",
+    "HEAD_WORDS",
+    "INTERPRETER",
+    "MAIN_INTERPRETER",
+    "PTR_SIZE",
+    "Py_GIL_DISABLED",
+    "PyWrapperFlag_KEYWORDS",
+]
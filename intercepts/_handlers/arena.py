@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import collections
+import contextlib
+import ctypes
+import typing
+
+# Trampolines are packed into slots aligned to this many bytes, so that the
+# 8 byte literals at the end of each template stay naturally aligned.
+SLOT_ALIGN = 16
+
+
+class ArenaStats(typing.NamedTuple):
+    """Memory statistics for the trampolines of builtin intercepts.
+
+    :ivar pages: The number of pages mapped by the arena.
+    :ivar slots_used: The number of slots holding a live trampoline.
+    :ivar slots_free: The number of slots waiting for reuse.
+    :ivar bytes_used: The number of bytes of live trampoline code.
+    :ivar bytes_wasted: The number of bytes reserved by live slots beyond their
+        trampoline code.
+    """
+
+    pages: int
+    slots_used: int
+    slots_free: int
+    bytes_used: int
+    bytes_wasted: int
+
+
+class _Chunk:
+    __slots__ = ("rw_addr", "rx_addr", "size", "dealloc", "live", "sealed")
+
+    def __init__(
+        self, rw_addr: int, rx_addr: int, size: int, dealloc: typing.Callable[[], int]
+    ):
+        self.rw_addr = rw_addr
+        self.rx_addr = rx_addr
+        self.size = size
+        self.dealloc = dealloc
+        self.live = 0
+        self.sealed = False
+
+    @property
+    def dual_mapped(self) -> bool:
+        return self.rw_addr != self.rx_addr
+
+
+class Arena:
+    """Packs many small trampolines into shared executable pages.
+
+    Memory is mapped ``chunk_pages`` pages at a time, and handed out in slots
+    rounded up to :data:`SLOT_ALIGN` bytes. Freed slots are kept on a free
+    list for their size and reused in the order they were freed.
+
+    When the platform maps each chunk twice, trampolines are written through
+    the writable view and executed through the executable view, and no
+    protection is ever changed. Otherwise, a chunk is made executable
+    (sealed) once it is written, or when the outermost :meth:`batch` exits.
+    A sealed chunk is made writable again, while staying executable, only for
+    as long as a slot in it is written.
+
+    :param malloc: Maps a region of the given size, returning its writable and
+        executable addresses and a function that unmaps it.
+    :param mprotect: Makes a region executable.
+    :param unprotect: Makes a region writable and executable.
+    :param pagesize: The size of a page.
+    :param flush_instr: (optional) Instructions for a function taking the
+        writable address, executable address, and size of a slot, which makes
+        the instructions written to it visible to instruction fetch.
+    :param chunk_pages: (optional) The number of pages to map at a time.
+    """
+
+    def __init__(
+        self,
+        malloc: typing.Callable[
+            [int], typing.Tuple[int, int, typing.Callable[[], int]]
+        ],
+        mprotect: typing.Callable[[int, int], None],
+        unprotect: typing.Callable[[int, int], None],
+        pagesize: int,
+        flush_instr: typing.Optional[bytes] = None,
+        chunk_pages: int = 1,
+    ):
+        self._malloc = malloc
+        self._mprotect = mprotect
+        self._unprotect = unprotect
+        self._flush_instr = flush_instr
+        self._flush: typing.Optional[typing.Callable[[int, int, int], None]] = None
+        self.pagesize = pagesize
+        self.chunk_size = chunk_pages * pagesize
+        self._chunks: typing.List[_Chunk] = []
+        self._current: typing.Optional[_Chunk] = None
+        self._next = 0
+        self._free: typing.DefaultDict[
+            int, typing.Deque[typing.Tuple[int, _Chunk]]
+        ] = collections.defaultdict(collections.deque)
+        self._slots: typing.Dict[int, typing.Tuple[int, int, _Chunk]] = {}
+        self._batch_depth = 0
+
+    def _map_chunk(self) -> None:
+        rw_addr, rx_addr, dealloc = self._malloc(self.chunk_size)
+        chunk = _Chunk(rw_addr, rx_addr, self.chunk_size, dealloc)
+        self._chunks.append(chunk)
+        self._current = chunk
+        self._next = 0
+        if chunk.dual_mapped and self._flush_instr is not None and self._flush is None:
+            # nothing on a fresh page has been fetched yet, so the flush
+            # function can be written without flushing the caches first
+            addr, _ = self.malloc(len(self._flush_instr))
+            ctypes.memmove(
+                rw_addr + addr - rx_addr, self._flush_instr, len(self._flush_instr)
+            )
+            self._flush = ctypes.CFUNCTYPE(
+                None, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t
+            )(addr)
+
+    def _seal(self, chunk: _Chunk) -> None:
+        self._mprotect(chunk.rx_addr, chunk.size)
+        chunk.sealed = True
+
+    def _unseal(self, chunk: _Chunk) -> None:
+        # the other slots of the chunk may be running on other threads, since
+        # foreign calls release the GIL, so the chunk stays executable
+        self._unprotect(chunk.rx_addr, chunk.size)
+        chunk.sealed = False
+
+    def malloc(self, size: int) -> typing.Tuple[int, typing.Callable[[], int]]:
+        """Allocates a slot of at least ``size`` bytes.
+
+        :param size: The number of bytes required.
+        :returns: The executable address of the slot and a function that frees
+            it. The slot must be written with :meth:`write`.
+        """
+        slot_size = -(-size // SLOT_ALIGN) * SLOT_ALIGN
+        if slot_size > self.chunk_size:
+            raise ValueError(f"Trampoline too large: {size} bytes")
+        free = self._free[slot_size]
+        if free:
+            addr, chunk = free.popleft()
+        else:
+            if self._current is None or self._next + slot_size > self._current.size:
+                self._map_chunk()
+            chunk = typing.cast(_Chunk, self._current)
+            addr = chunk.rx_addr + self._next
+            self._next += slot_size
+        chunk.live += 1
+        self._slots[addr] = (slot_size, size, chunk)
+        return addr, lambda: self.free(addr)
+
+    def write(self, addr: int, data: bytes) -> None:
+        """Writes instructions to a slot, and makes them executable.
+
+        :param addr: The executable address of a slot returned by
+            :meth:`malloc`.
+        :param data: The instructions to write.
+        """
+        _, _, chunk = self._slots[addr]
+        rw_addr = chunk.rw_addr + addr - chunk.rx_addr
+        if chunk.sealed:
+            self._unseal(chunk)
+        ctypes.memmove(rw_addr, data, len(data))
+        if chunk.dual_mapped:
+            if self._flush is not None:
+                self._flush(rw_addr, addr, len(data))
+        elif self._batch_depth == 0:
+            self._seal(chunk)
+
+    @contextlib.contextmanager
+    def batch(self) -> typing.Iterator[None]:
+        """Defers making written slots executable until the batch exits."""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                for chunk in self._chunks:
+                    if chunk.live and not (chunk.sealed or chunk.dual_mapped):
+                        self._seal(chunk)
+
+    def free(self, addr: int) -> int:
+        """Returns a slot to the free list for its size.
+
+        Chunks left without live slots are kept for reuse until
+        :meth:`trim` unmaps them.
+
+        :param addr: The executable address of a slot returned by
+            :meth:`malloc`.
+        """
+        slot_size, _, chunk = self._slots.pop(addr)
+        chunk.live -= 1
+        self._free[slot_size].append((addr, chunk))
+        return 0
+
+    def trim(self) -> int:
+        """Unmaps every chunk that holds no live slot.
+
+        Slots are freed one at a time as their trampolines are retired, so
+        the chunks they leave empty are unmapped together afterwards.
+
+        :returns: The number of chunks unmapped.
+        """
+        empty = [chunk for chunk in self._chunks if not chunk.live]
+        if not empty:
+            return 0
+        for chunk in empty:
+            chunk.dealloc()
+        self._chunks = [chunk for chunk in self._chunks if chunk.live]
+        for slot_size, free in self._free.items():
+            self._free[slot_size] = collections.deque(
+                (addr, chunk) for addr, chunk in free if chunk.live
+            )
+        if self._current is not None and not self._current.live:
+            self._current = None
+        return len(empty)
+
+    def stats(self) -> ArenaStats:
+        return ArenaStats(
+            pages=sum(chunk.size for chunk in self._chunks) // self.pagesize,
+            slots_used=len(self._slots),
+            slots_free=sum(len(free) for free in self._free.values()),
+            bytes_used=sum(size for _, size, _ in self._slots.values()),
+            bytes_wasted=sum(
+                slot_size - size for slot_size, size, _ in self._slots.values()
+            ),
+        )
+
+
+__all__ = ["Arena", "ArenaStats", "SLOT_ALIGN"]
@@ -1,20 +1,188 @@
 from __future__ import annotations
 
 import ctypes
-import ctypes.util
-import platform
+import os
 import struct
 import sys
 import types
 import typing
 
 PTR_SIZE = ctypes.sizeof(ctypes.c_size_t)
-PyObject_Call_address: typing.Final[bytes] = ctypes.string_at(
-    ctypes.addressof(ctypes.pythonapi.PyObject_Call), 8
+
+
+def _gil_disabled() -> bool:
+    # sysconfig takes milliseconds to import, so it is only read on the builds
+    # that could be free-threaded and that have no ABI flags to tell instead
+    if getattr(sys, "_is_gil_enabled", None) is None:
+        return False
+    abiflags = getattr(sys, "abiflags", None)
+    if abiflags is not None:
+        return "t" in abiflags
+    import sysconfig
+
+    return bool(sysconfig.get_config_var("Py_GIL_DISABLED"))
+
+
+# Free-threaded builds (PEP 703) run without the GIL, and objects start with
+# the id of their owning thread and split refcounts, before their type.
+Py_GIL_DISABLED: typing.Final[bool] = _gil_disabled()
+# The number of words in the header of an object, which offsets are taken from
+HEAD_WORDS: typing.Final[int] = object.__basicsize__ // PTR_SIZE
+# The byte offset of ob_ref_local, and the value that makes an object immortal
+_REF_LOCAL_OFFSET = PTR_SIZE + 4
+_IMMORTAL_REF_LOCAL = 0xFFFFFFFF
+# The byte offset of the data of a bytes object
+_BYTES_DATA_OFFSET = bytes.__basicsize__ - 1
+
+# From methodobject.h
+METH_VARARGS = 0x0001
+METH_KEYWORDS = 0x0002
+METH_NOARGS = 0x0004
+METH_O = 0x0008
+METH_FASTCALL = 0x0080
+METH_METHOD = 0x0200
+METH_FASTCALL_KEYWORDS = METH_FASTCALL | METH_KEYWORDS
+# From descrobject.h
+PyWrapperFlag_KEYWORDS = 0x0001
+_METH_CALL_FLAGS = (
+    METH_VARARGS | METH_KEYWORDS | METH_NOARGS | METH_O | METH_FASTCALL | METH_METHOD
+)
+
+# Word offsets of the PyMethodDef pointer and m_self in PyCFunctionObject, of
+# the PyMethodDef pointer in PyMethodDescrObject, and of the vectorcall pointer
+# shared by both.
+_CFUNCTION_METHOD_DEF_OFFSET = HEAD_WORDS
+_CFUNCTION_SELF_OFFSET = HEAD_WORDS + 1
+_METHOD_DESCRIPTOR_METHOD_DEF_OFFSET = HEAD_WORDS + 3
+_VECTORCALL_OFFSET = HEAD_WORDS + 4
+# Word offset of the wrapperbase pointer in PyWrapperDescrObject, and the size,
+# flags and wrapper function offsets of wrapperbase.
+_WRAPPER_DESCRIPTOR_BASE_OFFSET = HEAD_WORDS + 3
+_WRAPPERBASE_SIZE = 7
+_WRAPPERBASE_WRAPPER = 3
+_WRAPPERBASE_FLAGS = 5
+# Objects of types with this flag store a vectorcall function pointer at
+# tp_vectorcall_offset, the word at this offset in PyTypeObject.
+Py_TPFLAGS_HAVE_VECTORCALL = 1 << 11
+_TYPE_VECTORCALL_OFFSET = HEAD_WORDS + 5
+# Types without this flag are static, and shared by all interpreters.
+Py_TPFLAGS_HEAPTYPE = 1 << 9
+
+
+def _symbol_address(name: str) -> typing.Optional[bytes]:
+    if not hasattr(ctypes.pythonapi, name):
+        return None
+    return ctypes.string_at(ctypes.addressof(getattr(ctypes.pythonapi, name)), 8)
+
+
+def publish(addr: int, data: bytes) -> None:
+    r"""Writes the words of a live object in a single step.
+
+    ctypes.memmove releases the GIL, so other threads could call the object
+    while it is half written. The words are written through a ctypes array
+    instead, which holds the GIL, so that a patch is prepared fully and then
+    published at once.
+
+    Without the GIL, each changed word is stored on its own. The last word,
+    which is the vectorcall of the objects that have one, is cleared while
+    the others change, so that calls fall back to the method def rather than
+    calling it with another calling convention.
+    """
+    if not Py_GIL_DISABLED:
+        (ctypes.c_char * len(data)).from_address(addr).raw = data
+        return
+    count = len(data) // PTR_SIZE
+    words = (ctypes.c_size_t * count).from_address(addr)
+    values = struct.unpack(f"{count}N", data)
+    changed = [i for i in range(count) if words[i] != values[i]]
+    if len(changed) > 1 and changed[-1] == count - 1:
+        words[count - 1] = 0
+    for i in changed:
+        words[i] = values[i]
+
+
+class _PublishedView:
+    # a view of the words of a live object that are written with publish
+    __slots__ = ("_addr", "_size")
+
+    def __init__(self, addr: int, size: int):
+        self._addr = addr
+        self._size = size
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def raw(self) -> bytes:
+        return ctypes.string_at(self._addr, self._size)
+
+    @raw.setter
+    def raw(self, data: bytes) -> None:
+        publish(self._addr, data)
+
+
+def state_view(addr: int, size: int) -> typing.Any:
+    r"""Returns a view of the words of a live object, whose ``raw`` bytes are
+    read and published at once.
+    """
+    if Py_GIL_DISABLED:
+        return _PublishedView(addr, size)
+    return (ctypes.c_char * size).from_address(addr)
+
+
+def make_immortal(addr: int) -> None:
+    r"""Makes a copy of an object immortal on free-threaded builds.
+
+    The copy keeps the owning thread of the original, so other threads would
+    otherwise merge its refcount into the original's, and may free it.
+    """
+    if Py_GIL_DISABLED:
+        ref_local = ctypes.c_uint32.from_address(addr + _REF_LOCAL_OFFSET)
+        ref_local.value = _IMMORTAL_REF_LOCAL
+
+
+def _fill_template(template: bytes, placeholder: bytes, value: bytes) -> bytes:
+    i = template.index(placeholder)
+    return template[:i] + value + template[i + len(placeholder) :]
+
+
+PyObject_Call_address: typing.Final[bytes] = typing.cast(
+    bytes, _symbol_address("PyObject_Call")
+)
+# Handlers are usually python functions, so the function vectorcall can be used
+# directly on interpreters that do not export ``PyObject_Vectorcall``.
+PyObject_Vectorcall_address: typing.Final[typing.Optional[bytes]] = _symbol_address(
+    "PyObject_Vectorcall"
+)
+_PyFunction_Vectorcall_address: typing.Final[
+    typing.Optional[bytes]
+] = PyObject_Vectorcall_address or _symbol_address("_PyFunction_Vectorcall")
+Py_IncRef_address: typing.Final[typing.Optional[bytes]] = _symbol_address("Py_IncRef")
+PyErr_SetObject_address: typing.Final[typing.Optional[bytes]] = _symbol_address(
+    "PyErr_SetObject"
+)
+PyInterpreterState_Get_address: typing.Final[typing.Optional[bytes]] = _symbol_address(
+    "PyInterpreterState_Get"
+) or _symbol_address("_PyInterpreterState_Get")
+
+
+def _interpreter(name: str) -> typing.Optional[int]:
+    if not hasattr(ctypes.pythonapi, name):
+        return None
+    return ctypes.PYFUNCTYPE(ctypes.c_void_p)((name, ctypes.pythonapi))()
+
+
+# Each interpreter imports intercepts on its own, so these are the addresses of
+# the interpreter that imported it, and of the main interpreter.
+INTERPRETER: typing.Final[typing.Optional[int]] = _interpreter(
+    "PyInterpreterState_Get"
+) or _interpreter("_PyInterpreterState_Get")
+MAIN_INTERPRETER: typing.Final[typing.Optional[int]] = _interpreter(
+    "PyInterpreterState_Main"
 )
 
 _INSTR_aarch64_linux: typing.Final[bytes] = bytes.fromhex(
-    "0800009009000090001140f9230d40f960001fd61f2003d5bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    "c00000586300005860001fd61f2003d5bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
 )
 _INSTR_amd64_linux: typing.Final[bytes] = bytes.fromhex(
     "488b0509000000488b3d0a000000ffe0bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
@@ -33,70 +201,1037 @@ INSTR_TEMPLATES: typing.Final[typing.Dict[str, typing.Dict[str, bytes]]] = {
         "amd64": _INSTR_amd64_windows,
     },
 }
-_instr_template = INSTR_TEMPLATES[sys.platform][platform.machine().lower()]
-_i = _instr_template.index(b"\xbb" * 8)
-INSTR_TEMPLATE: typing.Final[bytes] = (
-    _instr_template[:_i] + PyObject_Call_address + _instr_template[_i + 8 :]
+_VECTORCALL_INSTR_aarch64_linux: typing.Final[typing.Dict[int, bytes]] = {
+    METH_FASTCALL_KEYWORDS: bytes.fromhex(
+        "c00000587000005800021fd61f2003d5bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+    METH_FASTCALL: bytes.fromhex(
+        "c0000058e3031faa5000005800021fd6bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+    METH_O: bytes.fromhex(
+        "fd7bbea9fd030091e10b00f9e143009140010058220080d2e3031faab000005800023fd6"
+        "fd7bc2a8c0035fd61f2003d5bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+    METH_NOARGS: bytes.fromhex(
+        "00010058e1031faae2031faae3031faa5000005800021fd6bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+}
+_VECTORCALL_INSTR_amd64_linux: typing.Final[typing.Dict[int, bytes]] = {
+    METH_FASTCALL_KEYWORDS: bytes.fromhex(
+        "488b3d11000000ff25030000000f1f00bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+    METH_FASTCALL: bytes.fromhex(
+        "488b3d1100000031c9ff250100000090bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+    METH_O: bytes.fromhex(
+        "564889e6488b3d1d000000ba0100000031c9ff150800000059c3660f1f440000"
+        "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+    METH_NOARGS: bytes.fromhex(
+        "488b3d1900000031f631d231c9ff25050000000f1f440000bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+}
+VECTORCALL_INSTR_TEMPLATES: typing.Final[
+    typing.Dict[str, typing.Dict[str, typing.Dict[int, bytes]]]
+] = {
+    "linux": {
+        "aarch64": _VECTORCALL_INSTR_aarch64_linux,
+        "x86_64": _VECTORCALL_INSTR_amd64_linux,
+        "amd64": _VECTORCALL_INSTR_amd64_linux,
+    },
+}
+
+# Method descriptors pass the instance as self, which is prepended to the
+# arguments of the handler.
+_METHOD_VECTORCALL_INSTR_aarch64_linux: typing.Final[typing.Dict[int, bytes]] = {
+    METH_FASTCALL_KEYWORDS: bytes.fromhex(
+        "fd7bbfa9fd030091e40302aa630000b4650840f98400058b85080091a5f87f92"
+        "a5f07dd3ff6325cbe00300f9e6031faadf0004eba2000054277866f8c6040091"
+        "e77b26f8fbffff1740010058e103009142040091b000005800023fd6bf030091"
+        "fd7bc1a8c0035fd6bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+    METH_FASTCALL: bytes.fromhex(
+        "e3031faafd7bbfa9fd030091e40302aa630000b4650840f98400058b85080091"
+        "a5f87f92a5f07dd3ff6325cbe00300f9e6031faadf0004eba2000054277866f8"
+        "c6040091e77b26f8fbffff1760010058e103009142040091d000005800023fd6"
+        "bf030091fd7bc1a8c0035fd61f2003d5bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+    METH_O: bytes.fromhex(
+        "fd7bbea9fd030091e00701a9e143009140010058420080d2e3031faab0000058"
+        "00023fd6fd7bc2a8c0035fd61f2003d5bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+    METH_NOARGS: bytes.fromhex(
+        "fd7bbea9fd030091e00b00f9e143009140010058220080d2e3031faab0000058"
+        "00023fd6fd7bc2a8c0035fd61f2003d5bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+}
+_METHOD_VECTORCALL_INSTR_amd64_linux: typing.Final[typing.Dict[int, bytes]] = {
+    METH_FASTCALL_KEYWORDS: bytes.fromhex(
+        "554889e54989d04885c974044c0341104a8d04c5170000004883e0f04829c448"
+        "893c2431c04c39c0730e4c8b0cc64c894cc40848ffc0ebed488b3d1900000048"
+        "89e648ffc2ff1505000000c9c30f1f00bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+    METH_FASTCALL: bytes.fromhex(
+        "31c9554889e54989d04885c974044c0341104a8d04c5170000004883e0f04829"
+        "c448893c2431c04c39c0730e4c8b0cc64c894cc40848ffc0ebed488b3d170000"
+        "004889e648ffc2ff1503000000c9c390bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+    METH_O: bytes.fromhex(
+        "4883ec0856574889e6488b3d20000000ba0200000031c9ff150b0000004883c4"
+        "18c3660f1f440000bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+    METH_NOARGS: bytes.fromhex(
+        "574889e6488b3d1d000000ba0100000031c9ff150800000059c3660f1f440000"
+        "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+}
+METHOD_VECTORCALL_INSTR_TEMPLATES: typing.Final[
+    typing.Dict[str, typing.Dict[str, typing.Dict[int, bytes]]]
+] = {
+    "linux": {
+        "aarch64": _METHOD_VECTORCALL_INSTR_aarch64_linux,
+        "x86_64": _METHOD_VECTORCALL_INSTR_amd64_linux,
+        "amd64": _METHOD_VECTORCALL_INSTR_amd64_linux,
+    },
+}
+
+# Slot wrappers, such as list.__len__, call the wrapper function of their
+# wrapperbase, keyed here by the wrapperbase flags.
+_WRAPPER_INSTR_aarch64_linux: typing.Final[typing.Dict[int, bytes]] = {
+    0: bytes.fromhex(
+        "220840f921600091e3031faafd7bbfa9fd030091e40302aa630000b4650840f9"
+        "8400058b85080091a5f87f92a5f07dd3ff6325cbe00300f9e6031faadf0004eb"
+        "a2000054277866f8c6040091e77b26f8fbffff1760010058e103009142040091"
+        "d000005800023fd6bf030091fd7bc1a8c0035fd61f2003d5"
+        "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+    PyWrapperFlag_KEYWORDS: bytes.fromhex(
+        "fd7bbda9fd030091430000b5e3010058e00701a9e31300f9e143009120010058"
+        "620080d2e3031faa9000005800023fd6fd7bc3a8c0035fd6"
+        "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaacccccccccccccccc"
+    ),
+}
+_WRAPPER_INSTR_amd64_linux: typing.Final[typing.Dict[int, bytes]] = {
+    0: bytes.fromhex(
+        "488b56104883c61831c9554889e54989d04885c974044c0341104a8d04c51700"
+        "00004883e0f04829c448893c2431c04c39c0730e4c8b0cc64c894cc40848ffc0"
+        "ebed488b3d170000004889e648ffc2ff1503000000c9c390"
+        "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+    ),
+    PyWrapperFlag_KEYWORDS: bytes.fromhex(
+        "4885c97507488b0d440000004883ec1848893c24488974240848894c2410488b"
+        "3d230000004889e6ba0300000031c9ff150b0000004883c418c3660f1f440000"
+        "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaacccccccccccccccc"
+    ),
+}
+WRAPPER_INSTR_TEMPLATES: typing.Final[
+    typing.Dict[str, typing.Dict[str, typing.Dict[int, bytes]]]
+] = {
+    "linux": {
+        "aarch64": _WRAPPER_INSTR_aarch64_linux,
+        "x86_64": _WRAPPER_INSTR_amd64_linux,
+        "amd64": _WRAPPER_INSTR_amd64_linux,
+    },
+}
+
+# Native policies, which never call back into the interpreter.
+# These ignore the call arguments, and so can replace any calling convention.
+_RETURN_INSTR_aarch64_linux: typing.Final[bytes] = bytes.fromhex(
+    "fd7bbfa9fd03009100010058b000005800023fd6a0000058fd7bc1a8c0035fd6"
+    "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+)
+_RETURN_INSTR_amd64_linux: typing.Final[bytes] = bytes.fromhex(
+    "4883ec08488b3d1d000000ff150f000000488b05100000004883c408c30f1f00"
+    "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+)
+_RETURN_INSTR_amd64_windows: typing.Final[bytes] = bytes.fromhex(
+    "4883ec28488b0d1d000000ff150f000000488b05100000004883c428c30f1f00"
+    "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+)
+RETURN_INSTR_TEMPLATES: typing.Final[typing.Dict[str, typing.Dict[str, bytes]]] = {
+    "linux": {
+        "aarch64": _RETURN_INSTR_aarch64_linux,
+        "x86_64": _RETURN_INSTR_amd64_linux,
+        "amd64": _RETURN_INSTR_amd64_linux,
+    },
+    "win32": {
+        "x86_64": _RETURN_INSTR_amd64_windows,
+        "amd64": _RETURN_INSTR_amd64_windows,
+    },
+}
+_RAISE_INSTR_aarch64_linux: typing.Final[bytes] = bytes.fromhex(
+    "fd7bbfa9fd0300914001005861010058d000005800023fd6e0031faafd7bc1a8"
+    "c0035fd61f2003d5bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaacccccccccccccccc"
+)
+_RAISE_INSTR_amd64_linux: typing.Final[bytes] = bytes.fromhex(
+    "4883ec08488b3d1d000000488b351e000000ff150800000031c04883c408c390"
+    "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaacccccccccccccccc"
+)
+_RAISE_INSTR_amd64_windows: typing.Final[bytes] = bytes.fromhex(
+    "4883ec28488b0d1d000000488b151e000000ff150800000031c04883c428c390"
+    "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaacccccccccccccccc"
+)
+RAISE_INSTR_TEMPLATES: typing.Final[typing.Dict[str, typing.Dict[str, bytes]]] = {
+    "linux": {
+        "aarch64": _RAISE_INSTR_aarch64_linux,
+        "x86_64": _RAISE_INSTR_amd64_linux,
+        "amd64": _RAISE_INSTR_amd64_linux,
+    },
+    "win32": {
+        "x86_64": _RAISE_INSTR_amd64_windows,
+        "amd64": _RAISE_INSTR_amd64_windows,
+    },
+}
+# Tail calls the C function of another builtin, which must share the calling
+# convention of the intercepted builtin.
+_REDIRECT_INSTR_aarch64_linux: typing.Final[bytes] = bytes.fromhex(
+    "c00000587000005800021fd61f2003d5bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+)
+_REDIRECT_INSTR_amd64_linux: typing.Final[bytes] = bytes.fromhex(
+    "488b3d11000000ff25030000000f1f00bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+)
+_REDIRECT_INSTR_amd64_windows: typing.Final[bytes] = bytes.fromhex(
+    "488b0d11000000ff25030000000f1f00bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaa"
+)
+REDIRECT_INSTR_TEMPLATES: typing.Final[typing.Dict[str, typing.Dict[str, bytes]]] = {
+    "linux": {
+        "aarch64": _REDIRECT_INSTR_aarch64_linux,
+        "x86_64": _REDIRECT_INSTR_amd64_linux,
+        "amd64": _REDIRECT_INSTR_amd64_linux,
+    },
+    "win32": {
+        "x86_64": _REDIRECT_INSTR_amd64_windows,
+        "amd64": _REDIRECT_INSTR_amd64_windows,
+    },
+}
+
+# Observers, which count calls to the C function of a builtin, and optionally
+# the ticks spent in those calls, before calling it with the same arguments.
+_COUNT_INSTR_aarch64_linux: typing.Final[bytes] = bytes.fromhex(
+    "90010058117e5fc831060091117e09c8a9ffff35a00000585000005800021fd6"
+    "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaacccccccccccccccc"
+)
+_COUNT_INSTR_amd64_linux: typing.Final[bytes] = bytes.fromhex(
+    "488b0521000000f048ff00488b3d0e000000ff2500000000"
+    "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaacccccccccccccccc"
+)
+_COUNT_INSTR_amd64_windows: typing.Final[bytes] = bytes.fromhex(
+    "488b0521000000f048ff00488b0d0e000000ff2500000000"
+    "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaacccccccccccccccc"
+)
+COUNT_INSTR_TEMPLATES: typing.Final[typing.Dict[str, typing.Dict[str, bytes]]] = {
+    "linux": {
+        "aarch64": _COUNT_INSTR_aarch64_linux,
+        "x86_64": _COUNT_INSTR_amd64_linux,
+        "amd64": _COUNT_INSTR_amd64_linux,
+    },
+    "win32": {
+        "x86_64": _COUNT_INSTR_amd64_windows,
+        "amd64": _COUNT_INSTR_amd64_windows,
+    },
+}
+_TIMED_COUNT_INSTR_aarch64_linux: typing.Final[bytes] = bytes.fromhex(
+    "fd7bbea9fd030091f30b00f9df3f03d553e03bd5a00200585002005800023fd6"
+    "df3f03d549e03bd5290113cb30020058117e5fc831060091117e0ac8aaffff35"
+    "10220091117e5fc83102098b117e0ac8aaffff35f30b40f9fd7bc2a8c0035fd6"
+    "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaacccccccccccccccc"
+)
+_TIMED_COUNT_INSTR_amd64_linux: typing.Final[bytes] = bytes.fromhex(
+    "5341544883ec084989d40f3148c1e2204809d04889c34c89e2488b3d38000000"
+    "ff152a0000004989c40f3148c1e2204809d04829d8488b0d24000000f048ff01"
+    "f0480141084c89e04883c408415c5bc3"
+    "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaacccccccccccccccc"
+)
+_TIMED_COUNT_INSTR_amd64_windows: typing.Final[bytes] = bytes.fromhex(
+    "53564883ec284889d60f3148c1e2204809d04889c34889f2488b0d39000000ff"
+    "152b0000004889c60f3148c1e2204809d04829d8488b0d25000000f048ff01f0"
+    "480141084889f04883c4285e5bc36690"
+    "bbbbbbbbbbbbbbbbaaaaaaaaaaaaaaaacccccccccccccccc"
+)
+TIMED_COUNT_INSTR_TEMPLATES: typing.Final[typing.Dict[str, typing.Dict[str, bytes]]] = {
+    "linux": {
+        "aarch64": _TIMED_COUNT_INSTR_aarch64_linux,
+        "x86_64": _TIMED_COUNT_INSTR_amd64_linux,
+        "amd64": _TIMED_COUNT_INSTR_amd64_linux,
+    },
+    "win32": {
+        "x86_64": _TIMED_COUNT_INSTR_amd64_windows,
+        "amd64": _TIMED_COUNT_INSTR_amd64_windows,
+    },
+}
+
+# Samplers, which count down a counter before each call to the C function of a
+# builtin, and jump to the handler trampoline that follows them when it runs
+# out, reloading it from the word after it. The counter is decremented with a
+# locked instruction, but the reload is not, so without the GIL the share of
+# handled calls is approximate. Assembled from handler/*/sample.s, on x86_64
+# only; other machines sample in the python guard of the chain instead.
+_SAMPLE_INSTR_amd64_linux: typing.Final[bytes] = bytes.fromhex(
+    "488b0531000000f0488328017e0d488b3d13000000ff25150000004c8b58084c8918eb1c0f1f40"
+    "00aaaaaaaaaaaaaaaabbbbbbbbbbbbbbbbcccccccccccccccc"
+)
+_SAMPLE_INSTR_amd64_windows: typing.Final[bytes] = bytes.fromhex(
+    "488b0531000000f0488328017e0d488b0d13000000ff25150000004c8b58084c8918eb1c0f1f40"
+    "00aaaaaaaaaaaaaaaabbbbbbbbbbbbbbbbcccccccccccccccc"
+)
+SAMPLE_INSTR_TEMPLATES: typing.Final[typing.Dict[str, typing.Dict[str, bytes]]] = {
+    "linux": {
+        "x86_64": _SAMPLE_INSTR_amd64_linux,
+        "amd64": _SAMPLE_INSTR_amd64_linux,
+    },
+    "win32": {
+        "x86_64": _SAMPLE_INSTR_amd64_windows,
+        "amd64": _SAMPLE_INSTR_amd64_windows,
+    },
+}
+# Scope guards, which jump to the handler trampoline that follows them if the
+# counter of active scopes is set, and otherwise to the C function. Assembled
+# from handler/*/scope.s, on x86_64 only; other machines check the scope in the
+# python guard of the chain instead.
+_SCOPE_INSTR_amd64_linux: typing.Final[bytes] = bytes.fromhex(
+    "488b0529000000488338007533488b3d0c000000ff250e000000660f1f440000"
+    "aaaaaaaaaaaaaaaabbbbbbbbbbbbbbbbcccccccccccccccc0f1f840000000000"
+)
+_SCOPE_INSTR_amd64_windows: typing.Final[bytes] = bytes.fromhex(
+    "488b0529000000488338007533488b0d0c000000ff250e000000660f1f440000"
+    "aaaaaaaaaaaaaaaabbbbbbbbbbbbbbbbcccccccccccccccc0f1f840000000000"
+)
+SCOPE_INSTR_TEMPLATES: typing.Final[typing.Dict[str, typing.Dict[str, bytes]]] = {
+    "linux": {
+        "x86_64": _SCOPE_INSTR_amd64_linux,
+        "amd64": _SCOPE_INSTR_amd64_linux,
+    },
+    "win32": {
+        "x86_64": _SCOPE_INSTR_amd64_windows,
+        "amd64": _SCOPE_INSTR_amd64_windows,
+    },
+}
+
+# Interpreter guards, which jump to the handler trampoline that follows them if
+# they are called from the interpreter that installed them, and otherwise to
+# the vectorcall function that they replaced. Assembled from
+# handler/*/interpreter.s, on x86_64 only; other machines intercept shared
+# types without the guard, so that other interpreters call the handler too.
+_INTERPRETER_INSTR_amd64_linux: typing.Final[bytes] = bytes.fromhex(
+    "575652514150ff152c0000004158595a5e5f483b050f0000007425ff250f0000000f1f80"
+    "00000000aaaaaaaaaaaaaaaabbbbbbbbbbbbbbbbcccccccccccccccc"
+)
+_INTERPRETER_INSTR_amd64_windows: typing.Final[bytes] = bytes.fromhex(
+    "5152415041514883ec28ff15300000004883c428415941585a59483b050f000000742dff25"
+    "0f0000000f1f8000000000aaaaaaaaaaaaaaaabbbbbbbbbbbbbbbbcccccccccccccccc"
+    "0f1f840000000000"
+)
+INTERPRETER_INSTR_TEMPLATES: typing.Final[typing.Dict[str, typing.Dict[str, bytes]]] = {
+    "linux": {
+        "x86_64": _INTERPRETER_INSTR_amd64_linux,
+        "amd64": _INTERPRETER_INSTR_amd64_linux,
+    },
+    "win32": {
+        "x86_64": _INTERPRETER_INSTR_amd64_windows,
+        "amd64": _INTERPRETER_INSTR_amd64_windows,
+    },
+}
+
+_CLEAR_CACHE_INSTR_aarch64_linux: typing.Final[bytes] = bytes.fromhex(
+    "23003bd5840080d2654c50d38520c59a660c40928620c69a0700028ba80400d10800288a"
+    "287b0bd50801058b1f0107eba3ffff549f3b03d52700028bc80400d12800288a28750bd5"
+    "0801068b1f0107eba3ffff549f3b03d5df3f03d5c0035fd6"
+)
+CLEAR_CACHE_INSTR_TEMPLATES: typing.Final[typing.Dict[str, typing.Dict[str, bytes]]] = {
+    "linux": {
+        "aarch64": _CLEAR_CACHE_INSTR_aarch64_linux,
+    },
+}
+
+
+def _platform_machine() -> str:
+    # platform.machine() without importing platform, which is slow to import
+    if hasattr(os, "uname"):
+        return os.uname().machine.lower()
+    return (
+        os.environ.get("PROCESSOR_ARCHITEW6432", "")
+        or os.environ.get("PROCESSOR_ARCHITECTURE", "")
+    ).lower()
+
+
+_machine = _platform_machine()
+# x86 keeps instruction fetch coherent with stores to either view of a page
+CLEAR_CACHE_INSTR: typing.Final[
+    typing.Optional[bytes]
+] = CLEAR_CACHE_INSTR_TEMPLATES.get(sys.platform, {}).get(_machine)
+INSTR_TEMPLATE: typing.Final[bytes] = _fill_template(
+    INSTR_TEMPLATES[sys.platform][_machine], b"\xbb" * 8, PyObject_Call_address
+)
+_vectorcall_instr_templates = VECTORCALL_INSTR_TEMPLATES.get(sys.platform, {}).get(
+    _machine, {}
+)
+VECTORCALL_INSTR_TEMPLATE: typing.Final[typing.Dict[int, bytes]] = {
+    ml_flags: _fill_template(
+        vectorcall_instr_template, b"\xbb" * 8, _PyFunction_Vectorcall_address
+    )
+    for ml_flags, vectorcall_instr_template in _vectorcall_instr_templates.items()
+    if _PyFunction_Vectorcall_address is not None
+}
+# Used when the handler is not a python function
+GENERIC_VECTORCALL_INSTR_TEMPLATE: typing.Final[typing.Dict[int, bytes]] = {
+    ml_flags: _fill_template(
+        vectorcall_instr_template, b"\xbb" * 8, PyObject_Vectorcall_address
+    )
+    for ml_flags, vectorcall_instr_template in _vectorcall_instr_templates.items()
+    if PyObject_Vectorcall_address is not None
+}
+_method_vectorcall_instr_templates = METHOD_VECTORCALL_INSTR_TEMPLATES.get(
+    sys.platform, {}
+).get(_machine, {})
+METHOD_VECTORCALL_INSTR_TEMPLATE: typing.Final[typing.Dict[int, bytes]] = {
+    ml_flags: _fill_template(
+        vectorcall_instr_template, b"\xbb" * 8, _PyFunction_Vectorcall_address
+    )
+    for ml_flags, vectorcall_instr_template in _method_vectorcall_instr_templates.items()
+    if _PyFunction_Vectorcall_address is not None
+}
+_wrapper_instr_templates = WRAPPER_INSTR_TEMPLATES.get(sys.platform, {}).get(
+    _machine, {}
+)
+WRAPPER_INSTR_TEMPLATE: typing.Final[typing.Dict[int, bytes]] = {
+    flags: _fill_template(
+        wrapper_instr_template, b"\xbb" * 8, _PyFunction_Vectorcall_address
+    )
+    for flags, wrapper_instr_template in _wrapper_instr_templates.items()
+    if _PyFunction_Vectorcall_address is not None
+}
+if PyWrapperFlag_KEYWORDS in WRAPPER_INSTR_TEMPLATE:
+    # missing keyword arguments are passed to the handler as None
+    WRAPPER_INSTR_TEMPLATE[PyWrapperFlag_KEYWORDS] = _fill_template(
+        WRAPPER_INSTR_TEMPLATE[PyWrapperFlag_KEYWORDS],
+        b"\xcc" * 8,
+        struct.pack("N", id(None)),
+    )
+_return_instr_template = RETURN_INSTR_TEMPLATES.get(sys.platform, {}).get(_machine)
+RETURN_INSTR_TEMPLATE: typing.Final[typing.Optional[bytes]] = (
+    _fill_template(_return_instr_template, b"\xbb" * 8, Py_IncRef_address)
+    if _return_instr_template is not None and Py_IncRef_address is not None
+    else None
+)
+_raise_instr_template = RAISE_INSTR_TEMPLATES.get(sys.platform, {}).get(_machine)
+RAISE_INSTR_TEMPLATE: typing.Final[typing.Optional[bytes]] = (
+    _fill_template(_raise_instr_template, b"\xbb" * 8, PyErr_SetObject_address)
+    if _raise_instr_template is not None and PyErr_SetObject_address is not None
+    else None
+)
+REDIRECT_INSTR_TEMPLATE: typing.Final[
+    typing.Optional[bytes]
+] = REDIRECT_INSTR_TEMPLATES.get(sys.platform, {}).get(_machine)
+COUNT_INSTR_TEMPLATE: typing.Final[typing.Optional[bytes]] = COUNT_INSTR_TEMPLATES.get(
+    sys.platform, {}
+).get(_machine)
+TIMED_COUNT_INSTR_TEMPLATE: typing.Final[
+    typing.Optional[bytes]
+] = TIMED_COUNT_INSTR_TEMPLATES.get(sys.platform, {}).get(_machine)
+SAMPLE_INSTR_TEMPLATE: typing.Final[
+    typing.Optional[bytes]
+] = SAMPLE_INSTR_TEMPLATES.get(sys.platform, {}).get(_machine)
+SCOPE_INSTR_TEMPLATE: typing.Final[typing.Optional[bytes]] = SCOPE_INSTR_TEMPLATES.get(
+    sys.platform, {}
+).get(_machine)
+_interpreter_instr_template = INTERPRETER_INSTR_TEMPLATES.get(sys.platform, {}).get(
+    _machine
+)
+INTERPRETER_INSTR_TEMPLATE: typing.Final[typing.Optional[bytes]] = (
+    _fill_template(
+        _interpreter_instr_template, b"\xcc" * PTR_SIZE, PyInterpreterState_Get_address
+    )
+    if _interpreter_instr_template is not None
+    and PyInterpreterState_Get_address is not None
+    and INTERPRETER is not None
+    else None
+)
+
+# The specializing interpreter (3.11+) inlines calls to these builtins based on
+# their identity and calling convention, skipping the method def entirely.
+# Changing their calling convention prevents that specialization.
+_INLINED_BUILTINS: typing.Final[typing.Tuple[object, ...]] = (
+    (len, isinstance, list.append) if sys.version_info >= (3, 11) else ()
 )
 
-_id_bytes = ctypes.string_at(id(id), 8 * PTR_SIZE)
+_id_bytes = ctypes.string_at(id(id), type(id).__basicsize__)
+make_immortal(id(_id_bytes) + _BYTES_DATA_OFFSET)
 get_addr: typing.Callable[[object], int] = ctypes.cast(
     typing.cast(ctypes._SimpleCData, _id_bytes),
     ctypes.py_object,
 ).value
 
 
-def replace_cfunction_base(
-    obj: types.BuiltinFunctionType,
-    handler: typing.Callable,
-    malloc: typing.Callable[[int], typing.Tuple[int, typing.Callable[[], int]]],
-    mprotect: typing.Callable[[int, int], None],
-    instr_template: bytes = INSTR_TEMPLATE,
-) -> typing.Tuple[bytes, typing.Callable[[], int]]:
-    obj_addr = get_addr(obj)
+def _method_def_words(
+    obj: typing.Callable, method_def_offset: int = _CFUNCTION_METHOD_DEF_OFFSET
+) -> typing.List[int]:
     (obj_method_def_addr,) = struct.unpack(
         "N",
-        ctypes.string_at(obj_addr + 2 * PTR_SIZE, 1 * PTR_SIZE),
+        ctypes.string_at(get_addr(obj) + method_def_offset * PTR_SIZE, 1 * PTR_SIZE),
     )
+    obj_method_def = ctypes.string_at(obj_method_def_addr, 4 * PTR_SIZE)
+    return list(struct.unpack("NNNN", obj_method_def))
 
-    # build function byte string
-    i = instr_template.index(b"\xaa" * PTR_SIZE)
-    instr = (
-        instr_template[:i]
-        + struct.pack("N", id(handler))
-        + instr_template[i + PTR_SIZE :]
+
+def _cfunction_self(obj: types.BuiltinFunctionType) -> int:
+    (m_self,) = struct.unpack(
+        "N",
+        ctypes.string_at(get_addr(obj) + _CFUNCTION_SELF_OFFSET * PTR_SIZE, PTR_SIZE),
     )
-    instr_len = len(instr_template)
+    return m_self
+
+
+def _install_instr(
+    obj: typing.Callable,
+    method_def_words: typing.List[int],
+    instr: bytes,
+    vectorcall: typing.Optional[int],
+    malloc: typing.Callable[[int], typing.Tuple[int, typing.Callable[[], int]]],
+    write: typing.Callable[[int, bytes], None],
+    method_def_offset: int = _CFUNCTION_METHOD_DEF_OFFSET,
+) -> typing.Tuple[bytes, typing.Callable[[], int]]:
+    obj_addr = get_addr(obj)
 
     # allocate memory
-    addr, dealloc = malloc(instr_len)
+    addr, dealloc = malloc(len(instr))
     # write memory
-    ctypes.memmove(addr, instr, instr_len)
-    # change memory protection
-    mprotect(addr, instr_len)
+    write(addr, instr)
 
     # create replacement MethodDef
-    obj_method_def = ctypes.string_at(obj_method_def_addr, 4 * PTR_SIZE)
-    method_def_words = list(struct.unpack("NNNN", obj_method_def))
     method_def_words[1] = addr
-    method_def_words[2] = 3
     handler_method_def = struct.pack("NNNN", *method_def_words)
     handler_method_def_addr = struct.pack(
-        "N", get_addr(handler_method_def) + 4 * PTR_SIZE
+        "N", get_addr(handler_method_def) + _BYTES_DATA_OFFSET
     )
 
-    # set method def
-    ctypes.memmove(obj_addr + 2 * PTR_SIZE, handler_method_def_addr, PTR_SIZE)
-    # set vector call
-    ctypes.memset(obj_addr + 6 * PTR_SIZE, 0, PTR_SIZE)
+    # set method def, and the vectorcall in the same write, so that no thread
+    # calls the new method def through the old vectorcall function
+    method_def_addr = obj_addr + method_def_offset * PTR_SIZE
+    if vectorcall is None:
+        publish(method_def_addr, handler_method_def_addr)
+    else:
+        publish(
+            method_def_addr,
+            handler_method_def_addr
+            + ctypes.string_at(
+                method_def_addr + PTR_SIZE,
+                (_VECTORCALL_OFFSET - method_def_offset - 1) * PTR_SIZE,
+            )
+            + struct.pack("N", vectorcall),
+        )
 
     return handler_method_def, dealloc
 
 
+def _is_inlined(obj: typing.Callable) -> bool:
+    return any(obj is builtin for builtin in _INLINED_BUILTINS)
+
+
+def replace_cfunction_base(
+    obj: types.BuiltinFunctionType,
+    handler: typing.Callable,
+    malloc: typing.Callable[[int], typing.Tuple[int, typing.Callable[[], int]]],
+    write: typing.Callable[[int, bytes], None],
+    instr_template: bytes = INSTR_TEMPLATE,
+    vectorcall_instr_templates: typing.Mapping[int, bytes] = VECTORCALL_INSTR_TEMPLATE,
+) -> typing.Tuple[bytes, typing.Callable[[], int]]:
+    method_def_words = _method_def_words(obj)
+    ml_flags = method_def_words[2] & 0xFFFFFFFF
+
+    # select a trampoline with the same calling convention as the builtin,
+    # falling back to METH_VARARGS | METH_KEYWORDS through PyObject_Call
+    vectorcall = None
+    template = vectorcall_instr_templates.get(ml_flags & _METH_CALL_FLAGS)
+    if template is None or _is_inlined(obj):
+        vectorcall = 0
+        template = instr_template
+        method_def_words[2] = METH_VARARGS | METH_KEYWORDS
+
+    # build function byte string
+    instr = _fill_template(template, b"\xaa" * PTR_SIZE, struct.pack("N", id(handler)))
+
+    return _install_instr(obj, method_def_words, instr, vectorcall, malloc, write)
+
+
+def replace_cfunction_instr_base(
+    obj: types.BuiltinFunctionType,
+    instr: bytes,
+    malloc: typing.Callable[[int], typing.Tuple[int, typing.Callable[[], int]]],
+    write: typing.Callable[[int, bytes], None],
+) -> typing.Tuple[bytes, typing.Callable[[], int]]:
+    method_def_words = _method_def_words(obj)
+    vectorcall = None
+    if _is_inlined(obj):
+        vectorcall = 0
+        method_def_words[2] = METH_VARARGS | METH_KEYWORDS
+    return _install_instr(obj, method_def_words, instr, vectorcall, malloc, write)
+
+
+def replace_cfunction_guard_base(
+    obj: types.BuiltinFunctionType,
+    handler: typing.Callable,
+    guard_template: typing.Optional[bytes],
+    counter_address: int,
+    malloc: typing.Callable[[int], typing.Tuple[int, typing.Callable[[], int]]],
+    write: typing.Callable[[int, bytes], None],
+    vectorcall_instr_templates: typing.Mapping[int, bytes] = VECTORCALL_INSTR_TEMPLATE,
+) -> typing.Optional[typing.Tuple[bytes, typing.Callable[[], int]]]:
+    # the guard reads a counter, and either jumps to the C function of the
+    # builtin or falls through to the handler trampoline
+    if guard_template is None or _is_inlined(obj):
+        return None
+    method_def_words = _method_def_words(obj)
+    ml_flags = method_def_words[2] & _METH_CALL_FLAGS
+
+    # guarded calls go to the C function, so the calling convention of the
+    # builtin must be kept
+    template = vectorcall_instr_templates.get(ml_flags)
+    if template is None and ml_flags == METH_VARARGS | METH_KEYWORDS:
+        template = INSTR_TEMPLATE
+    if template is None:
+        return None
+
+    m_self = _cfunction_self(obj)
+    prefix = _fill_template(
+        guard_template, b"\xaa" * PTR_SIZE, struct.pack("N", m_self)
+    )
+    prefix = _fill_template(
+        prefix, b"\xbb" * PTR_SIZE, struct.pack("N", method_def_words[1])
+    )
+    prefix = _fill_template(
+        prefix, b"\xcc" * PTR_SIZE, struct.pack("N", counter_address)
+    )
+    instr = _fill_template(template, b"\xaa" * PTR_SIZE, struct.pack("N", id(handler)))
+
+    return _install_instr(obj, method_def_words, prefix + instr, None, malloc, write)
+
+
+def _method_descriptor_vectorcall(ml_flags: int) -> typing.Optional[int]:
+    # The vectorcall of a method descriptor only depends on its calling
+    # convention, so it is copied from a builtin method with the same flags.
+    for cls in (str, bytes, list, dict, set, int, float):
+        for descr in vars(cls).values():
+            if (
+                type(descr) is types.MethodDescriptorType
+                and _method_def_words(descr, _METHOD_DESCRIPTOR_METHOD_DEF_OFFSET)[2]
+                & _METH_CALL_FLAGS
+                == ml_flags
+            ):
+                (vectorcall,) = struct.unpack(
+                    "N",
+                    ctypes.string_at(
+                        get_addr(descr) + _VECTORCALL_OFFSET * PTR_SIZE, PTR_SIZE
+                    ),
+                )
+                return vectorcall
+    return None  # pragma: no cover
+
+
+def replace_method_descriptor_base(
+    obj: types.MethodDescriptorType,
+    handler: typing.Callable,
+    malloc: typing.Callable[[int], typing.Tuple[int, typing.Callable[[], int]]],
+    write: typing.Callable[[int, bytes], None],
+    method_vectorcall_instr_templates: typing.Mapping[
+        int, bytes
+    ] = METHOD_VECTORCALL_INSTR_TEMPLATE,
+) -> typing.Tuple[bytes, typing.Callable[[], int]]:
+    method_def_words = _method_def_words(obj, _METHOD_DESCRIPTOR_METHOD_DEF_OFFSET)
+    ml_flags = method_def_words[2] & 0xFFFFFFFF
+
+    # select a trampoline with the same calling convention as the method,
+    # falling back to METH_FASTCALL | METH_KEYWORDS, with its vectorcall
+    vectorcall = None
+    template = method_vectorcall_instr_templates.get(ml_flags & _METH_CALL_FLAGS)
+    if template is None or _is_inlined(obj):
+        template = method_vectorcall_instr_templates.get(METH_FASTCALL_KEYWORDS)
+        vectorcall = _method_descriptor_vectorcall(METH_FASTCALL_KEYWORDS)
+        if template is None or vectorcall is None:
+            raise NotImplementedError(
+                f"Unsupported platform for method descriptors: {sys.platform}"
+            )
+        method_def_words[2] = (ml_flags & ~_METH_CALL_FLAGS) | METH_FASTCALL_KEYWORDS
+
+    # build function byte string
+    instr = _fill_template(template, b"\xaa" * PTR_SIZE, struct.pack("N", id(handler)))
+
+    return _install_instr(
+        obj,
+        method_def_words,
+        instr,
+        vectorcall,
+        malloc,
+        write,
+        _METHOD_DESCRIPTOR_METHOD_DEF_OFFSET,
+    )
+
+
+def replace_method_descriptor_instr_base(
+    obj: types.MethodDescriptorType,
+    instr: bytes,
+    malloc: typing.Callable[[int], typing.Tuple[int, typing.Callable[[], int]]],
+    write: typing.Callable[[int, bytes], None],
+) -> typing.Tuple[bytes, typing.Callable[[], int]]:
+    method_def_words = _method_def_words(obj, _METHOD_DESCRIPTOR_METHOD_DEF_OFFSET)
+    ml_flags = method_def_words[2] & 0xFFFFFFFF
+    vectorcall = None
+    if _is_inlined(obj):
+        vectorcall = _method_descriptor_vectorcall(METH_FASTCALL_KEYWORDS)
+        method_def_words[2] = (ml_flags & ~_METH_CALL_FLAGS) | METH_FASTCALL_KEYWORDS
+    return _install_instr(
+        obj,
+        method_def_words,
+        instr,
+        vectorcall,
+        malloc,
+        write,
+        _METHOD_DESCRIPTOR_METHOD_DEF_OFFSET,
+    )
+
+
+def _install_wrapper_instr(
+    obj: types.WrapperDescriptorType,
+    instr: bytes,
+    malloc: typing.Callable[[int], typing.Tuple[int, typing.Callable[[], int]]],
+    write: typing.Callable[[int, bytes], None],
+) -> typing.Tuple[bytes, typing.Callable[[], int]]:
+    obj_addr = get_addr(obj)
+    (wrapperbase_addr,) = struct.unpack(
+        "N",
+        ctypes.string_at(
+            obj_addr + _WRAPPER_DESCRIPTOR_BASE_OFFSET * PTR_SIZE, PTR_SIZE
+        ),
+    )
+    wrapperbase_words = list(
+        struct.unpack(
+            "N" * _WRAPPERBASE_SIZE,
+            ctypes.string_at(wrapperbase_addr, _WRAPPERBASE_SIZE * PTR_SIZE),
+        )
+    )
+
+    # allocate memory
+    addr, dealloc = malloc(len(instr))
+    # write memory
+    write(addr, instr)
+
+    # create replacement wrapperbase
+    wrapperbase_words[_WRAPPERBASE_WRAPPER] = addr
+    handler_wrapperbase = struct.pack("N" * _WRAPPERBASE_SIZE, *wrapperbase_words)
+    handler_wrapperbase_addr = struct.pack(
+        "N", get_addr(handler_wrapperbase) + _BYTES_DATA_OFFSET
+    )
+
+    # set wrapperbase
+    publish(
+        obj_addr + _WRAPPER_DESCRIPTOR_BASE_OFFSET * PTR_SIZE, handler_wrapperbase_addr
+    )
+    return handler_wrapperbase, dealloc
+
+
+def wrapper_descriptor_flags(obj: types.WrapperDescriptorType) -> int:
+    (wrapperbase_addr,) = struct.unpack(
+        "N",
+        ctypes.string_at(
+            get_addr(obj) + _WRAPPER_DESCRIPTOR_BASE_OFFSET * PTR_SIZE, PTR_SIZE
+        ),
+    )
+    (flags,) = struct.unpack(
+        "i", ctypes.string_at(wrapperbase_addr + _WRAPPERBASE_FLAGS * PTR_SIZE, 4)
+    )
+    return flags
+
+
+def replace_wrapper_descriptor_base(
+    obj: types.WrapperDescriptorType,
+    handler: typing.Callable,
+    malloc: typing.Callable[[int], typing.Tuple[int, typing.Callable[[], int]]],
+    write: typing.Callable[[int, bytes], None],
+    wrapper_instr_templates: typing.Mapping[int, bytes] = WRAPPER_INSTR_TEMPLATE,
+) -> typing.Tuple[bytes, typing.Callable[[], int]]:
+    flags = wrapper_descriptor_flags(obj)
+    template = wrapper_instr_templates.get(flags & PyWrapperFlag_KEYWORDS)
+    if template is None:
+        raise NotImplementedError(
+            f"Unsupported platform for slot wrappers: {sys.platform}"
+        )
+
+    # build function byte string
+    instr = _fill_template(template, b"\xaa" * PTR_SIZE, struct.pack("N", id(handler)))
+
+    return _install_wrapper_instr(obj, instr, malloc, write)
+
+
+def replace_wrapper_descriptor_instr_base(
+    obj: types.WrapperDescriptorType,
+    instr: bytes,
+    malloc: typing.Callable[[int], typing.Tuple[int, typing.Callable[[], int]]],
+    write: typing.Callable[[int, bytes], None],
+) -> typing.Tuple[bytes, typing.Callable[[], int]]:
+    return _install_wrapper_instr(obj, instr, malloc, write)
+
+
+def vectorcall_offset(obj_type: type) -> typing.Optional[int]:
+    r"""Returns the offset of the vectorcall pointer in objects of a type.
+
+    :returns: The offset in bytes, or None if the type does not support
+        vectorcall.
+    """
+    if not obj_type.__flags__ & Py_TPFLAGS_HAVE_VECTORCALL:
+        return None
+    (offset,) = struct.unpack(
+        "n",
+        ctypes.string_at(
+            get_addr(obj_type) + _TYPE_VECTORCALL_OFFSET * PTR_SIZE, PTR_SIZE
+        ),
+    )
+    return offset or None
+
+
+def _vectorcall_address(obj: typing.Callable) -> int:
+    return get_addr(obj) + typing.cast(int, vectorcall_offset(type(obj)))
+
+
+def is_shared(obj: object) -> bool:
+    r"""Returns whether an object is shared by all interpreters.
+
+    Static types are, while functions and builtins belong to the interpreter
+    that created them. Descriptors are shared if their type is, since
+    intercepting them patches the slots of the type as well.
+    """
+    if isinstance(obj, (types.MethodDescriptorType, types.WrapperDescriptorType)):
+        obj = obj.__objclass__
+    return isinstance(obj, type) and not obj.__flags__ & Py_TPFLAGS_HEAPTYPE
+
+
+def interpreter_instr(obj: typing.Callable) -> typing.Optional[bytes]:
+    r"""Returns a guard for the vectorcall trampoline of a shared object, which
+    other interpreters skip, calling its current vectorcall function instead.
+    """
+    if INTERPRETER_INSTR_TEMPLATE is None or not is_shared(obj):
+        return None
+    instr = _fill_template(
+        INTERPRETER_INSTR_TEMPLATE,
+        b"\xaa" * PTR_SIZE,
+        struct.pack("N", typing.cast(int, INTERPRETER)),
+    )
+    return _fill_template(
+        instr, b"\xbb" * PTR_SIZE, struct.pack("N", read_vectorcall(obj))
+    )
+
+
+def read_vectorcall(obj: typing.Callable) -> int:
+    (vectorcall,) = struct.unpack(
+        "N", ctypes.string_at(_vectorcall_address(obj), PTR_SIZE)
+    )
+    return vectorcall
+
+
+def replace_vectorcall_instr_base(
+    obj: typing.Callable,
+    instr: bytes,
+    malloc: typing.Callable[[int], typing.Tuple[int, typing.Callable[[], int]]],
+    write: typing.Callable[[int, bytes], None],
+) -> typing.Tuple[bytes, typing.Callable[[], int]]:
+    # a vectorcall function has the signature of a METH_FASTCALL | METH_KEYWORDS
+    # function, with the callable itself in place of self
+    guard = interpreter_instr(obj)
+    if guard is not None:
+        instr = guard + instr
+    addr, dealloc = malloc(len(instr))
+    write(addr, instr)
+    publish(_vectorcall_address(obj), struct.pack("N", addr))
+    return instr, dealloc
+
+
+def replace_vectorcall_base(
+    obj: typing.Callable,
+    handler: typing.Callable,
+    malloc: typing.Callable[[int], typing.Tuple[int, typing.Callable[[], int]]],
+    write: typing.Callable[[int, bytes], None],
+    vectorcall_instr_templates: typing.Mapping[int, bytes] = VECTORCALL_INSTR_TEMPLATE,
+) -> typing.Tuple[bytes, typing.Callable[[], int]]:
+    template = vectorcall_instr_templates.get(METH_FASTCALL_KEYWORDS)
+    if template is None:
+        raise NotImplementedError(f"Unsupported platform for {type(obj)}")
+    instr = _fill_template(template, b"\xaa" * PTR_SIZE, struct.pack("N", id(handler)))
+    return replace_vectorcall_instr_base(obj, instr, malloc, write)
+
+
+def call_vectorcall_instr(
+    obj: typing.Callable, vectorcall: int
+) -> typing.Optional[bytes]:
+    r"""Returns a METH_FASTCALL | METH_KEYWORDS function that calls an object
+    through the given vectorcall function.
+    """
+    template = _vectorcall_instr_templates.get(METH_FASTCALL_KEYWORDS)
+    if template is None:
+        return None
+    instr = _fill_template(template, b"\xaa" * PTR_SIZE, struct.pack("N", id(obj)))
+    return _fill_template(instr, b"\xbb" * PTR_SIZE, struct.pack("N", vectorcall))
+
+
+# creates a builtin function from a method def, its self, and its module
+_PyCFunction_NewEx = ctypes.PYFUNCTYPE(
+    ctypes.py_object, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p
+)(("PyCFunction_NewEx", ctypes.pythonapi))
+
+
+class PyMethodDef(ctypes.Structure):
+    _fields_ = [
+        ("ml_name", ctypes.c_char_p),
+        ("ml_meth", ctypes.c_void_p),
+        ("ml_flags", ctypes.c_int),
+        ("ml_doc", ctypes.c_char_p),
+    ]
+
+
+def new_vectorcall_caller_base(
+    obj: typing.Callable,
+    vectorcall: int,
+    malloc: typing.Callable[[int], typing.Tuple[int, typing.Callable[[], int]]],
+    write: typing.Callable[[int, bytes], None],
+) -> typing.Optional[
+    typing.Tuple[types.BuiltinFunctionType, PyMethodDef, typing.Callable[[], int]]
+]:
+    r"""Returns a new builtin function that calls an object through the given
+    vectorcall function, with the method def it is created from and a function
+    that frees its trampoline. The method def must outlive the builtin.
+    """
+    instr = call_vectorcall_instr(obj, vectorcall)
+    if instr is None:
+        return None
+    addr, dealloc = malloc(len(instr))
+    write(addr, instr)
+    name = getattr(obj, "__name__", None)
+    if name.__class__ is not str:
+        name = type(obj).__name__
+    method_def = PyMethodDef(
+        typing.cast(str, name).encode(), addr, METH_FASTCALL_KEYWORDS, None
+    )
+    caller = _PyCFunction_NewEx(ctypes.addressof(method_def), None, None)
+    return caller, method_def, dealloc
+
+
+def return_instr(value: object) -> typing.Optional[bytes]:
+    if RETURN_INSTR_TEMPLATE is None:
+        return None
+    return _fill_template(
+        RETURN_INSTR_TEMPLATE, b"\xaa" * PTR_SIZE, struct.pack("N", id(value))
+    )
+
+
+def raise_instr(
+    exception_type: typing.Type[BaseException], args: tuple
+) -> typing.Optional[bytes]:
+    if RAISE_INSTR_TEMPLATE is None:
+        return None
+    instr = _fill_template(
+        RAISE_INSTR_TEMPLATE, b"\xaa" * PTR_SIZE, struct.pack("N", id(exception_type))
+    )
+    return _fill_template(instr, b"\xcc" * PTR_SIZE, struct.pack("N", id(args)))
+
+
+def redirect_instr(
+    obj: types.BuiltinFunctionType, target: typing.Callable
+) -> typing.Optional[bytes]:
+    if (
+        REDIRECT_INSTR_TEMPLATE is None
+        or not isinstance(target, types.BuiltinFunctionType)
+        or _is_inlined(obj)
+    ):
+        return None
+    ml_flags = _method_def_words(obj)[2] & _METH_CALL_FLAGS
+    _, ml_meth, target_ml_flags, _ = _method_def_words(target)
+    if ml_flags != target_ml_flags & _METH_CALL_FLAGS or ml_flags & METH_METHOD:
+        return None
+    m_self = _cfunction_self(target)
+    instr = _fill_template(
+        REDIRECT_INSTR_TEMPLATE, b"\xaa" * PTR_SIZE, struct.pack("N", m_self)
+    )
+    return _fill_template(instr, b"\xbb" * PTR_SIZE, struct.pack("N", ml_meth))
+
+
+def count_instr(
+    obj: types.BuiltinFunctionType,
+    counter_address: int,
+    timed: bool,
+    original: types.BuiltinFunctionType,
+) -> typing.Optional[bytes]:
+    template = TIMED_COUNT_INSTR_TEMPLATE if timed else COUNT_INSTR_TEMPLATE
+    if template is None:
+        return None
+    if _is_inlined(obj):
+        # the calling convention is replaced, so call a copy of the original
+        # builtin through PyObject_Call instead of its C function
+        m_self = id(original)
+        (ml_meth,) = struct.unpack("N", PyObject_Call_address)
+    else:
+        m_self = _cfunction_self(obj)
+        ml_meth = _method_def_words(obj)[1]
+    instr = _fill_template(template, b"\xaa" * PTR_SIZE, struct.pack("N", m_self))
+    instr = _fill_template(instr, b"\xbb" * PTR_SIZE, struct.pack("N", ml_meth))
+    return _fill_template(instr, b"\xcc" * PTR_SIZE, struct.pack("N", counter_address))
+
+
 __all__ = [
+    "call_vectorcall_instr",
+    "count_instr",
     "get_addr",
-    "replace_cfunction",
+    "interpreter_instr",
+    "is_shared",
+    "make_immortal",
+    "new_vectorcall_caller_base",
+    "publish",
+    "raise_instr",
+    "read_vectorcall",
+    "redirect_instr",
+    "replace_cfunction_base",
+    "replace_cfunction_instr_base",
+    "replace_cfunction_guard_base",
+    "replace_method_descriptor_base",
+    "replace_method_descriptor_instr_base",
+    "replace_vectorcall_base",
+    "replace_vectorcall_instr_base",
+    "replace_wrapper_descriptor_base",
+    "replace_wrapper_descriptor_instr_base",
+    "return_instr",
+    "state_view",
+    "vectorcall_offset",
+    "wrapper_descriptor_flags",
+    "CLEAR_CACHE_INSTR",
+    "CLEAR_CACHE_INSTR_TEMPLATES",
+    "COUNT_INSTR_TEMPLATE",
+    "COUNT_INSTR_TEMPLATES",
+    "GENERIC_VECTORCALL_INSTR_TEMPLATE",
+    "HEAD_WORDS",
     "INSTR_TEMPLATE",
     "INSTR_TEMPLATES",
+    "INTERPRETER",
+    "INTERPRETER_INSTR_TEMPLATE",
+    "INTERPRETER_INSTR_TEMPLATES",
+    "METHOD_VECTORCALL_INSTR_TEMPLATE",
+    "MAIN_INTERPRETER",
+    "METHOD_VECTORCALL_INSTR_TEMPLATES",
     "PTR_SIZE",
+    "Py_GIL_DISABLED",
+    "PyMethodDef",
+    "PyWrapperFlag_KEYWORDS",
+    "Py_TPFLAGS_HAVE_VECTORCALL",
+    "Py_TPFLAGS_HEAPTYPE",
+    "RAISE_INSTR_TEMPLATE",
+    "RAISE_INSTR_TEMPLATES",
+    "REDIRECT_INSTR_TEMPLATE",
+    "REDIRECT_INSTR_TEMPLATES",
+    "RETURN_INSTR_TEMPLATE",
+    "RETURN_INSTR_TEMPLATES",
+    "SAMPLE_INSTR_TEMPLATE",
+    "SAMPLE_INSTR_TEMPLATES",
+    "SCOPE_INSTR_TEMPLATE",
+    "SCOPE_INSTR_TEMPLATES",
+    "TIMED_COUNT_INSTR_TEMPLATE",
+    "TIMED_COUNT_INSTR_TEMPLATES",
+    "VECTORCALL_INSTR_TEMPLATE",
+    "VECTORCALL_INSTR_TEMPLATES",
+    "WRAPPER_INSTR_TEMPLATE",
+    "WRAPPER_INSTR_TEMPLATES",
 ]
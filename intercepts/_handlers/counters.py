@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import ctypes
+import mmap
+import struct
+import threading
+import typing
+
+# Each counter takes a full cache line, so that builtins called from different
+# threads do not contend on the same line. Counters are kept on their own pages,
+# since stores to a page holding executing code are expensive on x86.
+COUNTER_SIZE = 64
+_COUNTER_FORMAT = f"QQ{COUNTER_SIZE - 16}x"
+
+
+class CounterTable:
+    r"""A table of call counters updated atomically by count trampolines.
+
+    Each counter holds the number of calls and the number of ticks spent in
+    those calls, as two 64 bit integers at the start of its slot.
+    """
+
+    def __init__(self, pagesize: int):
+        self.pagesize = pagesize
+        self._pages: typing.List[typing.Tuple[mmap.mmap, int]] = []
+        self._free: typing.List[int] = []
+        self._next = 0
+        # counters are freed by finalizers, which may run while a counter is
+        # allocated, so only allocation takes the lock
+        self._lock = threading.Lock()
+
+    @property
+    def _counters_per_page(self) -> int:
+        return self.pagesize // COUNTER_SIZE
+
+    def alloc(self) -> int:
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+            index = self._next
+            if index // self._counters_per_page == len(self._pages):
+                page = mmap.mmap(-1, self.pagesize)
+                self._pages.append(
+                    (page, ctypes.addressof(ctypes.c_char.from_buffer(page)))
+                )
+            self._next += 1
+            return index
+
+    def address(self, index: int) -> int:
+        page_index, offset = divmod(index, self._counters_per_page)
+        return self._pages[page_index][1] + offset * COUNTER_SIZE
+
+    def free(self, index: int) -> None:
+        ctypes.memset(self.address(index), 0, COUNTER_SIZE)
+        self._free.append(index)
+
+    def read(self) -> typing.List[typing.Tuple[int, int]]:
+        counters: typing.List[typing.Tuple[int, int]] = []
+        for page, _ in self._pages:
+            counters.extend(
+                typing.cast(
+                    typing.Iterator[typing.Tuple[int, int]],
+                    struct.iter_unpack(_COUNTER_FORMAT, page),
+                )
+            )
+        return counters[: self._next]
+
+
+__all__ = ["CounterTable", "COUNTER_SIZE"]
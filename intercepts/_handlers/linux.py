@@ -4,21 +4,54 @@ import ctypes
 import os
 import typing
 
-CDLL = ctypes.CDLL(ctypes.util.find_library("c"))
 PAGESIZE = os.sysconf("SC_PAGE_SIZE")
 
-CDLL.mmap.argtypes = [
-    ctypes.c_void_p,
-    ctypes.c_size_t,
-    ctypes.c_uint32,
-    ctypes.c_uint32,
-    ctypes.c_uint32,
-    ctypes.c_uint32,
-]
-CDLL.mmap.restype = ctypes.c_void_p
+_CDLL: typing.Optional[ctypes.CDLL] = None
+
+
+def _libc() -> ctypes.CDLL:
+    # The C library is bound on first use rather than at import. Its symbols
+    # are already loaded into the interpreter, so they are looked up in the
+    # process itself instead of searching for the library, which may run
+    # ldconfig or a compiler in a subprocess.
+    global _CDLL
+    if _CDLL is not None:
+        return _CDLL
+    libc = ctypes.CDLL(None, use_errno=True)
+    if not hasattr(libc, "mmap"):  # pragma: no cover
+        from ctypes.util import find_library
+
+        libc = ctypes.CDLL(find_library("c"), use_errno=True)
+
+    libc.mmap.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_size_t,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_long,
+    ]
+    libc.mmap.restype = ctypes.c_void_p
+
+    libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    libc.munmap.restype = ctypes.c_int
+
+    libc.mprotect.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int]
+    libc.mprotect.restype = ctypes.c_int
+
+    libc.ftruncate.argtypes = [ctypes.c_int, ctypes.c_long]
+    libc.ftruncate.restype = ctypes.c_int
+
+    libc.close.argtypes = [ctypes.c_int]
+    libc.close.restype = ctypes.c_int
+
+    if hasattr(libc, "memfd_create"):
+        libc.memfd_create.argtypes = [ctypes.c_char_p, ctypes.c_uint]
+        libc.memfd_create.restype = ctypes.c_int
+
+    _CDLL = libc
+    return libc
 
-CDLL.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
-CDLL.munmap.restype = ctypes.c_int
 
 # From mman.h
 PROT_READ = 0x01  # Page can be read.
@@ -27,32 +60,83 @@ PROT_EXEC = 0x04  # Page can be executed.
 
 MAP_SHARED = 0x01  # Share changes.
 MAP_ANONYMOUS = 0x20  # Not backed by a file.
+MAP_FAILED = ctypes.c_void_p(-1).value
+
+# From memfd.h
+MFD_CLOEXEC = 0x0001
+
+# From unistd.h, for C libraries without a memfd_create wrapper
+SYS_memfd_create = {"x86_64": 319, "amd64": 319, "aarch64": 279}.get(
+    os.uname().machine.lower()
+)
+
+
+def _memfd_create(name: bytes) -> int:
+    libc = _libc()
+    if hasattr(libc, "memfd_create"):
+        return libc.memfd_create(name, MFD_CLOEXEC)
+    if SYS_memfd_create is None:  # pragma: no cover
+        return -1
+    return libc.syscall(SYS_memfd_create, ctypes.c_char_p(name), MFD_CLOEXEC)
+
+
+def _mmap(size: int, prot: int, flags: int, fd: int = -1) -> typing.Optional[int]:
+    addr = _libc().mmap(None, size, prot, flags, fd, 0)
+    if addr in (None, MAP_FAILED):
+        return None
+    return addr
+
+
+def _malloc_dual(size: int) -> typing.Optional[typing.Tuple[int, int]]:
+    fd = _memfd_create(b"intercepts")
+    if fd < 0:  # pragma: no cover
+        return None
+    try:
+        if _libc().ftruncate(fd, size):  # pragma: no cover
+            return None
+        rw_addr = _mmap(size, PROT_READ | PROT_WRITE, MAP_SHARED, fd)
+        if rw_addr is None:  # pragma: no cover
+            return None
+        rx_addr = _mmap(size, PROT_READ | PROT_EXEC, MAP_SHARED, fd)
+        if rx_addr is None:  # pragma: no cover
+            _libc().munmap(rw_addr, size)
+            return None
+        return rw_addr, rx_addr
+    finally:
+        _libc().close(fd)
+
+
+def _malloc_single(size: int) -> typing.Tuple[int, int]:  # pragma: no cover
+    addr = _mmap(size, PROT_READ | PROT_WRITE, MAP_SHARED | MAP_ANONYMOUS)
+    if addr is None:
+        raise MemoryError(f"mmap failed: {ctypes.get_errno()}")
+    return addr, addr
 
 
 def malloc(
     size: int,
-) -> typing.Tuple[int, typing.Callable[[], int]]:
-    page_aligned_addr = CDLL.mmap(
-        None,
-        size,
-        PROT_READ | PROT_WRITE,
-        MAP_SHARED | MAP_ANONYMOUS,
-        0,
-        0,
-    )
-    dealloc = lambda _addr=page_aligned_addr, _size=size: CDLL.munmap(_addr, _size)
-    return page_aligned_addr, dealloc
+) -> typing.Tuple[int, int, typing.Callable[[], int]]:
+    # Whenever possible, map the memory twice, once writable and once
+    # executable, so that no page is ever both. Otherwise, the single writable
+    # mapping must be made executable with mprotect once it is written.
+    rw_addr, rx_addr = _malloc_dual(size) or _malloc_single(size)
+    if rw_addr == rx_addr:  # pragma: no cover
+        dealloc = lambda: _libc().munmap(rx_addr, size)
+    else:
+        dealloc = lambda: _libc().munmap(rw_addr, size) | _libc().munmap(rx_addr, size)
+    return rw_addr, rx_addr, dealloc
 
 
 def mprotect(addr: int, size: int) -> None:
-    mprotect_result = CDLL.mprotect(
-        ctypes.c_void_p(addr),
-        ctypes.c_size_t(size),
-        ctypes.c_int(PROT_READ | PROT_WRITE | PROT_EXEC),
-    )
+    mprotect_result = _libc().mprotect(addr, size, PROT_READ | PROT_EXEC)
     if mprotect_result:  # pragma: no cover
-        # TODO(dlshriver): can we return more information?
-        raise Exception(f"mprotect failed: {mprotect_result}")
+        raise Exception(f"mprotect failed: {ctypes.get_errno()}")
+
+
+def unprotect(addr: int, size: int) -> None:
+    mprotect_result = _libc().mprotect(addr, size, PROT_READ | PROT_WRITE | PROT_EXEC)
+    if mprotect_result:
+        raise Exception(f"mprotect failed: {ctypes.get_errno()}")
 
 
-__all__ = ["malloc", "mprotect"]
+__all__ = ["malloc", "mprotect", "unprotect", "PAGESIZE"]
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import ctypes
+import struct
+import typing
+
+from .base import HEAD_WORDS, PTR_SIZE, get_addr, publish
+
+# Word offsets of the function slots in PyTypeObject that have dunder methods
+# (tp_repr, tp_hash, tp_call, tp_str, tp_getattro, tp_setattro, tp_richcompare,
+# tp_iter, tp_iternext, tp_descr_get, tp_descr_set, tp_init, tp_finalize),
+# after an object header of two words.
+_TYPE_SLOT_OFFSETS: typing.Final[typing.Tuple[int, ...]] = tuple(
+    offset + HEAD_WORDS - 2
+    for offset in (
+        11,
+        15,
+        16,
+        17,
+        18,
+        19,
+        25,
+        27,
+        28,
+        34,
+        35,
+        37,
+        49,
+    )
+)
+# Word offsets of the tp_as_async, tp_as_number, tp_as_sequence, tp_as_mapping
+# and tp_as_buffer pointers in PyTypeObject.
+_SUBSTRUCT_OFFSETS: typing.Final[typing.Tuple[int, ...]] = tuple(
+    offset + HEAD_WORDS - 2 for offset in (10, 12, 13, 14, 20)
+)
+_BUFFER_SLOTS = 2
+
+
+def _read_word(addr: int) -> int:
+    return struct.unpack("N", ctypes.string_at(addr, PTR_SIZE))[0]
+
+
+def _write_word(addr: int, value: int) -> None:
+    publish(addr, struct.pack("N", value))
+
+
+def _heap_layout() -> typing.List[typing.Tuple[int, int, int]]:
+    # Heap types embed their sub-structs, which gives their offsets in
+    # PyHeapTypeObject, the offsets used by slot wrappers and slotdefs.
+    probe = type("_SlotProbe", (), {})
+    probe_addr = get_addr(probe)
+    layout = sorted(
+        (_read_word(probe_addr + offset * PTR_SIZE) - probe_addr, offset)
+        for offset in _SUBSTRUCT_OFFSETS
+    )
+    return [
+        (start, end, offset)
+        for (start, offset), (end, _) in zip(
+            layout, layout[1:] + [(layout[-1][0] + _BUFFER_SLOTS * PTR_SIZE, 0)]
+        )
+    ]
+
+
+_HEAP_LAYOUT: typing.Final[typing.List[typing.Tuple[int, int, int]]] = _heap_layout()
+_GENERIC_SLOTS: typing.Dict[str, typing.Dict[int, int]] = {}
+
+
+def _slot_offsets() -> typing.Iterator[int]:
+    for offset in _TYPE_SLOT_OFFSETS:
+        yield offset * PTR_SIZE
+    for start, end, _ in _HEAP_LAYOUT:
+        yield from range(start, end, PTR_SIZE)
+
+
+def _slot_address(cls: type, offset: int) -> typing.Optional[int]:
+    cls_addr = get_addr(cls)
+    for start, end, substruct_offset in _HEAP_LAYOUT:
+        if start <= offset < end:
+            substruct_addr = _read_word(cls_addr + substruct_offset * PTR_SIZE)
+            if substruct_addr == 0:
+                return None
+            return substruct_addr + offset - start
+    return cls_addr + offset
+
+
+def generic_slots(name: str) -> typing.Dict[int, int]:
+    r"""Returns the generic slot functions that call a dunder method.
+
+    These are the slots of a class that defines the method in python, which
+    look up the method on the type of the instance for every call.
+    """
+    if name not in _GENERIC_SLOTS:
+        # defining __eq__ without __hash__ would also reset tp_hash
+        namespace: typing.Dict[str, typing.Any] = (
+            {} if name == "__hash__" else {"__hash__": None}
+        )
+        base = type("_SlotProbe", (), dict(namespace))
+        probe = type("_SlotProbe", (), {**namespace, name: lambda *args: None})
+        slots = {}
+        for offset in _slot_offsets():
+            base_slot_addr = _slot_address(base, offset)
+            probe_slot_addr = _slot_address(probe, offset)
+            assert base_slot_addr is not None and probe_slot_addr is not None
+            probe_slot = _read_word(probe_slot_addr)
+            if probe_slot != _read_word(base_slot_addr):
+                slots[offset] = probe_slot
+        _GENERIC_SLOTS[name] = slots
+    return _GENERIC_SLOTS[name]
+
+
+def _subclasses(cls: type) -> typing.Iterator[type]:
+    seen = {get_addr(cls)}
+    pending = list(type.__subclasses__(cls))
+    while pending:
+        subclass = pending.pop()
+        if get_addr(subclass) in seen:
+            continue
+        seen.add(get_addr(subclass))
+        yield subclass
+        pending.extend(type.__subclasses__(subclass))
+
+
+def patch_type_slots(cls: type, name: str) -> typing.List[typing.Tuple[int, int]]:
+    r"""Routes the slots of a dunder method through their generic functions.
+
+    The slots of the class, and of subclasses that inherit the same function,
+    are replaced, so that the slot calls the (intercepted) dunder method.
+
+    :returns: The address and original value of each replaced slot.
+    """
+    patches: typing.Dict[int, typing.Tuple[int, int]] = {}
+    subclasses: typing.Optional[typing.List[type]] = None
+    for offset, generic_slot in generic_slots(name).items():
+        slot_addr = _slot_address(cls, offset)
+        if slot_addr is None or slot_addr in patches:
+            continue
+        original = _read_word(slot_addr)
+        if original in (0, generic_slot):
+            continue
+        patches[slot_addr] = (original, generic_slot)
+        if subclasses is None:
+            subclasses = list(_subclasses(cls))
+        for subclass in subclasses:
+            subclass_slot_addr = _slot_address(subclass, offset)
+            if (
+                subclass_slot_addr is not None
+                and subclass_slot_addr not in patches
+                and _read_word(subclass_slot_addr) == original
+            ):
+                patches[subclass_slot_addr] = (original, generic_slot)
+    for addr, (_, generic_slot) in patches.items():
+        _write_word(addr, generic_slot)
+    return [(addr, original) for addr, (original, _) in patches.items()]
+
+
+def restore_type_slots(patches: typing.List[typing.Tuple[int, int]]) -> None:
+    for addr, original in reversed(patches):
+        _write_word(addr, original)
+
+
+__all__ = ["generic_slots", "patch_type_slots", "restore_type_slots"]
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import ctypes
-import ctypes.util
 import mmap
 import typing
 
@@ -35,27 +34,36 @@ MEM_COMMIT = 0x00001000
 MEM_RESERVE = 0x00002000
 MEM_RELEASE = 0x00008000
 PAGE_EXECUTE_READ = 0x20
+PAGE_EXECUTE_READWRITE = 0x40
 PAGE_READWRITE = 0x04
 
 
-def malloc(size: int) -> typing.Tuple[int, typing.Callable[[], int]]:
+def malloc(size: int) -> typing.Tuple[int, int, typing.Callable[[], int]]:
     page_aligned_addr = KERNEL32.VirtualAlloc(
         None, size, MEM_COMMIT | MEM_RESERVE, PAGE_READWRITE
     )
+    if not page_aligned_addr:  # pragma: no cover
+        raise MemoryError("VirtualAlloc failed")
     dealloc = lambda _addr=page_aligned_addr: KERNEL32.VirtualFree(
         _addr, 0, MEM_RELEASE
     )
-    return page_aligned_addr, dealloc
+    return page_aligned_addr, page_aligned_addr, dealloc
 
 
-def mprotect(addr: int, size: int) -> None:
+def _virtual_protect(addr: int, size: int, protection: int) -> None:
     dummy = ctypes.create_string_buffer(ctypes.sizeof(ctypes.c_size_t))
-    _result = KERNEL32.VirtualProtect(
-        addr, size, PAGE_EXECUTE_READ, ctypes.addressof(dummy)
-    )
+    _result = KERNEL32.VirtualProtect(addr, size, protection, ctypes.addressof(dummy))
     if not _result:  # pragma: no cover
         # TODO(dlshriver): can we return more information?
         raise Exception("VirtualProtect failed")
 
 
-__all__ = ["malloc", "mprotect"]
+def mprotect(addr: int, size: int) -> None:
+    _virtual_protect(addr, size, PAGE_EXECUTE_READ)
+
+
+def unprotect(addr: int, size: int) -> None:
+    _virtual_protect(addr, size, PAGE_EXECUTE_READWRITE)
+
+
+__all__ = ["malloc", "mprotect", "unprotect", "PAGESIZE"]
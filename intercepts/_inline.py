@@ -0,0 +1,216 @@
+"""
+intercepts._inline
+~~~~~~~~~~~~~~~~~~
+
+This module splices the body of a small python function into the code of a
+handler that calls it last, so that an intercepted call runs in one frame.
+"""
+from __future__ import annotations
+
+import dis
+import types
+import typing
+
+from ._utils import _PYTHON_VERSION, _instructions, _parameters, _signature
+
+# The largest function body, in bytes of bytecode, that is inlined.
+MAX_INLINE_SIZE: typing.Final = 128
+
+# CO_GENERATOR, CO_COROUTINE, CO_ITERABLE_COROUTINE and CO_ASYNC_GENERATOR
+_UNSAFE_FLAGS: typing.Final = 0x20 | 0x80 | 0x100 | 0x200
+# Opcodes that keep state in the frame beyond its locals and stack
+_UNSAFE_OPCODES: typing.Final = frozenset(
+    dis.opmap[name]
+    for name in (
+        "EXTENDED_ARG",
+        "SETUP_ASYNC_WITH",
+        "SETUP_EXCEPT",
+        "SETUP_FINALLY",
+        "SETUP_LOOP",
+        "SETUP_WITH",
+        "YIELD_FROM",
+        "YIELD_VALUE",
+        "RETURN_GENERATOR",
+        "GEN_START",
+    )
+    if name in dis.opmap
+)
+_GLOBAL_OPCODES: typing.Final = frozenset(
+    dis.opmap[name]
+    for name in ("DELETE_GLOBAL", "LOAD_GLOBAL", "LOAD_NAME", "STORE_GLOBAL")
+    if name in dis.opmap
+)
+# Opcodes that pack two local indices into the nibbles of their argument
+_PACKED_LOCAL_OPCODES: typing.Final = frozenset(
+    dis.opmap[name]
+    for name in ("LOAD_FAST_LOAD_FAST", "STORE_FAST_LOAD_FAST", "STORE_FAST_STORE_FAST")
+    if name in dis.opmap
+)
+_RESUME: typing.Final = dis.opmap.get("RESUME")
+_NOP: typing.Final = dis.opmap["NOP"]
+
+
+def _name_shift(opcode: int) -> int:
+    # the low bits of some name arguments are flags
+    if opcode == dis.opmap.get("LOAD_SUPER_ATTR"):
+        return 2
+    if opcode == dis.opmap["LOAD_GLOBAL"] and _PYTHON_VERSION >= (3, 11):
+        return 1
+    if opcode == dis.opmap["LOAD_ATTR"] and _PYTHON_VERSION >= (3, 12):
+        return 1
+    return 0
+
+
+def can_inline(code: types.CodeType) -> bool:
+    r"""Checks whether the body of a function can be inlined into a handler.
+
+    Only small functions without closures, generator semantics or exception
+    handling are inlined.
+    """
+    return (
+        code.co_code.__len__() <= MAX_INLINE_SIZE
+        and not code.co_freevars
+        and not code.co_cellvars
+        and not code.co_flags & _UNSAFE_FLAGS
+        and not getattr(code, "co_exceptiontable", b"")
+        and not any(
+            opcode in _UNSAFE_OPCODES for _, _, opcode, _ in _instructions(code.co_code)
+        )
+    )
+
+
+def _strip_return(prefix: types.CodeType) -> typing.Optional[bytes]:
+    # removes the implicit `return None` at the end of the prefix, and the
+    # copies of it that the compiler places before it for conditions that
+    # short-circuit, so that every path off the prefix runs the function
+    co_code, stripped = prefix.co_code, None
+    while co_code:
+        *_, (start, _, opcode, arg) = _instructions(co_code)
+        if dis.opname[opcode] == "RETURN_VALUE":
+            *_, (start, _, opcode, arg), _ = _instructions(co_code)
+            if dis.opname[opcode] != "LOAD_CONST":
+                break
+        elif dis.opname[opcode] != "RETURN_CONST":
+            break
+        if stripped is not None and prefix.co_consts[arg] is not None:
+            break
+        co_code = stripped = co_code[:start]
+    return stripped
+
+
+def _relocate_prefix(
+    co_code: bytes, original: types.CodeType, local_map: typing.Callable[[int], int]
+) -> typing.Optional[bytes]:
+    _co_code = bytearray(co_code)
+    const_count, name_count = original.co_consts.__len__(), original.co_names.__len__()
+    for start, _, opcode, arg in _instructions(co_code):
+        if opcode in _UNSAFE_OPCODES or opcode in _GLOBAL_OPCODES:
+            return None
+        if opcode in dis.hasfree:
+            return None
+        if opcode in dis.hasconst:
+            arg += const_count
+        elif opcode in dis.hasname:
+            shift = _name_shift(opcode)
+            arg = ((arg >> shift) + name_count) << shift | (arg & ((1 << shift) - 1))
+        elif opcode in _PACKED_LOCAL_OPCODES:
+            high, low = local_map(arg >> 4), local_map(arg & 15)
+            if high > 15 or low > 15:
+                return None
+            arg = high << 4 | low
+        elif opcode in dis.haslocal:
+            arg = local_map(arg)
+        if arg > 255:
+            return None
+        _co_code[start + 1] = arg
+    return bytes(_co_code)
+
+
+def _relocate_original(co_code: bytes, offset: int) -> typing.Optional[bytes]:
+    _co_code = bytearray(co_code)
+    for start, _, opcode, arg in _instructions(co_code):
+        if opcode == _RESUME and start == 0:
+            _co_code[start : start + 2] = bytes([_NOP, 0])
+        elif opcode in dis.hasjabs:
+            # CPython 3.10 counts jump targets in code units
+            arg += offset // 2 if _PYTHON_VERSION >= (3, 10) else offset
+            if arg > 255:
+                return None
+            _co_code[start + 1] = arg
+    return bytes(_co_code)
+
+
+def _prefix_line_table(size: int) -> bytes:
+    # entries without a line number, which leave the line of the next entry
+    # relative to the first line of the original function
+    table = bytearray()
+    if _PYTHON_VERSION >= (3, 11):
+        for units in range(size // 2, 0, -8):
+            table.append(0x80 | 15 << 3 | min(units, 8) - 1)
+    elif _PYTHON_VERSION >= (3, 10):
+        for length in range(size, 0, -254):
+            table += bytes([min(length, 254), 0x80])
+    else:
+        for length in range(size, 0, -255):
+            table += bytes([min(length, 255), 0])
+    return bytes(table)
+
+
+def inline_call(
+    prefix: types.CodeType, original: types.CodeType
+) -> typing.Optional[types.CodeType]:
+    r"""Builds code that runs a prefix and then the body of a function.
+
+    The prefix is the code of a handler that ends by calling the function
+    with its own parameters, compiled without that call. The parameters of
+    both must be the same.
+
+    :param prefix: The code of the handler, without the call to the function.
+    :param original: The code of the function.
+    :returns: The combined code, or None if the function cannot be inlined.
+    """
+    if not can_inline(original) or _signature(prefix) != _signature(original):
+        return None
+    if prefix.co_freevars or prefix.co_cellvars:
+        return None
+    if getattr(prefix, "co_exceptiontable", b""):
+        return None
+    prefix_code = _strip_return(prefix)
+    if prefix_code is None:
+        return None
+
+    param_count = _parameters(original).__len__()
+    prefix_locals = prefix.co_varnames[param_count:]
+    if any(name in original.co_varnames for name in prefix_locals):
+        return None
+    local_count = original.co_varnames.__len__()
+
+    def local_map(index: int) -> int:
+        return index if index < param_count else local_count + index - param_count
+
+    prefix_code = _relocate_prefix(prefix_code, original, local_map)
+    if prefix_code is None:
+        return None
+    original_code = _relocate_original(original.co_code, prefix_code.__len__())
+    if original_code is None:
+        return None
+
+    line_table = _prefix_line_table(prefix_code.__len__())
+    lines: typing.Dict[str, typing.Any]
+    if _PYTHON_VERSION >= (3, 10):
+        lines = {"co_linetable": line_table + original.co_linetable}
+    else:
+        lines = {"co_lnotab": line_table + original.co_lnotab}
+    varnames = original.co_varnames + prefix_locals
+    return original.replace(
+        co_code=prefix_code + original_code,
+        co_consts=original.co_consts + prefix.co_consts,
+        co_names=original.co_names + prefix.co_names,
+        co_varnames=varnames,
+        co_nlocals=varnames.__len__(),
+        co_stacksize=max(prefix.co_stacksize, original.co_stacksize),
+        **lines,
+    )
+
+
+__all__ = ["can_inline", "inline_call", "MAX_INLINE_SIZE"]
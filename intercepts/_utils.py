@@ -1,55 +1,213 @@
 from __future__ import annotations
 
 import dis
+import functools
 import sys
 import types
 import typing
 
 _PYTHON_VERSION = sys.version_info[:2]
 
+_CACHE_ENTRIES = getattr(dis, "_inline_cache_entries", None)
+_EXTENDED_ARG: typing.Final = dis.EXTENDED_ARG
+_LOAD_CONST: typing.Final = dis.opmap["LOAD_CONST"]
+_LOAD_GLOBAL: typing.Final = dis.opmap["LOAD_GLOBAL"]
+_NOP: typing.Final = dis.opmap["NOP"]
+# CPython 3.11 and 3.12 push the NULL of a call before the global, and
+# CPython 3.13 pushes it after
+_PUSH_NULL: typing.Final = dis.opmap.get("PUSH_NULL")
+_PUSH_NULL_AFTER: typing.Final = _PYTHON_VERSION >= (3, 13)
+_CO_VARARGS: typing.Final = 0x04
+_CO_VARKEYWORDS: typing.Final = 0x08
+_VARIADIC: typing.Final = (
+    "*args, **kwargs",
+    "*args, **kwargs",
+    "(args[0] if args else None)",
+)
+
+
+def _cache_entries(opcode: int) -> int:
+    if _CACHE_ENTRIES is None:
+        return 0
+    if isinstance(_CACHE_ENTRIES, dict):
+        # CPython 3.13 maps opcode names to the number of cache entries
+        return _CACHE_ENTRIES.get(dis.opname[opcode], 0)
+    return _CACHE_ENTRIES[opcode]
+
+
+def _instructions(co_code: bytes) -> typing.Iterator[typing.Tuple[int, int, int, int]]:
+    r"""Yields the start, end, opcode and argument of each instruction.
+
+    The start includes any EXTENDED_ARG prefixes, and the end includes the
+    inline cache entries of the instruction.
+    """
+    start, offset, arg = 0, 0, 0
+    while offset < co_code.__len__():
+        opcode = co_code[offset]
+        arg = arg << 8 | co_code[offset + 1]
+        offset += 2 + 2 * _cache_entries(opcode)
+        if opcode != _EXTENDED_ARG:
+            yield start, offset, opcode, arg
+            start, arg = offset, 0
+
+
+def _with_arg(opcode: int, arg: int) -> bytes:
+    units = [opcode, arg & 0xFF]
+    arg >>= 8
+    while arg:
+        units[:0] = [_EXTENDED_ARG, arg & 0xFF]
+        arg >>= 8
+    return bytes(units)
+
+
+def _loads_global(code: types.CodeType, name: str) -> bool:
+    return name in code.co_names or any(
+        isinstance(const, types.CodeType) and _loads_global(const, name)
+        for const in code.co_consts
+    )
+
 
 def replace_load_global(code: types.CodeType, name: str, value: typing.Any):
-    if name not in code.co_names:
+    r"""Replaces the loads of a global name in a code object with a constant.
+
+    Code objects nested in the code, such as those of lambdas, comprehensions
+    and inner functions, are rewritten as well.
+
+    :param code: The code object to rewrite.
+    :param name: The global name to replace.
+    :param value: The constant to load instead of the global.
+    :returns: The rewritten code object.
+    """
+    if not _loads_global(code, name):
         return code
-    _co_code = code.co_code
-    _co_consts = code.co_consts + (value,)
-    _const_index = _co_consts.index(value)
-    _name_index = code.co_names.index(name)
-    load_const = [dis.opmap["LOAD_CONST"], _const_index]
-    if _PYTHON_VERSION < (3, 11):
-        _co_code = _co_code.replace(
-            bytes([dis.opmap["LOAD_GLOBAL"], _name_index]),
-            bytes(load_const),
+    _co_consts = tuple(
+        replace_load_global(const, name, value)
+        if isinstance(const, types.CodeType)
+        else const
+        for const in code.co_consts
+    )
+    if name not in code.co_names:
+        return _code_replace(code, code.co_code, _co_consts)
+    _co_consts += (value,)
+    try:
+        _co_code = _replace_load_global_code(
+            code.co_code, code.co_names, name, _co_consts.__len__() - 1
         )
-    else:
-        # CPython 3.11 has 5 CACHE ops after LOAD_GLOBAL
-        # CPython 3.12 has 4 CACHE ops after LOAD_GLOBAL
-        _cache_len = 5 if _PYTHON_VERSION <= (3, 11) else 4
-        _co_code = _co_code.replace(
-            bytes(
-                [
-                    dis.opmap["LOAD_GLOBAL"],
-                    (_name_index << 1),
-                    *([dis.opmap["CACHE"], 0] * _cache_len),
-                ]
-            ),
-            # Need the NOPs to prevent segfaults with coveragepy and pytest
-            bytes(load_const + [dis.opmap["NOP"], 0] * _cache_len),
-        ).replace(
-            bytes(
-                [
-                    dis.opmap["LOAD_GLOBAL"],
-                    (_name_index << 1) + 1,
-                    *([dis.opmap["CACHE"], 0] * _cache_len),
-                ]
-            ),
-            # Need the NOPs to prevent segfaults with coveragepy and pytest
-            bytes(
-                [dis.opmap["PUSH_NULL"], 0]
-                + load_const
-                + [dis.opmap["NOP"], 0] * (_cache_len - 1)
-            ),
+    except OverflowError:
+        # jump offsets would change if the code grew
+        raise ValueError(
+            f"Cannot load {name!r} as a constant in {code.co_name!r}, "
+            "which has too many constants."
+        ) from None
+    return _code_replace(code, _co_code, _co_consts)
+
+
+# A handler is usually registered for many callables, and its bytecode only
+# needs to be rewritten once for each constant index. The cache is keyed by
+# the bytecode rather than the code object, whose constants may hold the
+# copies of intercepted callables.
+@functools.lru_cache(maxsize=256)
+def _replace_load_global_code(
+    co_code: bytes, co_names: typing.Tuple[str, ...], name: str, const_index: int
+) -> bytes:
+    _co_code = bytearray(co_code)
+    name_index = co_names.index(name)
+    load_const = _with_arg(_LOAD_CONST, const_index)
+    for start, end, opcode, arg in _instructions(co_code):
+        if opcode != _LOAD_GLOBAL:
+            continue
+        push_null = False
+        if _PYTHON_VERSION >= (3, 11):
+            arg, push_null = arg >> 1, bool(arg & 1)
+        if arg != name_index:
+            continue
+        instr = load_const
+        if push_null:
+            null = bytes([typing.cast(int, _PUSH_NULL), 0])
+            instr = instr + null if _PUSH_NULL_AFTER else null + instr
+        if instr.__len__() > end - start:
+            raise OverflowError(const_index)
+        # Need the NOPs to prevent segfaults with coveragepy and pytest
+        _co_code[start:end] = instr + bytes([_NOP, 0]) * (
+            (end - start - instr.__len__()) // 2
         )
+    return bytes(_co_code)
+
+
+def _signature(code: types.CodeType) -> typing.Tuple[str, str, str]:
+    # the parameter list of the code, the arguments that pass them on, and
+    # the first positional argument
+    argcount, kwonlyargcount = code.co_argcount, code.co_kwonlyargcount
+    names = code.co_varnames
+    positional = list(names[:argcount])
+    keywords = list(names[argcount : argcount + kwonlyargcount])
+    index = argcount + kwonlyargcount
+    params, args = positional[:], positional[:]
+    first = positional[0] if positional else "None"
+    posonlyargcount = getattr(code, "co_posonlyargcount", 0)
+    if posonlyargcount:
+        params.insert(posonlyargcount, "/")
+    if code.co_flags & _CO_VARARGS:
+        params.append(f"*{names[index]}")
+        args.append(f"*{names[index]}")
+        if not positional:
+            first = f"({names[index]}[0] if {names[index]} else None)"
+        index += 1
+    elif keywords:
+        params.append("*")
+    params.extend(keywords)
+    args.extend(f"{name}={name}" for name in keywords)
+    if code.co_flags & _CO_VARKEYWORDS:
+        params.append(f"**{names[index]}")
+        args.append(f"**{names[index]}")
+    return ", ".join(params), ", ".join(args), first
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_template(
+    template: str, name: str, signature: typing.Tuple[str, str, str]
+) -> types.CodeType:
+    params, args, first = signature
+    body = template.format(args=args, first=first).replace("\n", "\n    ")
+    module = compile(f"def {name}({params}):\n    {body}\n", "<intercepts>", "exec")
+    return next(c for c in module.co_consts if isinstance(c, types.CodeType))
+
+
+def _parameters(code: types.CodeType) -> typing.Tuple[str, ...]:
+    count = code.co_argcount + code.co_kwonlyargcount
+    count += bool(code.co_flags & _CO_VARARGS) + bool(code.co_flags & _CO_VARKEYWORDS)
+    return code.co_varnames[:count]
+
+
+def template_code(
+    template: str, name: str, signature: typing.Optional[types.CodeType] = None
+) -> types.CodeType:
+    r"""Compiles a handler template for the parameters of a code object.
+
+    The template is the body of a handler, in which ``{args}`` stands for
+    the arguments of the call, passed on as they were received, and
+    ``{first}`` for the first positional argument, or None. Without a
+    signature, or if a parameter would shadow a name used in the template,
+    the handler takes ``*args, **kwargs``.
+
+    :param template: The body of the handler.
+    :param name: The name of the handler.
+    :param signature: (optional) The code object whose parameters the
+        handler takes.
+    :returns: The code of the handler.
+    """
+    code = _compile_template(template, name, _VARIADIC)
+    if signature is None:
+        return code
+    used = code.co_names + code.co_varnames[2:]
+    if any(param in used for param in _parameters(signature)):
+        return code
+    return _compile_template(template, name, _signature(signature))
+
+
+def _code_replace(
+    code: types.CodeType, _co_code: bytes, _co_consts: tuple
+) -> types.CodeType:
     if _PYTHON_VERSION < (3, 8):
         return types.CodeType(
             code.co_argcount,
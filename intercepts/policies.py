@@ -0,0 +1,747 @@
+"""
+intercepts.policies
+~~~~~~~~~~~~~~~~~~~
+
+This module implements intercept policies, handlers with a fixed behavior
+that do not need to call back into python when intercepting builtins.
+"""
+from __future__ import annotations
+
+import contextvars
+import math
+import threading
+import types
+import weakref
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+    cast,
+)
+
+from ._handlers import alloc_counter, raise_instr, redirect_instr, return_instr
+from ._utils import replace_load_global, template_code
+
+# Handler templates, compiled for the parameters of intercepted functions
+_RETURN_HANDLER = "return _value"
+_RAISE_HANDLER = "raise _exception_type(*_args)"
+_REDIRECT_HANDLER = "return _target({args})"
+_OBSERVE_PREFIX = """\
+for _observer in _observers:
+    _observer({args})"""
+_OBSERVE_HANDLER = _OBSERVE_PREFIX + "\nreturn _({args})"
+_WHEN_HANDLER = """\
+if _when({args}):
+    return _handler({args})
+return _({args})"""
+_WHEN_TYPE_HANDLER = """\
+if _decisions[{first}.__class__]:
+    return _handler({args})
+return _({args})"""
+_SAMPLE_PREFIX = """\
+_countdown[0] -= 1
+if _countdown[0] <= 0:
+    _countdown[0] = _gap()
+    return _handler({args})"""
+_SAMPLE_HANDLER = _SAMPLE_PREFIX + "\nreturn _({args})"
+_SAMPLED_HANDLER = """\
+_countdown[0] = _gap()
+return _handler({args})"""
+_SCOPE_PREFIX = """\
+if _count[0] and _depth() is not None:
+    return _handler({args})"""
+_SCOPE_HANDLER = _SCOPE_PREFIX + "\nreturn _({args})"
+_ON_ERROR_CALL = """\
+try:
+    _result = _({args})
+except BaseException as _error:
+    _on_error(_error)
+    raise"""
+
+
+def _make_handler(
+    template: str,
+    name: str,
+    signature: Optional[types.FunctionType] = None,
+    **values: Any,
+) -> types.FunctionType:
+    code = template_code(
+        template, name, None if signature is None else signature.__code__
+    )
+    for value_name, value in values.items():
+        code = replace_load_global(code, value_name, value)
+    if signature is None:
+        return types.FunctionType(code, globals(), name)
+    handler = types.FunctionType(code, globals(), name, signature.__defaults__)
+    handler.__kwdefaults__ = signature.__kwdefaults__
+    return handler
+
+
+class Policy:
+    r"""The base class of intercept policies.
+
+    Intercepted builtins run a policy as machine code, without entering the
+    interpreter. Intercepted python functions run an equivalent python handler.
+    """
+
+    __slots__ = ()
+
+    def _instr(self, obj: Callable) -> Optional[bytes]:
+        raise NotImplementedError()
+
+    def _handler(
+        self, signature: Optional[types.FunctionType] = None
+    ) -> types.FunctionType:
+        r"""Returns the python handler of the policy.
+
+        :param signature: (optional) The function whose parameters the handler
+            takes. Defaults to ``*args, **kwargs``.
+        """
+        raise NotImplementedError()
+
+
+class Return(Policy):
+    r"""A policy that returns a fixed object from every intercepted call.
+
+    :param value: The object to return.
+
+    Usage::
+
+        >>> import time
+        >>> import intercepts
+        >>> intercepts.register(time.time, intercepts.Return(0.0))
+        >>> time.time()
+        0.0
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.value!r})"
+
+    def _instr(self, obj: Callable) -> Optional[bytes]:
+        return return_instr(self.value)
+
+    def _handler(
+        self, signature: Optional[types.FunctionType] = None
+    ) -> types.FunctionType:
+        return _make_handler(
+            _RETURN_HANDLER, "_return_handler", signature, _value=self.value
+        )
+
+
+class Raise(Policy):
+    r"""A policy that raises an exception from every intercepted call.
+
+    A new exception is created from the type and arguments of the given
+    exception for each call, so tracebacks do not accumulate on one instance.
+
+    :param exception: The exception type or instance to raise.
+
+    Usage::
+
+        >>> import os
+        >>> import intercepts
+        >>> intercepts.register(os.getcwd, intercepts.Raise(PermissionError("no")))
+        >>> os.getcwd()
+        Traceback (most recent call last):
+          ...
+        PermissionError: no
+    """
+
+    __slots__ = ("exception_type", "args")
+
+    def __init__(self, exception: BaseException | Type[BaseException]):
+        if isinstance(exception, type) and issubclass(exception, BaseException):
+            self.exception_type: Type[BaseException] = exception
+            self.args: tuple = ()
+        elif isinstance(exception, BaseException):
+            self.exception_type = type(exception)
+            self.args = exception.args
+        else:
+            raise ValueError("Argument `exception` must be an exception.")
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.exception_type(*self.args)!r})"
+
+    def _instr(self, obj: Callable) -> Optional[bytes]:
+        return raise_instr(self.exception_type, self.args)
+
+    def _handler(
+        self, signature: Optional[types.FunctionType] = None
+    ) -> types.FunctionType:
+        return _make_handler(
+            _RAISE_HANDLER,
+            "_raise_handler",
+            signature,
+            _exception_type=self.exception_type,
+            _args=self.args,
+        )
+
+
+class Redirect(Policy):
+    r"""A policy that forwards every intercepted call to another callable.
+
+    A builtin redirected to a builtin with the same calling convention jumps
+    directly to the C function of the target. Intercepts registered on the
+    target after the redirect are not applied to redirected calls.
+
+    :param target: The callable to call instead.
+
+    Usage::
+
+        >>> import intercepts
+        >>> intercepts.register(min, intercepts.Redirect(max))
+        >>> min(1, 2)
+        2
+    """
+
+    __slots__ = ("target",)
+
+    def __init__(self, target: Callable):
+        if not callable(target):
+            raise ValueError("Argument `target` must be callable.")
+        self.target = target
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.target!r})"
+
+    def _instr(self, obj: Callable) -> Optional[bytes]:
+        # only builtins are redirected by their trampoline
+        return redirect_instr(cast(types.BuiltinFunctionType, obj), self.target)
+
+    def _handler(
+        self, signature: Optional[types.FunctionType] = None
+    ) -> types.FunctionType:
+        return _make_handler(
+            _REDIRECT_HANDLER, "_redirect_handler", signature, _target=self.target
+        )
+
+
+class Observe(Policy):
+    r"""A policy that passes the arguments of every call to a callback.
+
+    The call then continues to the original (or the next handler), and its
+    result is returned unchanged. Observers registered one after another on
+    the same callable are called in a single loop, without a python frame
+    for each of them.
+
+    :param callback: The callable to call with the arguments of each call.
+
+    Usage::
+
+        >>> import intercepts
+        >>> calls = []
+        >>> intercepts.register(abs, intercepts.Observe(lambda x: calls.append(x)))
+        >>> abs(-1)
+        1
+        >>> calls
+        [-1]
+    """
+
+    __slots__ = ("callback",)
+
+    def __init__(self, callback: Callable):
+        if not callable(callback):
+            raise ValueError("Argument `callback` must be callable.")
+        self.callback = callback
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.callback!r})"
+
+    def _instr(self, obj: Callable) -> Optional[bytes]:
+        return None
+
+    def _handler(
+        self, signature: Optional[types.FunctionType] = None
+    ) -> types.FunctionType:
+        return _make_handler(
+            _OBSERVE_HANDLER, "_observe_handler", signature, _observers=[self.callback]
+        )
+
+
+class Hooks(Policy):
+    r"""A policy that calls hooks around every intercepted call.
+
+    The hooks are compiled into a single handler, which only calls the hooks
+    that are set. Their return values are ignored.
+
+    :param before: (optional) The callable to call with the arguments of each
+        call, before the call.
+    :param after: (optional) The callable to call with the result of each
+        call that returns.
+    :param on_error: (optional) The callable to call with the exception
+        raised by a call, before it is raised again.
+
+    Usage::
+
+        >>> import intercepts
+        >>> results = []
+        >>> intercepts.register(abs, after=results.append)
+        >>> abs(-1)
+        1
+        >>> results
+        [1]
+    """
+
+    __slots__ = ("before", "after", "on_error")
+
+    def __init__(
+        self,
+        before: Optional[Callable] = None,
+        after: Optional[Callable] = None,
+        on_error: Optional[Callable] = None,
+    ):
+        hooks = (before, after, on_error)
+        if all(hook is None for hook in hooks):
+            raise ValueError("At least one hook must be set.")
+        if any(hook is not None and not callable(hook) for hook in hooks):
+            raise ValueError("Hooks must be callable.")
+        self.before, self.after, self.on_error = hooks
+
+    def __repr__(self) -> str:
+        hooks = ", ".join(
+            f"{name}={getattr(self, name)!r}"
+            for name in self.__slots__
+            if getattr(self, name) is not None
+        )
+        return f"{type(self).__name__}({hooks})"
+
+    def _instr(self, obj: Callable) -> Optional[bytes]:
+        return None
+
+    def _handler(
+        self, signature: Optional[types.FunctionType] = None
+    ) -> types.FunctionType:
+        lines = []
+        if self.before is not None:
+            lines.append("_before({args})")
+        if self.on_error is not None:
+            lines.append(_ON_ERROR_CALL)
+        else:
+            lines.append("_result = _({args})")
+        if self.after is not None:
+            lines.append("_after(_result)")
+        lines.append("return _result")
+        return _make_handler(
+            "\n".join(lines),
+            "_hooks_handler",
+            signature,
+            _before=self.before,
+            _after=self.after,
+            _on_error=self.on_error,
+        )
+
+
+class _Decisions(Dict[type, bool]):
+    r"""Whether instances of each type of first argument match a filter.
+
+    Each type is decided once, by the first call that sees it, and is set
+    with ``setdefault``, so that calls in other threads read every decision
+    without a lock and a type decided by two of them at once keeps one
+    decision.
+
+    :param classes: The types that matching first arguments are instances of.
+    """
+
+    __slots__ = ("classes",)
+
+    def __init__(self, classes: Tuple[type, ...]):
+        super().__init__()
+        self.classes = classes
+
+    def __missing__(self, cls: type) -> bool:
+        return self.setdefault(cls, issubclass(cls, self.classes))
+
+
+class _Filter(Policy):
+    r"""A policy that only handles the calls that match a filter.
+
+    Other calls are passed on to the intercepted callable directly.
+
+    :param handler: The function or policy that handles matching calls.
+    :param when: A type or collection of types that the first argument of a
+        matching call is an instance of, or a predicate that is called with
+        the arguments of each call.
+    """
+
+    __slots__ = ("handler", "when", "classes", "_decisions")
+
+    def __init__(
+        self, handler: types.FunctionType | Policy, when: Callable | type | Iterable
+    ):
+        self.handler = handler
+        self.when = when
+        self.classes: Optional[Tuple[type, ...]] = None
+        if isinstance(when, type):
+            self.classes = (when,)
+        elif isinstance(when, (set, frozenset, tuple, list)):
+            self.classes = tuple(when)
+            if not all(isinstance(cls, type) for cls in self.classes):
+                raise ValueError("Argument `when` must only contain types.")
+        elif not callable(when):
+            raise ValueError("Argument `when` must be a predicate or types.")
+        self._decisions: Optional[_Decisions] = None
+        if self.classes is not None:
+            self._decisions = _Decisions(self.classes)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.handler!r}, when={self.when!r})"
+
+    def _instr(self, obj: Callable) -> Optional[bytes]:
+        return None
+
+    def _handler(
+        self,
+        signature: Optional[types.FunctionType] = None,
+        handler: Optional[types.FunctionType] = None,
+    ) -> types.FunctionType:
+        r"""Returns the python handler of the filter.
+
+        :param signature: (optional) The function whose parameters the handler
+            takes. Defaults to ``*args, **kwargs``.
+        :param handler: (optional) The compiled handler of matching calls.
+        """
+        if self._decisions is None:
+            return _make_handler(
+                _WHEN_HANDLER,
+                "_when_handler",
+                signature,
+                _when=self.when,
+                _handler=handler,
+            )
+        return _make_handler(
+            _WHEN_TYPE_HANDLER,
+            "_when_handler",
+            signature,
+            _decisions=self._decisions,
+            _handler=handler,
+        )
+
+
+class _Sample(Policy):
+    r"""A policy that only handles some of the calls.
+
+    Calls are counted down, and the call that reaches zero is handled, while
+    others are passed on to the intercepted callable directly. Intercepted
+    builtins count down in their trampoline.
+
+    :param handler: The function or policy that handles sampled calls.
+    :param rate: (optional) The probability that a call is handled. The gaps
+        between handled calls are drawn at random.
+    :param every: (optional) The number of calls per handled call.
+    """
+
+    __slots__ = ("handler", "rate", "every", "_countdown", "_random", "_log")
+
+    def __init__(
+        self,
+        handler: types.FunctionType | Policy,
+        rate: Optional[float] = None,
+        every: Optional[int] = None,
+    ):
+        self.handler = handler
+        self.rate = rate
+        self.every = every
+        if (rate is None) == (every is None):
+            raise ValueError("Exactly one of `sample` and `every` must be set.")
+        if every is not None:
+            if not isinstance(every, int) or every < 1:
+                raise ValueError("Argument `every` must be a positive integer.")
+        elif not 0 < cast(float, rate) <= 1:
+            raise ValueError("Argument `sample` must be in (0, 1].")
+        else:
+            import random
+
+            self._random = random.random
+            self._log = math.log1p(-cast(float, rate)) if rate != 1 else -math.inf
+        # the calls left until the next sampled call, for python handlers
+        self._countdown = [self._gap()]
+
+    def __repr__(self) -> str:
+        if self.every is not None:
+            return f"{type(self).__name__}({self.handler!r}, every={self.every!r})"
+        return f"{type(self).__name__}({self.handler!r}, sample={self.rate!r})"
+
+    def _gap(self) -> int:
+        if self.every is not None:
+            return self.every
+        # the number of calls up to the next sampled one is geometric
+        return int(math.log(1.0 - self._random()) / self._log) + 1
+
+    def _instr(self, obj: Callable) -> Optional[bytes]:
+        return None
+
+    def _handler(
+        self,
+        signature: Optional[types.FunctionType] = None,
+        handler: Optional[types.FunctionType] = None,
+    ) -> types.FunctionType:
+        r"""Returns the python handler of the sampler.
+
+        :param signature: (optional) The function whose parameters the handler
+            takes. Defaults to ``*args, **kwargs``.
+        :param handler: (optional) The compiled handler of sampled calls.
+        """
+        return _make_handler(
+            _SAMPLE_HANDLER,
+            "_sample_handler",
+            signature,
+            _countdown=self._countdown,
+            _gap=self._gap,
+            _handler=handler,
+        )
+
+    def _prefix(
+        self, signature: types.FunctionType, handler: types.FunctionType
+    ) -> types.FunctionType:
+        r"""Returns the handler without the call of unsampled calls, which
+        falls through to the body of an inlined function instead.
+        """
+        return _make_handler(
+            _SAMPLE_PREFIX,
+            "_sample_handler",
+            signature,
+            _countdown=self._countdown,
+            _gap=self._gap,
+            _handler=handler,
+        )
+
+    def _sampled_handler(
+        self, countdown: Any, handler: types.FunctionType
+    ) -> types.FunctionType:
+        r"""Returns the handler of the calls sampled by a trampoline.
+
+        The trampoline resets its countdown to ``every``, so random gaps are
+        drawn by the handler.
+
+        :param countdown: The countdown of the trampoline.
+        :param handler: The compiled handler of sampled calls.
+        """
+        if self.every is not None:
+            return handler
+        return _make_handler(
+            _SAMPLED_HANDLER,
+            "_sample_handler",
+            _countdown=countdown,
+            _gap=self._gap,
+            _handler=handler,
+        )
+
+
+class Scope:
+    r"""The threads and contexts in which scoped intercepts are active.
+
+    A scope is active inside its ``with`` block, in the thread or asyncio
+    task that entered it and in the tasks created there, while the block is
+    running. Elsewhere, calls to a callable intercepted in the scope skip its
+    handler, and while no block is running, intercepted builtins skip it
+    without entering the interpreter.
+
+    :param name: (optional) The name of the context variable of the scope.
+
+    Usage::
+
+        >>> import intercepts
+        >>> tracing = intercepts.Scope()
+        >>> intercepts.register(abs, intercepts.Return(0), scope=tracing)
+        >>> abs(-1)
+        1
+        >>> with tracing:
+        ...     abs(-1)
+        0
+    """
+
+    __slots__ = ("_depth", "_count", "_active", "_lock", "__weakref__")
+
+    def __init__(self, name: str = "intercepts.Scope"):
+        # the number of times the scope was entered in the current context
+        self._depth: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+            name, default=None
+        )
+        # the number of contexts in the scope, for python handlers and for the
+        # guards of builtins
+        self._count = [0]
+        self._active, free = alloc_counter(0)
+        weakref.finalize(self, free)
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._depth.name!r})"
+
+    def __enter__(self) -> Scope:
+        depth = self._depth.get()
+        if depth is None:
+            self._add(1)
+            depth = 0
+        self._depth.set(depth + 1)
+        return self
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        depth = cast(int, self._depth.get())
+        if depth == 1:
+            self._depth.set(None)
+            self._add(-1)
+        else:
+            self._depth.set(depth - 1)
+
+    def _add(self, contexts: int) -> None:
+        with self._lock:
+            self._count[0] += contexts
+            self._active[0] = self._count[0]
+
+    @property
+    def active(self) -> bool:
+        r"""Whether the scope is active in the current context."""
+        return self._depth.get() is not None
+
+
+class _Switch(Scope):
+    r"""A scope that is active while any of its blocks is running, in every
+    thread and context, or only in the contexts that are in another scope.
+
+    :param scope: (optional) The scope that must also be active. Defaults to
+        all threads and contexts.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, scope: Optional[Scope] = None):
+        super().__init__("intercepts.intercepted")
+        if scope is None:
+            self._depth = contextvars.ContextVar("intercepts.intercepted", default=0)
+        else:
+            self._depth = scope._depth
+
+    def __enter__(self) -> _Switch:
+        self._add(1)
+        return self
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        self._add(-1)
+
+    @property
+    def active(self) -> bool:
+        return self._count[0] > 0 and self._depth.get() is not None
+
+
+class _Scoped(Policy):
+    r"""A policy that only handles the calls made inside a scope.
+
+    Other calls are passed on to the intercepted callable directly.
+
+    :param handler: The function or policy that handles calls in the scope.
+    :param scope: The scope in which calls are handled.
+    """
+
+    __slots__ = ("handler", "scope")
+
+    def __init__(self, handler: types.FunctionType | Policy, scope: Scope):
+        if not isinstance(scope, Scope):
+            raise ValueError("Argument `scope` must be a Scope.")
+        self.handler = handler
+        self.scope = scope
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.handler!r}, scope={self.scope!r})"
+
+    def _instr(self, obj: Callable) -> Optional[bytes]:
+        return None
+
+    def _handler(
+        self,
+        signature: Optional[types.FunctionType] = None,
+        handler: Optional[types.FunctionType] = None,
+    ) -> types.FunctionType:
+        r"""Returns the python handler of the scope.
+
+        :param signature: (optional) The function whose parameters the handler
+            takes. Defaults to ``*args, **kwargs``.
+        :param handler: (optional) The compiled handler of calls in the scope.
+        """
+        return _make_handler(
+            _SCOPE_HANDLER,
+            "_scope_handler",
+            signature,
+            _count=self.scope._count,
+            _depth=self.scope._depth.get,
+            _handler=handler,
+        )
+
+    def _prefix(
+        self, signature: types.FunctionType, handler: types.FunctionType
+    ) -> types.FunctionType:
+        r"""Returns the handler without the call of calls outside the scope,
+        which falls through to the body of an inlined function instead.
+        """
+        return _make_handler(
+            _SCOPE_PREFIX,
+            "_scope_handler",
+            signature,
+            _count=self.scope._count,
+            _depth=self.scope._depth.get,
+            _handler=handler,
+        )
+
+
+class CallCount(NamedTuple):
+    r"""The calls counted for an intercepted builtin."""
+
+    calls: int
+    ticks: int
+
+
+class Count(Policy):
+    r"""A policy that counts the calls to a builtin without changing them.
+
+    The trampoline increments a counter and calls the original C function,
+    so no python code runs for counted calls. Counters are read with
+    :func:`intercepts.counters`. This policy only supports builtins.
+
+    :param timed: (optional) Whether to also sum the time spent in each call,
+        in time stamp counter ticks (``rdtsc`` on x86, ``cntvct_el0`` on arm).
+        Defaults to False.
+
+    Usage::
+
+        >>> import intercepts
+        >>> intercepts.register(isinstance, intercepts.Count())
+        >>> isinstance(1, int)
+        True
+        >>> intercepts.counters()[isinstance].calls
+        1
+    """
+
+    __slots__ = ("timed",)
+
+    def __init__(self, timed: bool = False):
+        self.timed = timed
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(timed={self.timed!r})"
+
+    def _handler(
+        self, signature: Optional[types.FunctionType] = None
+    ) -> types.FunctionType:
+        raise NotImplementedError("Count policies only support builtins.")
+
+
+__all__ = [
+    "CallCount",
+    "Count",
+    "Hooks",
+    "Observe",
+    "Policy",
+    "Raise",
+    "Redirect",
+    "Return",
+    "Scope",
+]
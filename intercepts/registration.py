@@ -1,186 +1,1453 @@
-"""
-intercepts.registration
-~~~~~~~~~~~~~~~~~~~~~~~
-
-This module implements the intercepts registration api.
-"""
-from __future__ import annotations
-
-import atexit
-import ctypes
-import struct
-import sys
-import types
-from collections import defaultdict
-from typing import Any, Callable, Type, TypeVar, cast
-
-from ._handlers import PTR_SIZE, get_addr, replace_cfunction
-from ._utils import replace_load_global
-
-T = TypeVar("T")
-_HANDLERS: dict[tuple[int, Type], list[tuple[Any, ...]]] = defaultdict(list)
-
-
-def _check_intercept(obj, handler):
-    if not isinstance(handler, types.FunctionType):
-        raise ValueError("Argument `handler` must be a function.")
-    if obj == handler:
-        raise ValueError("A function cannot handle itself")
-
-
-def register(obj: T, handler: Callable) -> T:
-    r"""Registers an intercept handler.
-
-    :param obj: The callable to intercept.
-    :param handler: A function to handle the intercept.
-    :returns: The intercepted callable.
-
-    Usage::
-
-        >>> import intercepts
-        >>> increment = lambda x: x + 1
-        >>> handler = lambda func, arg: arg - (func(arg) - arg)
-        >>> intercepts.register(increment, handler)
-        >>> increment(43)
-        42
-    """
-    _register: dict[Type, Callable[[Any, types.FunctionType], Any]] = {
-        types.BuiltinFunctionType: _register_builtin,
-        types.FunctionType: _register_function,
-        types.MethodType: _register_method,
-    }
-    obj_type = type(obj)
-    if obj_type not in _register:
-        raise NotImplementedError(f"Unsupported type: {obj_type}")
-    _check_intercept(obj, handler)
-    assert isinstance(handler, types.FunctionType)
-    return _register[obj_type](obj, handler)
-
-
-def _register_builtin(
-    obj: types.BuiltinFunctionType, handler: types.FunctionType
-) -> types.BuiltinFunctionType:
-    obj_addr = get_addr(obj)
-    _obj_bytes = ctypes.string_at(obj_addr, sys.getsizeof(obj))
-    _obj = ctypes.cast(
-        cast(ctypes._SimpleCData, _obj_bytes),
-        ctypes.py_object,
-    ).value
-
-    globals_dict = handler.__globals__
-    _code = replace_load_global(handler.__code__, "_", _obj)
-    _handler = types.FunctionType(
-        code=_code,
-        globals=handler.__globals__,
-        name=handler.__name__,
-        argdefs=handler.__defaults__,
-        closure=handler.__closure__,
-    )
-
-    refs = replace_cfunction(obj, _handler)
-    _HANDLERS[obj_addr, type(obj)].append(
-        (refs, (_handler, obj, _obj, handler, globals_dict), _obj_bytes)
-    )
-
-    # Need to increment reference count of _obj_bytes to avoid segfaults
-    ctypes.memmove(
-        get_addr(_obj_bytes),
-        struct.pack(
-            "N",
-            struct.unpack("N", ctypes.string_at(get_addr(_obj_bytes), PTR_SIZE))[0] + 1,
-        ),
-        PTR_SIZE,
-    )
-
-    return obj
-
-
-def _register_function(
-    obj: types.FunctionType, handler: types.FunctionType
-) -> types.FunctionType:
-    _obj = types.FunctionType(
-        code=obj.__code__,
-        globals=obj.__globals__,
-        name=obj.__name__,
-        argdefs=obj.__defaults__,
-        closure=obj.__closure__,
-    )
-    obj.__code__ = replace_load_global(handler.__code__, "_", _obj)
-
-    _HANDLERS[get_addr(obj), type(obj)].append((obj, _obj))
-    return obj
-
-
-def _register_method(
-    obj: types.MethodType, handler: types.FunctionType
-) -> types.MethodType:
-    _register_function(obj.__func__, handler)
-    return obj
-
-
-def unregister(obj: T, depth: int | None = None) -> T:
-    r"""Unregisters the handlers for an object.
-
-    :param obj: The callable for which to unregister handlers.
-    :param depth: (optional) The maximum number of handlers to unregister. Defaults to all.
-    :returns: The previously intercepted callable.
-    """
-    obj_type = type(obj)
-    _unregister: dict[Type, Callable] = {
-        types.BuiltinFunctionType: _unregister_builtin,
-        types.FunctionType: _unregister_function,
-        types.MethodType: _unregister_method,
-    }
-    if obj_type not in _unregister:
-        raise NotImplementedError(f"Unsupported type: {obj_type}")
-    _unregister[obj_type](obj, depth=depth)
-    return obj
-
-
-def _unregister_builtin_addr(addr: int, depth: int | None = None):
-    handlers = _HANDLERS[addr, types.BuiltinFunctionType]
-    if depth is None:
-        depth = handlers.__len__()
-    while handlers.__len__() and depth > 0:
-        depth -= 1
-        (_, dealloc), *_, _obj_bytes = handlers.pop()
-        ctypes.memmove(
-            addr + 2 * PTR_SIZE,
-            _obj_bytes[2 * PTR_SIZE :],
-            _obj_bytes.__len__() - 2 * PTR_SIZE,
-        )
-        dealloc()
-
-
-def _unregister_builtin(obj: types.BuiltinFunctionType, depth: int | None = None):
-    _unregister_builtin_addr(get_addr(obj), depth=depth)
-
-
-def _unregister_function_addr(addr: int, depth: int | None = None):
-    handlers = _HANDLERS[addr, types.FunctionType]
-    if depth is None:
-        depth = handlers.__len__()
-    while handlers.__len__() and depth > 0:
-        depth -= 1
-        obj, _obj, *_ = handlers.pop()
-        obj.__code__ = _obj.__code__
-
-
-def _unregister_function(obj: types.FunctionType, depth: int | None = None):
-    _unregister_function_addr(get_addr(obj), depth=depth)
-
-
-def _unregister_method(obj: types.MethodType, depth: int | None = None):
-    _unregister_function(obj.__func__, depth=depth)
-
-
-@atexit.register
-def unregister_all() -> None:
-    r"""Unregisters all handlers."""
-    _unregister: dict[Type, Callable] = {
-        types.BuiltinFunctionType: _unregister_builtin_addr,
-        types.FunctionType: _unregister_function_addr,
-    }
-    for addr, callable_type in _HANDLERS:
-        _unregister[callable_type](addr)
-    _HANDLERS.clear()
+"""
+intercepts.registration
+~~~~~~~~~~~~~~~~~~~~~~~
+
+This module implements the intercepts registration api.
+"""
+from __future__ import annotations
+
+import atexit
+import contextlib
+import ctypes
+import gc
+import sys
+import threading
+import types
+import weakref
+from collections import defaultdict
+from typing import Any, Callable, Iterable, Iterator, Type, TypeVar, cast
+
+from ._chains import Chain, compile_chain
+from ._handlers import (
+    HEAD_WORDS,
+    INTERPRETER,
+    MAIN_INTERPRETER,
+    PTR_SIZE,
+    Py_GIL_DISABLED,
+    PyWrapperFlag_KEYWORDS,
+    alloc_counter,
+    batch,
+    get_addr,
+    is_shared,
+    make_immortal,
+    new_vectorcall_caller,
+    read_counters,
+    read_vectorcall,
+    replace_cfunction,
+    replace_cfunction_count,
+    replace_cfunction_instr,
+    replace_cfunction_sample,
+    replace_cfunction_scope,
+    replace_method_descriptor,
+    replace_method_descriptor_instr,
+    replace_vectorcall,
+    replace_vectorcall_instr,
+    replace_wrapper_descriptor,
+    replace_wrapper_descriptor_instr,
+    state_view,
+    trim_arena,
+    vectorcall_offset,
+    wrapper_descriptor_flags,
+)
+from ._utils import replace_load_global
+from .policies import (
+    CallCount,
+    Count,
+    Hooks,
+    Observe,
+    Policy,
+    Raise,
+    Redirect,
+    Scope,
+    _Filter,
+    _Sample,
+    _Scoped,
+    _Switch,
+)
+
+T = TypeVar("T", bound=Callable)
+
+
+class Intercept:
+    r"""A handler registered on an intercepted callable.
+
+    The same record is returned for a registration until it is unregistered.
+    Records hold callables that support weak references weakly, and their
+    ``obj`` is None once the callable was freed.
+
+    :ivar handler: The function or policy that handles the intercept.
+    """
+
+    __slots__ = ("_target", "handler")
+
+    def __init__(
+        self, target: Callable[[], Callable | None], handler: Callable | Policy
+    ):
+        self._target = target
+        self.handler = handler
+
+    @property
+    def obj(self) -> Callable | None:
+        r"""The intercepted callable."""
+        return self._target()
+
+    def __repr__(self) -> str:
+        return f"Intercept(obj={self.obj!r}, handler={self.handler!r})"
+
+
+class _Target(weakref.ref):
+    # a weak reference to an intercepted callable, which is purged from the
+    # registry once the callable is freed
+    __slots__ = ("key",)
+
+    key: tuple[int, Type]
+
+
+class _Toggle:
+    # the states of a callable with and without its top layer, and the
+    # function or state view that they are written to, which is None once the
+    # toggle is dropped
+    __slots__ = ("obj", "on", "off", "is_off", "is_function")
+
+    def __init__(self, obj: Any, on: Any, off: Any):
+        self.obj = obj
+        self.on = on
+        self.off = off
+        self.is_off = False
+        self.is_function = obj.__class__ is types.FunctionType
+
+    def write(self, state: Any) -> None:
+        if self.is_function:
+            self.obj.__code__ = state
+        else:
+            self.obj.raw = state
+
+
+class _StrongTarget:
+    # a reference to an intercepted callable without weak references
+    __slots__ = ("obj",)
+
+    def __init__(self, obj: Any):
+        self.obj = obj
+
+    def __call__(self) -> Any:
+        return self.obj
+
+
+# The layers of handlers of each intercepted callable, keyed by its address
+# and type. Callables are removed when their last layer is, or once they are
+# freed, since layers refer to them through their entry in _TARGETS.
+_HANDLERS: dict[tuple[int, Type], list[tuple[Any, ...]]] = defaultdict(list)
+# The reference to each intercepted callable, and the references to those
+# that were freed since the registry was last purged. A freed callable is
+# purged before its address can be reused, since the callback of its weak
+# reference runs before its memory is freed.
+_TARGETS: dict[tuple[int, Type], _Target | _StrongTarget] = {}
+_DEAD: list[_Target] = []
+# The registrations of each intercepted callable, in the order they were
+# made, which are replaced rather than appended to
+_INTERCEPTS: dict[tuple[int, Type], tuple[Intercept, ...]] = {}
+# The level of the lowest paused layer of each paused callable, its state when
+# it was paused, and the function or state view that the state is restored to
+_PAUSED: dict[tuple[int, Type], tuple[int, Any, Any]] = {}
+_STATE_VIEWS: dict[tuple[int, Type], Any] = {}
+# The toggles of the intercepts whose layer is on top of their callable, which
+# switch it between its states with and without the layer. Any change to the
+# handlers switches the callables back on and drops the toggles first.
+_TOGGLES: dict[tuple[int, Type], _Toggle] = {}
+# The layers of the intercepts that were freed while registered, which are
+# unregistered before the next change to the handlers
+_CLOSED: list[tuple[tuple[int, Type], Any, Intercept | None]] = []
+# Serializes the functions that change the handlers of callables. Calls to
+# intercepted callables never read the registry, so they never take it.
+_LOCK = threading.RLock()
+_acquire = _LOCK.acquire
+_release = _LOCK.release
+# The trampolines of removed layers, which are freed once no thread can still
+# run them. A thread that returns through a trampoline from its handler, or
+# that has yet to call the copy of the callable bound in the handler, holds
+# the handler, or its code before python 3.11, since frames did not hold
+# their function.
+_RETIRED: dict[weakref.ref, Any] = {}
+_RELEASED: list[weakref.ref] = []
+# Trampolines of policies that call out and return through their code, which
+# no object tracks, are only freed while no other thread is running.
+_RETIRED_UNTRACKED: list[Any] = []
+# Without the GIL, a thread may still be returning through a trampoline when
+# its handler is released, so released trampolines wait for a garbage
+# collection to stop every thread at a safe point, with the number of
+# collections when their release was seen.
+_RELEASED_SINCE: list[tuple[int, Any]] = []
+# The last retired layer of each callable that is not freed yet. The copy of
+# the callable bound in its handler calls the trampoline of the layer below,
+# so the layers removed after it are only retired once it is freed.
+_RETIRED_ABOVE: dict[tuple[int, Type], list] = {}
+# Whether the callables are restored when the interpreter exits, and the
+# handlers of callables that were left intercepted, which are kept with the
+# trampolines of removed handlers until the process exits
+_RESTORE_AT_EXIT = True
+_KEPT: list[Any] = []
+# Methods of the registry, bound before any handler is registered, since it
+# is read and appended to while dict.get or list.append may be intercepted
+_get_handlers = _HANDLERS.get
+_get_target = _TARGETS.get
+_get_records = _INTERCEPTS.get
+_get_paused = _PAUSED.get
+_get_state_view = _STATE_VIEWS.get
+_get_retired_above = _RETIRED_ABOVE.get
+_append_dead = _DEAD.append
+_append_released = _RELEASED.append
+_append_untracked = _RETIRED_UNTRACKED.append
+_append_released_since = _RELEASED_SINCE.append
+_append_kept = _KEPT.append
+_append_closed = _CLOSED.append
+
+
+def _check_intercept(obj, handler):
+    if isinstance(handler, Redirect) and obj == handler.target:
+        raise ValueError("A function cannot redirect to itself")
+    if INTERPRETER != MAIN_INTERPRETER and is_shared(obj):
+        raise NotImplementedError(
+            f"{obj} is shared by all interpreters, and can only be intercepted "
+            "from the main interpreter."
+        )
+    if isinstance(handler, Policy):
+        return
+    if not isinstance(handler, types.FunctionType):
+        raise ValueError("Argument `handler` must be a function or a policy.")
+    if obj == handler:
+        raise ValueError("A function cannot handle itself")
+
+
+def register(
+    obj: T,
+    handler: Callable | Policy | None = None,
+    inline: bool = False,
+    *,
+    before: Callable | None = None,
+    after: Callable | None = None,
+    on_error: Callable | None = None,
+    when: Callable | type | Iterable[type] | None = None,
+    sample: float | None = None,
+    every: int | None = None,
+    scope: Scope | None = None,
+) -> T:
+    r"""Registers an intercept handler.
+
+    Instead of a handler, hooks can be given that are called around the
+    intercepted call, and are compiled into a single handler.
+
+    :param obj: The callable to intercept.
+    :param handler: (optional) A function or a policy to handle the intercept.
+    :param inline: (optional) Whether to inline the body of a small python
+        function into the observers, samples and scopes that call it, so that
+        an observed call runs in a single frame. Functions that cannot be
+        inlined safely are called as usual. Defaults to False.
+    :param before: (optional) A callable to call with the arguments of each call.
+    :param after: (optional) A callable to call with the result of each call.
+    :param on_error: (optional) A callable to call with the exception raised by
+        a call, before it is raised again.
+    :param when: (optional) A predicate that is called with the arguments of
+        each call, or a type or collection of types of the first argument.
+        Only matching calls are handled, and others call the intercepted
+        callable directly. Defaults to all calls.
+    :param sample: (optional) The probability that a call is handled, such as
+        ``1 / 1000``. Calls that are not sampled call the intercepted callable
+        directly. Defaults to all calls.
+    :param every: (optional) The number of calls per handled call, to sample
+        calls deterministically instead. Defaults to all calls.
+    :param scope: (optional) The scope in which calls are handled. Calls
+        from other threads and contexts call the intercepted callable
+        directly. Defaults to all threads and contexts.
+    :returns: The intercepted callable.
+
+    Usage::
+
+        >>> import intercepts
+        >>> increment = lambda x: x + 1
+        >>> handler = lambda func, arg: arg - (func(arg) - arg)
+        >>> intercepts.register(increment, handler)
+        >>> increment(43)
+        42
+    """
+    if before is not None or after is not None or on_error is not None:
+        if handler is not None:
+            raise ValueError("Hooks cannot be registered with a handler.")
+        # a single before hook is an observer, which can share a loop with others
+        if after is None and on_error is None:
+            handler = Observe(cast(Callable, before))
+        else:
+            handler = Hooks(before, after, on_error)
+    register_obj = _register_func(type(obj))
+    _check_intercept(obj, handler)
+    # the handler is a function or a policy once it is checked
+    handler = cast("types.FunctionType | Policy", handler)
+    record_handler = handler
+    if sample is not None or every is not None:
+        if isinstance(handler, Count):
+            raise NotImplementedError("Count policies cannot be sampled.")
+        handler = _Sample(handler, sample, every)
+    if when is not None:
+        if isinstance(handler, Count):
+            raise NotImplementedError("Count policies cannot be filtered.")
+        # only matching calls are sampled
+        handler = _Filter(handler, when)
+    if scope is not None:
+        if isinstance(handler, Count):
+            raise NotImplementedError("Count policies cannot be scoped.")
+        # calls outside the scope are passed on before anything else
+        handler = _Scoped(handler, scope)
+    if inline and not isinstance(obj, (types.FunctionType, types.MethodType)):
+        raise NotImplementedError("Only python functions can be inlined.")
+    key = _handlers_key(obj)
+    with _writing():
+        _track(key, obj)
+        level = _unpause_key(key)
+        try:
+            records = _record(key, record_handler)
+            try:
+                if inline:
+                    register_obj(obj, handler, inline=True)
+                else:
+                    register_obj(obj, handler)
+            except BaseException:
+                _INTERCEPTS[key] = records
+                raise
+        finally:
+            if level is not None:
+                _pause_key(key, level)
+            _discard_key(key)
+    return obj
+
+
+def register_many(intercepts: Iterable[tuple[Callable, Callable | Policy]]) -> list:
+    r"""Registers many intercept handlers at once.
+
+    All handlers are checked before any callable is intercepted, and the
+    trampolines of builtins are made executable together. If registering any
+    handler fails, the handlers already registered by this call are
+    unregistered before the error is raised.
+
+    :param intercepts: The pairs of callables to intercept and their handlers.
+    :returns: The intercepted callables.
+
+    Usage::
+
+        >>> import intercepts
+        >>> intercepts.register_many([(min, intercepts.Redirect(max)), (abs, print)])
+        Traceback (most recent call last):
+          ...
+        ValueError: Argument `handler` must be a function or a policy.
+        >>> min(1, 2)
+        1
+    """
+    intercepts = list(intercepts)
+    register_funcs: list[Callable] = []
+    for obj, handler in intercepts:
+        _append(register_funcs, _register_func(type(obj)))
+        _check_intercept(obj, handler)
+    keys = [_handlers_key(obj) for obj, _ in intercepts]
+    registered: list[Callable] = []
+    with _writing(), batch():
+        paused = {}
+        for key, (obj, _) in zip(keys, intercepts):
+            if key not in paused:
+                _track(key, obj)
+                paused[key] = _unpause_key(key)
+        try:
+            for key, register_obj, (obj, handler) in zip(
+                keys, register_funcs, intercepts
+            ):
+                records = _record(key, handler)
+                try:
+                    _append(registered, register_obj(obj, handler))
+                except BaseException:
+                    _INTERCEPTS[key] = records
+                    raise
+        except BaseException:
+            for obj in reversed(registered):
+                _unregister_addr(*_handlers_key(obj), depth=1)
+            raise
+        finally:
+            for key, level in paused.items():
+                if level is not None:
+                    _pause_key(key, level)
+                _discard_key(key)
+    return registered
+
+
+def _track(key: tuple[int, Type], obj: Any) -> None:
+    # refers to a callable weakly if it can be, so that it can still be freed
+    if key in _TARGETS:
+        return
+    if isinstance(obj, types.MethodType):
+        obj = obj.__func__
+    if type(obj).__weakrefoffset__:
+        # the callback is called with the _Target itself
+        target = _Target(obj, cast(Callable, _append_dead))
+        target.key = key
+        _TARGETS[key] = target
+    else:
+        _TARGETS[key] = _StrongTarget(obj)
+
+
+def _target(obj: Any) -> _Target | _StrongTarget:
+    return _TARGETS[get_addr(obj), type(obj)]
+
+
+def _record(key: tuple[int, Type], handler: Callable | Policy) -> tuple[Intercept, ...]:
+    # records a registration before the callable is replaced, since it may
+    # be a method used here, and returns the records to restore if it fails
+    records = _get_records(key, ())
+    _INTERCEPTS[key] = records + (Intercept(_TARGETS[key], handler),)
+    return records
+
+
+def _append(values: list, value: Any) -> None:
+    # appends to a list of the registry without calling list.append, which
+    # may be intercepted
+    values += (value,)
+
+
+def _discard_key(key: tuple[int, Type]) -> None:
+    # forgets a callable once it has no handlers left
+    if not _get_handlers(key):
+        _HANDLERS.pop(key, None)
+        _INTERCEPTS.pop(key, None)
+        _STATE_VIEWS.pop(key, None)
+        _TARGETS.pop(key, None)
+
+
+def _purge() -> None:
+    # forgets the callables that were freed while intercepted, whose state
+    # is gone with them, and retires their trampolines, then switches the
+    # toggled callables back on and unregisters the freed intercepts
+    while _DEAD:
+        target = _DEAD.pop()
+        key = target.key
+        if _get_target(key) is not target:
+            continue
+        handlers = _HANDLERS.pop(key, None) or []
+        _PAUSED.pop(key, None)
+        _INTERCEPTS.pop(key, None)
+        _STATE_VIEWS.pop(key, None)
+        del _TARGETS[key]
+        toggle = _TOGGLES.pop(key, None)
+        if toggle is not None:
+            toggle.obj = None
+        if key[1] is not types.FunctionType:
+            while handlers:
+                _retire(key, handlers.pop())
+    while _TOGGLES:
+        _, toggle = _TOGGLES.popitem()
+        if toggle.is_off:
+            toggle.write(toggle.on)
+        toggle.obj = None
+    while _CLOSED:
+        key, entry, record = _CLOSED.pop()
+        for level, layer in enumerate(_get_handlers(key) or ()):
+            if _in_layer(layer, entry):
+                _unregister_entry(key, level, entry, record)
+                break
+
+
+def _register_func(obj_type: Type) -> Callable[..., Any]:
+    if obj_type in _REGISTER:
+        return _REGISTER[obj_type]
+    if vectorcall_offset(obj_type) is not None:
+        return _register_vectorcall
+    raise NotImplementedError(f"Unsupported type: {obj_type}")
+
+
+def _clone_builtin(obj: T) -> tuple[T, bytes]:
+    # sys.getsizeof would include the gc header, which precedes the object
+    _obj_bytes = ctypes.string_at(get_addr(obj), type(obj).__basicsize__)
+    # the copy lives in the bytes, which are kept with the layer and then with
+    # its retired trampoline, until the handlers that call the copy are freed
+    _obj = ctypes.cast(
+        cast(ctypes._SimpleCData, _obj_bytes),
+        ctypes.py_object,
+    ).value
+    make_immortal(get_addr(_obj))
+    return _obj, _obj_bytes
+
+
+def _register_builtin_count(
+    obj: types.BuiltinFunctionType, policy: Count
+) -> types.BuiltinFunctionType:
+    obj_addr = get_addr(obj)
+    target = _target(obj)
+    _obj, _obj_bytes = _clone_builtin(obj)
+    result = replace_cfunction_count(obj, policy.timed, _obj)
+    if result is None:  # pragma: no cover
+        raise NotImplementedError(f"Unsupported platform for {policy!r}")
+    handler_method_def, dealloc, counter = result
+    _append(
+        _HANDLERS[obj_addr, type(obj)],
+        ((handler_method_def, dealloc), (policy, target, _obj, counter), _obj_bytes),
+    )
+    return obj
+
+
+def _register_builtin_guard(
+    obj: types.BuiltinFunctionType, policy: _Sample | _Scoped
+) -> types.BuiltinFunctionType:
+    obj_addr = get_addr(obj)
+    handlers = _HANDLERS[obj_addr, type(obj)]
+    if handlers.__len__() and handlers[-1][1][0].__class__ is Chain:
+        # the policy is compiled into the python handlers on top, which
+        # calls that skip the handler must still go through
+        return _register_chain(obj, policy)
+    target = _target(obj)
+    _obj, _obj_bytes = _clone_builtin(obj)
+    if isinstance(policy, _Sample):
+        countdown, free = alloc_counter(policy._gap(), policy._gap())
+        _handler = policy._sampled_handler(
+            countdown, compile_chain(Chain((policy.handler,)), _obj)
+        )
+        result = replace_cfunction_sample(obj, _handler, countdown)
+    else:
+        # the guard only checks whether any context is in the scope
+        free = None
+        _handler = compile_chain(Chain((policy,)), _obj)
+        result = replace_cfunction_scope(obj, _handler, policy.scope._active)
+    if result is None:
+        if free is not None:
+            free()
+        return _register_chain(obj, policy)
+    handler_method_def, dealloc = result
+
+    def _dealloc() -> None:
+        dealloc()
+        if free is not None:
+            free()
+
+    _append(
+        handlers,
+        ((handler_method_def, _dealloc), (policy, target, _obj, _handler), _obj_bytes),
+    )
+    return obj
+
+
+def _register_chain(
+    obj: T, handler: types.FunctionType | Policy, inline: bool = False
+) -> T:
+    obj_addr = get_addr(obj)
+    obj_type = type(obj)
+    # looked up before the object is replaced, since it may be a type used here
+    handlers = _HANDLERS[obj_addr, obj_type]
+    chain = Chain()
+    if handlers.__len__() and handlers[-1][1][0].__class__ is Chain:
+        # the handlers on top are recompiled with the new one, rather than
+        # intercepting the previous handler chain
+        chain = handlers[-1][1][0]
+        _pop_layer(obj_addr, obj_type, handlers.pop())
+    _install_chain(obj, Chain(chain + (handler,), chain.inline or inline), handlers)
+    return obj
+
+
+def _register_builtin_policy(
+    obj: types.BuiltinFunctionType, policy: Policy
+) -> types.BuiltinFunctionType:
+    if isinstance(policy, Count):
+        return _register_builtin_count(obj, policy)
+    if isinstance(policy, (_Sample, _Scoped)):
+        return _register_builtin_guard(obj, policy)
+    target = policy.target if isinstance(policy, Redirect) else None
+    instr = policy._instr(obj)
+    if target is not None and _get_handlers((get_addr(target), type(target))):
+        # the trampoline of an intercepted target is freed on unregistration
+        instr = None
+    if instr is None and target is None:
+        return _register_chain(obj, policy)
+
+    obj_addr = get_addr(obj)
+    obj_target = _target(obj)
+    _obj_bytes = ctypes.string_at(obj_addr, type(obj).__basicsize__)
+    if instr is None:
+        # only a redirect has no instructions but a target
+        refs = replace_cfunction(obj, cast(Callable, target))
+        values: tuple[Any, ...] = (policy, obj_target, target)
+    else:
+        refs = replace_cfunction_instr(obj, instr)
+        values = (policy, obj_target)
+    _append(_HANDLERS[obj_addr, type(obj)], (refs, values, _obj_bytes))
+    return obj
+
+
+def _register_builtin(
+    obj: types.BuiltinFunctionType, handler: types.FunctionType | Policy
+) -> types.BuiltinFunctionType:
+    if isinstance(handler, Policy):
+        return _register_builtin_policy(obj, handler)
+    return _register_chain(obj, handler)
+
+
+def _install_builtin_chain(
+    obj: types.BuiltinFunctionType, chain: Chain, handlers: list
+) -> None:
+    target = _target(obj)
+    _obj, _obj_bytes = _clone_builtin(obj)
+    _handler = compile_chain(chain, _obj)
+    refs = replace_cfunction(obj, _handler)
+    _append(handlers, (refs, (chain, target, _obj, _handler), _obj_bytes))
+
+
+def _register_descriptor(
+    obj: T,
+    handler: types.FunctionType | Policy,
+    replace_instr: Callable[[T, bytes], Any],
+) -> T:
+    if isinstance(handler, Count):
+        raise NotImplementedError("Count policies only support builtin functions.")
+    if isinstance(handler, Policy):
+        instr = None if isinstance(handler, Redirect) else handler._instr(obj)
+        if instr is not None:
+            obj_addr = get_addr(obj)
+            handlers = _HANDLERS[obj_addr, type(obj)]
+            target = _target(obj)
+            _obj_bytes = ctypes.string_at(obj_addr, type(obj).__basicsize__)
+            _append(
+                handlers, (replace_instr(obj, instr), (handler, target), _obj_bytes)
+            )
+            return obj
+    return _register_chain(obj, handler)
+
+
+def _install_descriptor_chain(obj: Any, chain: Chain, handlers: list) -> None:
+    target = _target(obj)
+    _obj, _obj_bytes = _clone_builtin(obj)
+    _handler = compile_chain(chain, _obj)
+    _wrapper_handler = _handler
+    replace: Callable[[Any, Callable], Any]
+    if isinstance(obj, types.WrapperDescriptorType):
+        replace = replace_wrapper_descriptor
+        if wrapper_descriptor_flags(obj) & PyWrapperFlag_KEYWORDS:
+            _wrapper_handler = types.FunctionType(
+                replace_load_global(
+                    _wrapper_keywords_handler.__code__, "_handler", _handler
+                ),
+                _wrapper_keywords_handler.__globals__,
+                _handler.__name__,
+            )
+    else:
+        replace = replace_method_descriptor
+    refs = replace(obj, _wrapper_handler)
+    _append(
+        handlers, (refs, (chain, target, _obj, _handler, _wrapper_handler), _obj_bytes)
+    )
+
+
+def _wrapper_keywords_handler(self, args, kwargs):
+    return _handler(self, *args, **(kwargs or {}))
+
+
+def _register_method_descriptor(
+    obj: types.MethodDescriptorType, handler: types.FunctionType | Policy
+) -> types.MethodDescriptorType:
+    return _register_descriptor(obj, handler, replace_method_descriptor_instr)
+
+
+def _register_wrapper_descriptor(
+    obj: types.WrapperDescriptorType, handler: types.FunctionType | Policy
+) -> types.WrapperDescriptorType:
+    return _register_descriptor(obj, handler, replace_wrapper_descriptor_instr)
+
+
+def _vectorcall_caller(
+    obj: Callable, target: _Target | _StrongTarget
+) -> tuple[Callable, Any]:
+    vectorcall = read_vectorcall(obj)
+    # a builtin that calls the object through its original vectorcall function
+    caller = new_vectorcall_caller(obj, vectorcall) if vectorcall else None
+    if caller is None:
+        # objects without a vectorcall function are called through tp_call
+        call = type(obj).__call__
+        if target.__class__ is _StrongTarget:
+            return call.__get__(obj), None
+        return lambda *args, **kwargs: call(target(), *args, **kwargs), None
+    return caller[0], caller[1:]
+
+
+def _register_vectorcall(obj: T, handler: types.FunctionType | Policy) -> T:
+    obj_addr = get_addr(obj)
+    obj_type = type(obj)
+    # looked up before the object is replaced, since it may be a type used here
+    handlers = _HANDLERS[obj_addr, obj_type]
+    if isinstance(handler, Count):
+        raise NotImplementedError("Count policies only support builtin functions.")
+    if isinstance(handler, Policy):
+        target = _TARGETS[obj_addr, obj_type]
+        _obj_bytes = _read_vectorcall_bytes(obj_addr, obj_type)
+        refs = None
+        if isinstance(handler, Redirect):
+            refs = replace_vectorcall(obj, handler.target)
+        else:
+            instr = handler._instr(obj)
+            if instr is not None:
+                refs = replace_vectorcall_instr(obj, instr)
+        if refs is not None:
+            _append(handlers, (refs, (handler, target), _obj_bytes))
+            return obj
+    return _register_chain(obj, handler)
+
+
+def _read_vectorcall_bytes(addr: int, obj_type: Type) -> bytes:
+    return ctypes.string_at(addr + cast(int, vectorcall_offset(obj_type)), PTR_SIZE)
+
+
+def _install_vectorcall_chain(obj: Any, chain: Chain, handlers: list) -> None:
+    target = _target(obj)
+    _obj_bytes = _read_vectorcall_bytes(get_addr(obj), type(obj))
+    _obj, caller_refs = _vectorcall_caller(obj, target)
+    _handler = compile_chain(chain, _obj)
+    instr, dealloc = replace_vectorcall(obj, _handler)
+    if caller_refs is not None:
+
+        def _dealloc() -> int:
+            # the method def of the caller is kept until its trampoline is freed
+            caller_refs[1]()
+            return dealloc()
+
+    _append(
+        handlers,
+        (
+            (instr, dealloc if caller_refs is None else _dealloc),
+            (chain, target, _obj, _handler, caller_refs),
+            _obj_bytes,
+        ),
+    )
+
+
+def _register_function(
+    obj: types.FunctionType, handler: types.FunctionType | Policy, inline: bool = False
+) -> types.FunctionType:
+    if isinstance(handler, Count):
+        raise NotImplementedError("Count policies only support builtins.")
+    return _register_chain(obj, handler, inline)
+
+
+def _install_function_chain(
+    obj: types.FunctionType, chain: Chain, handlers: list
+) -> None:
+    _obj = types.FunctionType(
+        code=obj.__code__,
+        globals=obj.__globals__,
+        name=obj.__name__,
+        argdefs=obj.__defaults__,
+        closure=obj.__closure__,
+    )
+    _obj.__kwdefaults__ = obj.__kwdefaults__
+    # policies are compiled with the parameters of the function
+    _handler = compile_chain(chain, _obj, _obj)
+    obj.__code__, _code = _handler.__code__, obj.__code__
+    _append(handlers, (None, (chain, _target(obj), _obj, _handler), _code))
+
+
+def _register_method(
+    obj: types.MethodType, handler: types.FunctionType | Policy, inline: bool = False
+) -> types.MethodType:
+    _register_function(obj.__func__, handler, inline)
+    return obj
+
+
+def unregister(obj: T, depth: int | None = None) -> T:
+    r"""Unregisters the handlers for an object.
+
+    :param obj: The callable for which to unregister handlers.
+    :param depth: (optional) The maximum number of handlers to unregister. Defaults to all.
+    :returns: The previously intercepted callable.
+    """
+    key = _handlers_key(obj)
+    with _writing():
+        _unregister_addr(*key, depth=depth)
+    return obj
+
+
+def unregister_many(objs: Iterable[Callable], depth: int | None = None) -> list:
+    r"""Unregisters the handlers for many objects at once.
+
+    All objects are checked before any handler is unregistered.
+
+    :param objs: The callables for which to unregister handlers.
+    :param depth: (optional) The maximum number of handlers to unregister for
+        each callable. Defaults to all.
+    :returns: The previously intercepted callables.
+    """
+    objs = list(objs)
+    keys = [_handlers_key(obj) for obj in objs]
+    with _writing(), batch():
+        for addr, obj_type in keys:
+            _unregister_addr(addr, obj_type, depth=depth)
+    return objs
+
+
+def _handlers_key(obj: Any) -> tuple[int, Type]:
+    if isinstance(obj, types.MethodType):
+        obj = obj.__func__
+    obj_type = type(obj)
+    if obj_type not in _REGISTER and vectorcall_offset(obj_type) is None:
+        raise NotImplementedError(f"Unsupported type: {obj_type}")
+    return get_addr(obj), obj_type
+
+
+def _unregister_addr(addr: int, obj_type: Type, depth: int | None = None) -> None:
+    key = addr, obj_type
+    handlers = _HANDLERS[key]
+    level = _unpause_key(key)
+    # the number of handlers left to unregister, or -1 for all of them
+    left = -1 if depth is None else depth
+    while handlers.__len__() and left != 0:
+        layer = handlers.pop()
+        _pop_layer(addr, obj_type, layer)
+        chain = layer[1][0]
+        if chain.__class__ is not Chain:
+            left -= 1
+        elif 0 < left < chain.__len__():
+            # the older handlers of a chain are compiled again without it
+            obj = layer[1][1]()
+            _install_chain(obj, Chain(chain[:-left], chain.inline), handlers)
+            left = 0
+        elif left > 0:
+            left -= chain.__len__()
+    if level is not None:
+        _pause_key(key, level)
+    records = _get_records(key)
+    if records is not None:
+        # each registration added one handler, to a chain or as a layer
+        _INTERCEPTS[key] = records[
+            : sum(
+                layer[1][0].__len__() if layer[1][0].__class__ is Chain else 1
+                for layer in handlers
+            )
+        ]
+    _discard_key(key)
+
+
+def _pop_layer(addr: int, obj_type: Type, layer: tuple[Any, ...]) -> None:
+    refs, values, snapshot = layer
+    _write_state(addr, obj_type, values[1], snapshot)
+    if obj_type is not types.FunctionType:
+        if refs.__len__() > 2:
+            # the type slots of a descriptor are restored at once, since the
+            # layer below patches them again
+            refs[2]()
+        _retire((addr, obj_type), layer)
+
+
+def _retire(key: tuple[int, Type], layer: tuple[Any, ...]) -> None:
+    # the method def of a layer, and the bytes of the copy of the callable
+    # in its snapshot, are kept with its trampoline, since a copy of the
+    # callable may still call them
+    above = _get_retired_above(key)
+    if above is not None:
+        _append(above[2], layer)
+        return
+    refs, values, snapshot = layer
+    policy = values[0]
+    retired = [key, refs, [], snapshot]
+    if policy.__class__ is Chain or policy.__class__ in (_Sample, _Scoped):
+        marker = values[3] if sys.version_info >= (3, 11) else values[3].__code__
+        # the callback is a builtin, so no python code runs between the
+        # release of the handler and the return to its trampoline
+        _RETIRED[weakref.ref(marker, _append_released)] = retired
+    elif (
+        policy.__class__ is Raise
+        or (policy.__class__ is Count and policy.timed)
+        or (policy.__class__ is Redirect and values.__len__() > 2)
+    ):
+        _append_untracked(retired)
+    elif Py_GIL_DISABLED:
+        # another thread may still be running the trampoline
+        _append_released_since((_collections(), retired))
+    else:
+        refs[1]()
+        return
+    _RETIRED_ABOVE[key] = retired
+
+
+def _free(retired: list) -> None:
+    key, refs, below, _ = retired
+    refs[1]()
+    if _get_retired_above(key) is retired:
+        del _RETIRED_ABOVE[key]
+    for layer in below:
+        _retire(key, layer)
+
+
+def _reclaim() -> None:
+    # frees the trampolines that no thread can run anymore
+    if Py_GIL_DISABLED:
+        collections = _collections()
+        while _RELEASED_SINCE and _RELEASED_SINCE[0][0] < collections:
+            _free(_RELEASED_SINCE.pop(0)[1])
+        while _RELEASED:
+            _append_released_since((collections, _RETIRED.pop(_RELEASED.pop())))
+    while _RELEASED:
+        _free(_RETIRED.pop(_RELEASED.pop()))
+    if threading.active_count() == 1:
+        while _RETIRED_UNTRACKED:
+            _free(_RETIRED_UNTRACKED.pop())
+
+
+def _collections() -> int:
+    return sum(stats["collections"] for stats in gc.get_stats())
+
+
+@contextlib.contextmanager
+def _writing() -> Iterator[None]:
+    # serializes a change to the handlers, and frees what it leaves unused
+    with _LOCK:
+        _purge()
+        yield
+        _reclaim()
+
+
+def _read_state(addr: int, obj_type: Type, target: Callable[[], Any]) -> Any:
+    if obj_type is types.FunctionType:
+        return target().__code__
+    return _state_view((addr, obj_type)).raw
+
+
+def _write_state(
+    addr: int, obj_type: Type, target: Callable[[], Any], state: Any
+) -> None:
+    if obj_type is types.FunctionType:
+        target().__code__ = state
+        return
+    view = _state_view((addr, obj_type))
+    # the object header of a snapshot is left as it is
+    view.raw = state[state.__len__() - view.__len__() :]
+
+
+def _state_view(key: tuple[int, Type]) -> Any:
+    # the words of an object that intercepts replace, which are written
+    # without calling ctypes.memmove, since that takes most of the time to
+    # pause a callable
+    view = _get_state_view(key)
+    if view is None:
+        view = _STATE_VIEWS[key] = _make_state_view(key)
+    return view
+
+
+def _make_state_view(key: tuple[int, Type]) -> Any:
+    addr, obj_type = key
+    if obj_type in _REGISTER:
+        start, end = HEAD_WORDS * PTR_SIZE, obj_type.__basicsize__
+    else:
+        start = cast(int, vectorcall_offset(obj_type))
+        end = start + PTR_SIZE
+    return state_view(addr + start, end - start)
+
+
+def pause(obj: T) -> T:
+    r"""Pauses the handlers of a callable, until it is resumed.
+
+    The callable is restored to its original state, but its trampolines and
+    compiled handlers are kept, so pausing and resuming only swap the pointer
+    to them. Handlers registered or unregistered while a callable is paused
+    are paused with it.
+
+    :param obj: The callable for which to pause handlers.
+    :returns: The paused callable.
+
+    Usage::
+
+        >>> import intercepts
+        >>> intercepts.register(abs, intercepts.Return(0))
+        >>> intercepts.pause(abs)
+        >>> abs(-1)
+        1
+        >>> intercepts.resume(abs)
+        >>> abs(-1)
+        0
+    """
+    key = _handlers_key(obj)
+    _acquire()
+    try:
+        _purge()
+        _pause_key(key, 0)
+    finally:
+        _release()
+    return obj
+
+
+def resume(obj: T) -> T:
+    r"""Resumes the paused handlers of a callable.
+
+    :param obj: The callable for which to resume handlers.
+    :returns: The resumed callable.
+    """
+    key = _handlers_key(obj)
+    _acquire()
+    try:
+        _purge()
+        _unpause_key(key)
+    finally:
+        _release()
+    return obj
+
+
+def _pause_key(key: tuple[int, Type], level: int) -> None:
+    # disables the handlers from the layer at the given level up
+    handlers = _get_handlers(key)
+    if not handlers or level >= handlers.__len__():
+        return
+    paused = _get_paused(key)
+    if paused is not None:
+        if paused[0] <= level:
+            return
+        _unpause_key(key)
+    layer = handlers[level]
+    snapshot = layer[2]
+    if key[1] is types.FunctionType:
+        target = layer[1][1]
+        obj = target()
+        _PAUSED[key] = level, obj.__code__, target
+        obj.__code__ = snapshot
+    else:
+        view = _state_view(key)
+        _PAUSED[key] = level, view.raw, view
+        view.raw = snapshot[snapshot.__len__() - view.__len__() :]
+
+
+def _unpause_key(key: tuple[int, Type], level: int = 0) -> int | None:
+    # enables the handlers paused at or above the given level, and returns
+    # the level they were paused at
+    paused = _get_paused(key)
+    if paused is None or paused[0] < level:
+        return None
+    del _PAUSED[key]
+    if key[1] is types.FunctionType:
+        paused[2]().__code__ = paused[1]
+    else:
+        paused[2].raw = paused[1]
+    return paused[0]
+
+
+class intercepted:
+    r"""A context manager that intercepts a callable inside its block.
+
+    The handler is registered the first time the block is entered, and is
+    switched off when it exits. While its layer is the newest one on the
+    callable, switching it on and off only swaps the pointer to its prepared
+    trampoline or code, so entering the block again is nearly free.
+    Otherwise, calls skip a handler that is switched off, and go on to the
+    handlers registered on the callable before it, while the handlers
+    registered after it are left as they are. The handler is removed with
+    :meth:`close`, or once the intercept is freed.
+
+    :param obj: The callable to intercept.
+    :param handler: (optional) A function or a policy to handle the intercept.
+    :param keep: (optional) Whether to keep the handler when the block exits,
+        to enter it again. If False, the handler is unregistered when the
+        block exits. Defaults to True.
+    :param options: (optional) The keyword arguments of
+        :func:`intercepts.register`. Count policies cannot be intercepted in
+        a block.
+
+    Usage::
+
+        >>> import intercepts
+        >>> tracing = intercepts.intercepted(abs, intercepts.Return(0))
+        >>> with tracing:
+        ...     abs(-1)
+        0
+        >>> abs(-1)
+        1
+        >>> tracing.close()
+    """
+
+    __slots__ = (
+        "obj",
+        "handler",
+        "keep",
+        "options",
+        "_key",
+        "_switch",
+        "_entry",
+        "_record",
+        "_level",
+        "_toggle",
+    )
+
+    def __init__(
+        self,
+        obj: Callable,
+        handler: Callable | Policy | None = None,
+        keep: bool = True,
+        **options: Any,
+    ):
+        # the handler or policy in the layer of this intercept once registered,
+        # the record of its registration, and the level of its layer when it
+        # was last seen
+        self._entry: Any = None
+        self._record: Intercept | None = None
+        self._level = 0
+        # switches the callable between its states with and without the layer
+        # of this intercept, while the layer is on top
+        self._toggle: _Toggle | None = None
+        self.obj = obj
+        self.handler = handler
+        self.keep = keep
+        self.options = options
+        self._key = _handlers_key(obj)
+        # handles calls while any block of this intercept is running, within
+        # the scope given in the options
+        self._switch = _Switch(options.pop("scope", None))
+
+    def __enter__(self) -> Callable:
+        # the lock is taken without a with statement, which takes about as
+        # long as the rest of entering a prepared block
+        _acquire()
+        try:
+            toggle = self._toggle
+            if toggle is None or toggle.obj is None:
+                _purge()
+                if self._find_level() is None:
+                    self._register(self._key)
+            elif toggle.is_off:
+                toggle.is_off = False
+                if toggle.is_function:
+                    toggle.obj.__code__ = toggle.on
+                else:
+                    toggle.obj.raw = toggle.on
+            switch = self._switch
+            count = switch._count[0] + 1
+            switch._count[0] = switch._active[0] = count
+        finally:
+            _release()
+        return self.obj
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        _acquire()
+        try:
+            switch = self._switch
+            count = switch._count[0] - 1
+            switch._count[0] = switch._active[0] = count
+            if count:
+                return
+            if not self.keep:
+                self.close()
+                return
+            toggle = self._toggle
+            if toggle is None or toggle.obj is None:
+                toggle = self._toggle = self._make_toggle()
+                if toggle is None:
+                    # calls skip the handler in its guard instead
+                    return
+            toggle.is_off = True
+            if toggle.is_function:
+                toggle.obj.__code__ = toggle.off
+            else:
+                toggle.obj.raw = toggle.off
+        finally:
+            _release()
+
+    def __del__(self, _append_closed: Callable = _append_closed) -> None:
+        # unregistered before the next change to the handlers, since this may
+        # run during a change
+        if self._entry is not None:
+            _append_closed((self._key, self._entry, self._record))
+
+    def close(self) -> None:
+        r"""Unregisters the handler of this intercept.
+
+        The handlers registered on the callable before and after it are kept.
+        """
+        with _writing():
+            level = self._find_level()
+            if level is not None:
+                _unregister_entry(self._key, level, self._entry, self._record)
+            self._entry = self._record = self._toggle = None
+
+    def _make_toggle(self) -> _Toggle | None:
+        # prepares the states of the callable with and without the layer of
+        # this intercept, if it is the newest layer and is not paused
+        key = self._key
+        handlers = _get_handlers(key)
+        if not handlers or _get_paused(key) is not None:
+            return None
+        layer = handlers[-1]
+        policy = layer[1][0]
+        entry = self._entry
+        if policy is not entry and not (
+            policy.__class__ is Chain and policy.__len__() == 1 and policy[0] is entry
+        ):
+            return None
+        snapshot = layer[2]
+        if key[1] is types.FunctionType:
+            obj = layer[1][1]()
+            toggle = _Toggle(obj, obj.__code__, snapshot)
+        else:
+            view = _state_view(key)
+            toggle = _Toggle(
+                view, view.raw, snapshot[snapshot.__len__() - view.__len__() :]
+            )
+        _TOGGLES[key] = toggle
+        return toggle
+
+    def _find_level(self) -> int | None:
+        handlers = _get_handlers(self._key)
+        entry = self._entry
+        if entry is None or not handlers:
+            return None
+        level = self._level
+        if level < handlers.__len__() and _in_layer(handlers[level], entry):
+            return level
+        # layers below this one were unregistered
+        for level, layer in enumerate(handlers):
+            if _in_layer(layer, entry):
+                self._level = level
+                return level
+        return None
+
+    def _register(self, key: tuple[int, Type]) -> None:
+        handlers = _HANDLERS[key]
+        count = handlers.__len__()
+        level = _unpause_key(key)
+        try:
+            register(self.obj, self.handler, scope=self._switch, **self.options)
+            self._record = _INTERCEPTS[key][-1]
+            self._level = handlers.__len__() - 1
+            policy = handlers[-1][1][0]
+            self._entry = policy
+            if policy.__class__ is Chain:
+                self._entry = policy[-1]
+                if handlers.__len__() == count:
+                    # the handler is compiled into a layer of its own, so that
+                    # it can be removed without compiling the handlers below it
+                    obj = handlers[-1][1][1]()
+                    _pop_layer(*key, handlers.pop())
+                    _install_chain(obj, Chain(policy[:-1], policy.inline), handlers)
+                    _install_chain(obj, Chain(policy[-1:], policy.inline), handlers)
+                    self._level += 1
+        finally:
+            if level is not None:
+                _pause_key(key, level)
+            _discard_key(key)
+
+
+def _unregister_entry(
+    key: tuple[int, Type], level: int, entry: Any, record: Intercept | None
+) -> None:
+    # removes one handler from the layer at the given level, and installs the
+    # layers above it again, so that they call the layers below it
+    handlers = _HANDLERS[key]
+    paused = _unpause_key(key)
+    layers = handlers[level:]
+    while handlers.__len__() > level:
+        _pop_layer(*key, handlers.pop())
+    obj = layers[0][1][1]()
+    policy = layers[0][1][0]
+    if policy.__class__ is Chain and policy.__len__() > 1:
+        rest = tuple(handler for handler in policy if handler is not entry)
+        _install_chain(obj, Chain(rest, policy.inline), handlers)
+    register_obj = _register_func(key[1])
+    for layer in layers[1:]:
+        policy = layer[1][0]
+        if policy.__class__ is Chain:
+            _install_chain(obj, policy, handlers)
+        else:
+            # policies that count calls start counting again
+            register_obj(obj, policy)
+    records = _get_records(key)
+    if records is not None:
+        _INTERCEPTS[key] = tuple(other for other in records if other is not record)
+    if paused is not None:
+        _pause_key(key, paused)
+    _discard_key(key)
+
+
+def _in_layer(layer: tuple[Any, ...], entry: Any) -> bool:
+    policy = layer[1][0]
+    return policy is entry or (policy.__class__ is Chain and entry in policy)
+
+
+def _install_chain(obj: Any, chain: Chain, handlers: list) -> None:
+    obj_type = type(obj)
+    if obj_type is types.BuiltinFunctionType:
+        _install_builtin_chain(obj, chain, handlers)
+    elif obj_type is types.FunctionType:
+        _install_function_chain(obj, chain, handlers)
+    elif obj_type in _REGISTER:
+        _install_descriptor_chain(obj, chain, handlers)
+    else:
+        _install_vectorcall_chain(obj, chain, handlers)
+
+
+def counters() -> dict[Callable, CallCount]:
+    r"""Reads the call counters of all builtins intercepted with a Count policy.
+
+    All counters are read in a single pass over the counter pages.
+
+    :returns: The number of calls and ticks counted for each builtin.
+
+    Usage::
+
+        >>> import intercepts
+        >>> intercepts.register(getattr, intercepts.Count(timed=True))
+        >>> getattr(1, "real")
+        1
+        >>> intercepts.counters()
+        {<built-in function getattr>: CallCount(calls=1, ticks=...)}
+    """
+    with _LOCK:
+        _purge()
+        values = read_counters()
+        result: dict[Callable, CallCount] = {}
+        for (_, obj_type), handlers in _HANDLERS.items():
+            if obj_type is not types.BuiltinFunctionType:
+                continue
+            for _, (policy, target, *refs), _ in handlers:
+                obj = target()
+                if obj is not None and isinstance(policy, Count):
+                    calls, ticks = result.get(obj, (0, 0))
+                    counter_calls, counter_ticks = values[refs[-1]]
+                    result[obj] = CallCount(
+                        calls + counter_calls, ticks + counter_ticks
+                    )
+    return result
+
+
+def is_registered(obj: Callable) -> bool:
+    r"""Returns whether any handler is registered on a callable.
+
+    :param obj: The callable to check.
+    """
+    if isinstance(obj, types.MethodType):
+        obj = obj.__func__
+    if _CLOSED:
+        with _LOCK:
+            _purge()
+    records = _get_records((get_addr(obj), type(obj)))
+    # a freed callable at the same address may not have been purged yet
+    return records is not None and records[0].obj is obj
+
+
+def handlers(obj: Callable) -> list[Callable | Policy]:
+    r"""Returns the handlers registered on a callable.
+
+    :param obj: The callable whose handlers to return.
+    :returns: The handlers and policies, in the order they were registered.
+
+    Usage::
+
+        >>> import intercepts
+        >>> intercepts.register(abs, intercepts.Return(0))
+        >>> intercepts.handlers(abs)
+        [Return(0)]
+    """
+    if isinstance(obj, types.MethodType):
+        obj = obj.__func__
+    if _CLOSED:
+        with _LOCK:
+            _purge()
+    records = _get_records((get_addr(obj), type(obj)))
+    if records is None or records[0].obj is not obj:
+        return []
+    return [record.handler for record in records]
+
+
+def iter_intercepts() -> Iterator[Intercept]:
+    r"""Iterates over every registered handler.
+
+    The registrations are read when this is called, so handlers can be
+    registered and unregistered while iterating.
+
+    :returns: An iterator over the :class:`Intercept` of each registration.
+    """
+    with _LOCK:
+        _purge()
+        records = [record for records in _INTERCEPTS.values() for record in records]
+    return iter(records)
+
+
+def unregister_all(restore: bool = True) -> None:
+    r"""Unregisters all handlers.
+
+    The callables are restored in a single pass, in which each one is written
+    once, and their trampolines are then freed together, unmapping the pages
+    that are left empty.
+
+    :param restore: (optional) Whether to restore the intercepted callables.
+        If False, the handlers are forgotten without restoring the callables,
+        which keep calling them until the process exits. Defaults to True.
+    """
+    with _writing():
+        if not restore:
+            _keep()
+            return
+        with batch():
+            for key, handlers in _HANDLERS.items():
+                target = _TARGETS[key]
+                # held while it is restored
+                obj = target()
+                if obj is None or not handlers:
+                    continue
+                # the snapshot of the lowest layer is the original state, and
+                # is written without keeping a view, so that the objects
+                # allocated for each callable are freed as it is restored
+                snapshot = handlers[0][2]
+                if key[1] is types.FunctionType:
+                    obj.__code__ = snapshot
+                    continue
+                view = _STATE_VIEWS.pop(key, None) or _make_state_view(key)
+                view.raw = snapshot[snapshot.__len__() - view.__len__() :]
+                for refs, _, _ in reversed(handlers):
+                    if refs.__len__() > 2:
+                        refs[2]()
+            # the layers of callables freed meanwhile are retired as well
+            for key, handlers in _HANDLERS.items():
+                if key[1] is not types.FunctionType:
+                    while handlers:
+                        _retire(key, handlers.pop())
+            _clear()
+        _reclaim()
+        trim_arena()
+
+
+def _clear() -> None:
+    _HANDLERS.clear()
+    _INTERCEPTS.clear()
+    _PAUSED.clear()
+    _STATE_VIEWS.clear()
+    _TARGETS.clear()
+
+
+def _keep() -> None:
+    # the handlers may still be called while the interpreter shuts down, after
+    # the globals of this module are cleared
+    if not _KEPT:
+        ctypes.pythonapi.Py_IncRef(ctypes.py_object(_KEPT))
+        _KEPT.extend((_RETIRED, _RETIRED_UNTRACKED, _RELEASED_SINCE))
+    _append_kept(list(_HANDLERS.values()))
+    _clear()
+
+
+def restore_at_exit(restore: bool = True) -> None:
+    r"""Sets whether intercepted callables are restored when the interpreter exits.
+
+    By default, all handlers are unregistered at exit. A process that exits
+    anyway can skip restoring its callables, which then stay intercepted
+    while the interpreter shuts down.
+
+    :param restore: (optional) Whether to restore the callables at exit.
+        Defaults to True.
+    """
+    global _RESTORE_AT_EXIT
+    _RESTORE_AT_EXIT = restore
+
+
+@atexit.register
+def _unregister_at_exit() -> None:
+    unregister_all(_RESTORE_AT_EXIT)
+
+
+_REGISTER: dict[Type, Callable[[Any, Any], Any]] = {
+    types.BuiltinFunctionType: _register_builtin,
+    types.FunctionType: _register_function,
+    types.MethodType: _register_method,
+    types.MethodDescriptorType: _register_method_descriptor,
+    types.WrapperDescriptorType: _register_wrapper_descriptor,
+}
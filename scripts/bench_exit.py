@@ -0,0 +1,72 @@
+"""Measures the time intercepts takes to shut down with many intercepts.
+
+Usage: python scripts/bench_exit.py [-n RUNS] [-i INTERCEPTS] [--keep]
+
+Each run starts a new interpreter, which registers a handler on each of as
+many python functions, ``functools.partial`` objects and bound builtin
+methods, and then exits. The time measured is that of the exit hook of
+intercepts, which restores every callable unless ``--keep`` is given.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+_TIMER = """
+import atexit, time
+timer = [0.0]
+# the hooks run in reverse order, so this one runs after intercepts exits
+atexit.register(lambda: print(time.perf_counter() - timer[0]))
+import functools, intercepts
+
+def increment(num):
+    return num + 1
+
+def handler(*args, **kwargs):
+    return _(*args, **kwargs)
+
+count = {intercepts} // 3
+functions = [
+    type(increment)(increment.__code__, globals(), f"f{{i}}") for i in range(count)
+]
+partials = [functools.partial(increment) for _ in range(count)]
+lists = [[] for _ in range(count)]
+methods = [items.append for items in lists]
+intercepts.register_many(
+    (obj, handler) for obj in functions + partials + methods
+)
+intercepts.restore_at_exit({restore})
+atexit.register(lambda: timer.__setitem__(0, time.perf_counter()))
+"""
+
+
+def exit_time(intercepts: int, restore: bool) -> float:
+    output = subprocess.check_output(
+        [
+            sys.executable,
+            "-c",
+            _TIMER.format(intercepts=intercepts, restore=restore),
+        ],
+        text=True,
+    )
+    return float(output)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    parser.add_argument("-i", "--intercepts", type=int, default=10_000)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    times = [exit_time(args.intercepts, not args.keep) for _ in range(args.runs)]
+    print(
+        f"exit with {args.intercepts} intercepts"
+        f"{' kept' if args.keep else ''}: "
+        f"median {statistics.median(times) * 1000:.2f} ms, "
+        f"min {min(times) * 1000:.2f} ms ({args.runs} runs)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Measures the time to import intercepts in a fresh interpreter.
+
+Usage: python scripts/bench_import.py [-n RUNS] [-m MODULE]
+
+Each run starts a new interpreter, so the measured time includes everything
+done at import, but not interpreter startup. Byte code should be compiled
+first (``python -m compileall intercepts``), especially when
+PYTHONDONTWRITEBYTECODE is set, or the time to compile the sources is
+measured instead.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+_TIMER = (
+    "import time; start = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def import_time(module: str) -> float:
+    output = subprocess.check_output(
+        [sys.executable, "-c", _TIMER.format(module=module)], text=True
+    )
+    return float(output)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--runs", type=int, default=20)
+    parser.add_argument("-m", "--module", default="intercepts")
+    args = parser.parse_args()
+
+    times = [import_time(args.module) for _ in range(args.runs)]
+    print(
+        f"import {args.module}: "
+        f"median {statistics.median(times) * 1000:.2f} ms, "
+        f"min {min(times) * 1000:.2f} ms ({args.runs} runs)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,3 +7,4 @@ import intercepts
 def unregister_intercepts():
     intercepts.unregister_all()
     yield
+    intercepts.unregister_all()
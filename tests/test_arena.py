@@ -0,0 +1,196 @@
+import builtins
+import ctypes
+import sys
+
+import pytest
+
+import intercepts
+from intercepts import _handlers
+from intercepts._handlers.arena import SLOT_ALIGN, Arena
+
+BUILTINS = [
+    obj
+    for name, obj in vars(builtins).items()
+    if callable(obj) and type(obj) is type(print) and name not in ("len", "globals")
+]
+
+
+def handler(*args, **kwargs):
+    return _(*args, **kwargs)
+
+
+def test_register_shares_pages():
+    stats = intercepts.arena_stats()
+    for func in BUILTINS:
+        intercepts.register(func, handler)
+    registered_stats = intercepts.arena_stats()
+    intercepts.unregister_all()
+    unregistered_stats = intercepts.arena_stats()
+
+    assert registered_stats.slots_used == stats.slots_used + len(BUILTINS)
+    assert registered_stats.pages <= stats.pages + 2
+    assert unregistered_stats.slots_used == stats.slots_used
+    # the pages left empty are unmapped together
+    assert unregistered_stats.pages <= stats.pages
+
+
+def test_register_reuses_slots():
+    intercepts.register(sum, handler)
+    intercepts.unregister(sum)
+    stats = intercepts.arena_stats()
+    intercepts.register(sum, handler)
+    assert sum([1, 2]) == 3
+    registered_stats = intercepts.arena_stats()
+    assert registered_stats.pages == stats.pages
+    assert registered_stats.slots_free == stats.slots_free - 1
+
+
+def test_register_reuses_sealed_slots(monkeypatch):
+    if sys.platform.startswith("linux"):
+        # trampolines are written to the single mapping, as on Windows
+        from intercepts._handlers import linux
+
+        monkeypatch.setattr(linux, "_malloc_dual", lambda size: None)
+        arena = Arena(linux.malloc, linux.mprotect, linux.unprotect, linux.PAGESIZE)
+        monkeypatch.setattr(_handlers, "_ARENA", arena)
+    # a live trampoline keeps its chunk mapped
+    intercepts.register(abs, handler)
+    stats = intercepts.arena_stats()
+    for _ in range(20):
+        intercepts.register(sum, handler)
+        assert sum([1, 2]) == 3
+        assert intercepts.arena_stats().pages == stats.pages
+        intercepts.unregister(sum)
+    intercepts.unregister_all()
+    assert abs(-1) == 1
+
+
+def test_no_writable_executable_pages():
+    if not sys.platform.startswith("linux"):
+        pytest.skip("requires /proc/self/maps")
+    intercepts.register(sum, handler)
+    with open("/proc/self/maps") as maps:
+        permissions = [line.split()[1] for line in maps]
+    assert not any("w" in perms and "x" in perms for perms in permissions)
+
+
+def test_arena_packs_slots():
+    mapped = []
+    arena = Arena(
+        lambda size: (mapped.append(size) or 4096 * len(mapped), 0, lambda: 0),
+        lambda addr, size: None,
+        lambda addr, size: None,
+        4096,
+    )
+    addrs = [arena.malloc(40)[0] for _ in range(4096 // 48)]
+    assert mapped == [4096]
+    assert len(set(addrs)) == len(addrs)
+    assert all(addr % SLOT_ALIGN == 0 for addr in addrs)
+    stats = arena.stats()
+    assert stats.pages == 1
+    assert stats.slots_used == len(addrs)
+    assert stats.bytes_used == 40 * len(addrs)
+    assert stats.bytes_wasted == 8 * len(addrs)
+    arena.malloc(40)
+    assert mapped == [4096, 4096]
+
+
+def test_arena_free_list():
+    arena = Arena(
+        lambda size: (4096, 0, lambda: 0),
+        lambda addr, size: None,
+        lambda addr, size: None,
+        4096,
+    )
+    addr_0, dealloc_0 = arena.malloc(32)
+    addr_1, dealloc_1 = arena.malloc(32)
+    dealloc_1()
+    dealloc_0()
+    assert arena.stats().slots_free == 2
+    assert arena.malloc(32)[0] == addr_1
+    assert arena.malloc(32)[0] == addr_0
+    assert arena.stats().slots_free == 0
+
+
+def test_arena_dual_mapped_write():
+    rw_buffer = ctypes.create_string_buffer(4096)
+    rx_addr = 1 << 20
+    protected = []
+    arena = Arena(
+        lambda size: (ctypes.addressof(rw_buffer), rx_addr, lambda: 0),
+        lambda addr, size: protected.append(addr),
+        lambda addr, size: protected.append(addr),
+        4096,
+    )
+    arena.malloc(16)
+    addr, _ = arena.malloc(16)
+    arena.write(addr, b"\xcc" * 16)
+    assert rw_buffer.raw[addr - rx_addr :][:16] == b"\xcc" * 16
+    assert not protected
+
+
+def test_arena_seals_written_chunks():
+    buffers = []
+    protected = []
+    unprotected = []
+    unmapped = []
+
+    def malloc(size):
+        buffers.append(ctypes.create_string_buffer(size))
+        addr = ctypes.addressof(buffers[-1])
+        return addr, addr, lambda: unmapped.append(addr)
+
+    arena = Arena(
+        malloc,
+        lambda addr, size: protected.append(addr),
+        lambda addr, size: unprotected.append(addr),
+        4096,
+    )
+    addr_0, dealloc_0 = arena.malloc(16)
+    page = ctypes.addressof(buffers[0])
+    arena.write(addr_0, b"\xcc" * 16)
+    assert protected == [page]
+
+    with arena.batch():
+        slots = [arena.malloc(16) for _ in range(3)]
+        for addr, _ in slots:
+            arena.write(addr, b"\xcc" * 16)
+        # the sealed chunk is only written while it is unsealed
+        assert unprotected == [page]
+        assert protected == [page]
+    assert protected == [page, page]
+    assert len(buffers) == 1
+
+    # freed slots of a sealed chunk are reused, rather than mapping new pages
+    dealloc_0()
+    addr, _ = arena.malloc(16)
+    assert addr == addr_0
+    arena.write(addr, b"\x90" * 16)
+    assert buffers[0].raw[:16] == b"\x90" * 16
+    assert unprotected == [page, page]
+    assert protected == [page, page, page]
+    assert not unmapped
+    assert arena.stats().pages == 1
+
+
+def test_arena_trim():
+    mapped = []
+    unmapped = []
+
+    def malloc(size):
+        mapped.append(4096 * (len(mapped) + 1))
+        addr = mapped[-1]
+        return addr, addr + (1 << 20), lambda: unmapped.append(addr)
+
+    arena = Arena(malloc, lambda addr, size: None, lambda addr, size: None, 4096)
+    slots = [arena.malloc(1024) for _ in range(8)]
+    assert len(mapped) == 2
+    for _, dealloc in slots[1:]:
+        dealloc()
+    assert arena.trim() == 1
+    assert unmapped == [mapped[1]]
+    stats = arena.stats()
+    assert stats.pages == 1
+    assert stats.slots_used == 1
+    assert stats.slots_free == 3
+    assert arena.trim() == 0
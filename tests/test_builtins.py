@@ -105,3 +105,36 @@ def test_unregister_multiple_handlers_depth_1():
         "handled",
         result,
     ), "one handler function should modify output"
+
+
+def test_register_sorted_kwargs():
+    args = ([1, 4, 6, 2, 9, 5, 10, 11, 11, 3, -18],)
+    kwargs = {"key": abs, "reverse": True}
+    result = sorted(*args, **kwargs)
+    intercepts.register(sorted, handler)
+    assert sorted(*args, **kwargs) == (
+        "handled",
+        result,
+    ), "handler function should receive keyword arguments"
+    assert sorted([3, 1, 2], reverse=True) == ("handled", [3, 2, 1])
+
+
+def test_register_noargs():
+    result = globals()
+    intercepts.register(globals, handler)
+    handled_result = globals()
+    intercepts.unregister(globals)
+    assert handled_result[0] == "handled", "handler function should modify output"
+    assert globals() is result, "function should no longer be intercepted"
+
+
+def test_register_specialized_call_site():
+    def count(values):
+        return len(values)
+
+    intercepts.register(len, handler)
+    results = [count([1, 2, 3]) for _ in range(100)]
+    intercepts.unregister(len)
+    assert all(
+        result == ("handled", 3) for result in results
+    ), "handler function should modify output of specialized calls"
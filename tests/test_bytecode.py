@@ -0,0 +1,140 @@
+import dis
+import sys
+import types
+
+import pytest
+
+from intercepts._chains import bind_handler
+from intercepts._utils import replace_load_global
+
+
+def load_globals(code):
+    names = [
+        instr.argval
+        for instr in dis.get_instructions(code)
+        if instr.opname == "LOAD_GLOBAL"
+    ]
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.extend(load_globals(const))
+    return names
+
+
+def bind(source, name="handler", value=abs):
+    namespace = {}
+    exec(source, namespace)
+    func = namespace[name]
+    code = replace_load_global(func.__code__, "_", value)
+    assert "_" not in load_globals(code)
+    return types.FunctionType(code, {}, func.__name__, func.__defaults__)
+
+
+def test_call():
+    handler = bind("def handler(x):\n    return _(x) + 1")
+    assert handler(-1) == 2
+
+
+def test_attribute():
+    handler = bind("def handler():\n    return _.__name__")
+    assert handler() == "abs"
+
+
+def test_method_call():
+    handler = bind("def handler(x):\n    return _.__call__(x)")
+    assert handler(-1) == 1
+
+
+def test_unused():
+    def handler(x):
+        return x
+
+    assert replace_load_global(handler.__code__, "_", abs) is handler.__code__
+
+
+def test_lambda():
+    handler = bind("def handler(x):\n    return (lambda y: _(y))(x)")
+    assert handler(-1) == 1
+
+
+def test_comprehension():
+    handler = bind("def handler(*args):\n    return [_(x) for x in args]")
+    assert handler(-1, -2) == [1, 2]
+
+
+def test_inner_function():
+    source = (
+        "def handler(x):\n"
+        "    def inner(y):\n"
+        "        return [_(z) for z in y]\n"
+        "    return inner([x])"
+    )
+    assert bind(source)(-1) == [1]
+
+
+def test_many_names():
+    names = [f"name_{i}" for i in range(300)]
+    source = (
+        "def handler(x):\n"
+        f"    if x is None:\n        return ({', '.join(names)})\n"
+        "    return _(x)"
+    )
+    handler = bind(source)
+    assert handler.__code__.co_names.index("_") > 255
+    assert handler(-1) == 1
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 11), reason="LOAD_GLOBAL has no inline cache entries"
+)
+def test_many_consts():
+    source = (
+        "def handler(x):\n"
+        + "".join(f"    y = 'const_{i}'\n" for i in range(300))
+        + "    return _(x), _.__name__"
+    )
+    handler = bind(source)
+    assert len(handler.__code__.co_consts) > 256
+    assert handler(-1) == (1, "abs")
+
+
+@pytest.mark.skipif(
+    sys.version_info >= (3, 11), reason="LOAD_GLOBAL has inline cache entries"
+)
+def test_many_consts_without_room():
+    source = (
+        "def handler(x):\n"
+        + "".join(f"    y = 'const_{i}'\n" for i in range(300))
+        + "    return _(x)"
+    )
+    with pytest.raises(ValueError):
+        bind(source)
+
+
+def test_many_consts_bound():
+    source = (
+        "def handler(x):\n"
+        + "".join(f"    y = 'const_{i}'\n" for i in range(300))
+        + "    return [_(z) for z in (x,)][0], offset"
+    )
+    namespace = {"offset": 1}
+    exec(source, namespace)
+    # without room for the constant, the handler looks _ up in its globals
+    handler = bind_handler(namespace["handler"], abs)
+    assert handler(-1) == (1, 1)
+    namespace["offset"] = 2
+    assert handler(-1) == (1, 2)
+    assert "_" not in namespace
+
+
+def test_jumps():
+    source = (
+        "def handler(values):\n"
+        "    total = 0\n"
+        "    for value in values:\n"
+        "        if value < 0:\n"
+        "            total += _(value)\n"
+        "        else:\n"
+        "            total -= _(value)\n"
+        "    return total"
+    )
+    assert bind(source)([-1, 2, -3]) == 2
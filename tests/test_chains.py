@@ -0,0 +1,123 @@
+import functools
+import sys
+
+import pytest
+
+import intercepts
+
+
+def add_one(*args, **kwargs):
+    return _(*args, **kwargs) + 1
+
+
+def times_ten(*args, **kwargs):
+    return _(*args, **kwargs) * 10
+
+
+def frames(*args, **kwargs):
+    frame, depth = sys._getframe(), 0
+    while frame.f_code.co_name in ("frames", "add_one", "_observe_handler"):
+        frame, depth = frame.f_back, depth + 1
+    return depth, _(*args, **kwargs)
+
+
+def test_stacked_builtin_shares_trampoline():
+    stats = intercepts.arena_stats()
+    for handler in (add_one, times_ten, add_one):
+        intercepts.register(abs, handler)
+    assert intercepts.arena_stats().slots_used == stats.slots_used + 1
+    assert abs(-1) == 21
+    intercepts.unregister(abs, depth=2)
+    assert intercepts.arena_stats().slots_used == stats.slots_used + 1
+    assert abs(-1) == 2
+    intercepts.unregister(abs)
+    assert intercepts.arena_stats().slots_used == stats.slots_used
+    assert abs(-1) == 1
+
+
+def test_stacked_function():
+    def func(x):
+        return x
+
+    intercepts.register(func, add_one)
+    intercepts.register(func, times_ten)
+    intercepts.register(func, add_one)
+    assert func(1) == 21
+    intercepts.unregister(func, depth=1)
+    assert func(1) == 20
+    intercepts.unregister(func)
+    assert func(1) == 1
+
+
+def test_stacked_function_defaults():
+    def func(a, b=2, *, c=3):
+        return a + b + c
+
+    hooks = [
+        {"handler": add_one},
+        {"after": lambda result: None},
+        {"before": lambda *args, **kwargs: None},
+    ]
+    for options in hooks:
+        intercepts.register(func, **options)
+        assert func(1) == 7
+        assert func(1, 1, c=1) == 4
+
+
+def test_stacked_vectorcall():
+    func = functools.partial(max, 0)
+    intercepts.register(func, add_one)
+    intercepts.register(func, times_ten)
+    assert func(1) == 20
+    intercepts.unregister(func, depth=1)
+    assert func(1) == 2
+
+
+def test_stacked_handlers_unwrap():
+    intercepts.register(abs, frames)
+    intercepts.register(abs, lambda x: _(x)[1])
+    intercepts.register(abs, add_one)
+    assert abs(-1) == 2
+    intercepts.unregister(abs, depth=2)
+    assert abs(-1) == (1, 1)
+
+
+def test_observers_share_frame():
+    calls = []
+    intercepts.register(abs, frames)
+    intercepts.register(abs, intercepts.Observe(lambda x: calls.append(("a", x))))
+    intercepts.register(abs, intercepts.Observe(lambda x: calls.append(("b", x))))
+    assert abs(-2) == (2, 2)
+    assert calls == [("b", -2), ("a", -2)]
+    intercepts.unregister(abs, depth=1)
+    assert abs(-3) == (2, 3)
+    assert calls == [("b", -2), ("a", -2), ("a", -3)]
+
+
+def test_observe_method_descriptor():
+    calls = []
+    intercepts.register(str.upper, intercepts.Observe(calls.append))
+    intercepts.register(str.upper, intercepts.Observe(calls.append))
+    result = "a".upper()
+    intercepts.unregister(str.upper)
+    assert result == "A"
+    assert calls == ["a", "a"]
+
+
+def test_observe_errors():
+    intercepts.register(abs, intercepts.Observe(lambda x: 1 / x))
+    with pytest.raises(ZeroDivisionError):
+        abs(0)
+    with pytest.raises(ValueError):
+        intercepts.Observe(None)
+
+
+def test_stacked_around_policies():
+    intercepts.register(abs, add_one)
+    intercepts.register(abs, intercepts.Return(5))
+    intercepts.register(abs, add_one)
+    assert abs(-1) == 6
+    intercepts.unregister(abs, depth=1)
+    assert abs(-1) == 5
+    intercepts.unregister(abs, depth=1)
+    assert abs(-1) == 2
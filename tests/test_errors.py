@@ -3,6 +3,11 @@ import pytest
 import intercepts
 
 
+class Increment:
+    def __call__(self, num):
+        return num + 1
+
+
 def test_non_function_handler():
     with pytest.raises(ValueError):
         intercepts.register(sum, print)
@@ -17,9 +22,9 @@ def test_handle_handler():
 def test_register_unsupported():
     handler = lambda x: x
     with pytest.raises(NotImplementedError):
-        intercepts.register(int, handler)
+        intercepts.register(Increment(), handler)
 
 
 def test_unregister_unsupported():
     with pytest.raises(NotImplementedError):
-        intercepts.unregister(int)
+        intercepts.unregister(Increment())
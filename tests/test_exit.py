@@ -0,0 +1,75 @@
+import functools
+import math
+import subprocess
+import sys
+
+import intercepts
+from intercepts.registration import _HANDLERS
+
+
+def increment(num):
+    return num + 1
+
+
+def handler(*args, **kwargs):
+    return "handled", _(*args, **kwargs)
+
+
+def run(code):
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    return output.split()
+
+
+def test_unregister_all_restores_layers():
+    add = functools.partial(increment)
+    intercepts.register(math.floor, handler)
+    intercepts.register(math.floor, intercepts.Count())
+    intercepts.register(math.floor, intercepts.Return(0))
+    intercepts.register(frozenset.__len__, handler)
+    intercepts.register(increment, handler)
+    intercepts.register(add, intercepts.Return(0))
+    intercepts.pause(increment)
+    intercepts.pause(math.floor)
+    intercepts.unregister_all()
+    assert math.floor(1.5) == 1
+    assert len(frozenset((1, 2))) == 2
+    assert increment(1) == 2
+    assert add(1) == 2
+    assert not _HANDLERS
+    assert list(intercepts.iter_intercepts()) == []
+
+
+def test_unregister_all_without_restoring():
+    add = functools.partial(increment)
+    intercepts.register(add, handler)
+    intercepts.unregister_all(restore=False)
+    assert not intercepts.is_registered(add)
+    assert not _HANDLERS
+    # the handler is kept, rather than freed while it is still called
+    assert add(1) == ("handled", 2)
+
+
+def test_restored_at_exit():
+    # the hook registered first runs last, once intercepts has exited
+    code = """
+import atexit, math
+atexit.register(lambda: print(math.floor(1.5)))
+import intercepts
+intercepts.register(math.floor, intercepts.Return(0))
+"""
+    assert run(code) == ["1"]
+
+
+def test_kept_at_exit():
+    code = """
+import atexit, functools, math
+atexit.register(lambda: print(math.floor(1.5), add(1)))
+import intercepts
+def handler(num):
+    return _(num) + 1
+add = functools.partial(int)
+intercepts.register(math.floor, handler)
+intercepts.register(add, handler)
+intercepts.restore_at_exit(False)
+"""
+    assert run(code) == ["2", "2"]
@@ -0,0 +1,93 @@
+import ctypes
+import math
+import os
+import threading
+import time
+
+import pytest
+
+import intercepts
+from intercepts._handlers import HEAD_WORDS, PTR_SIZE, Py_GIL_DISABLED
+from intercepts._handlers.base import _CFUNCTION_SELF_OFFSET
+
+THREADS = min(os.cpu_count() or 1, 4)
+
+
+def increment(num):
+    return num + 1
+
+
+def passthrough(*args, **kwargs):
+    return _(*args, **kwargs)
+
+
+def throughput(obj, args, threads, seconds=0.5):
+    # the number of calls per second of all threads together
+    calls = [0] * threads
+    start = threading.Barrier(threads + 1)
+    stop = threading.Event()
+
+    def run(i):
+        start.wait()
+        count = 0
+        while not stop.is_set():
+            for _ in range(1000):
+                obj(*args)
+            count += 1000
+        calls[i] = count
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    start.wait()
+    began = time.perf_counter()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return sum(calls) / (time.perf_counter() - began)
+
+
+def test_object_layout():
+    assert object.__basicsize__ == HEAD_WORDS * PTR_SIZE
+    m_self = ctypes.c_void_p.from_address(
+        id(math.floor) + _CFUNCTION_SELF_OFFSET * PTR_SIZE
+    )
+    assert m_self.value == id(math)
+
+
+def test_clones_outlive_threads():
+    def call():
+        for _ in range(1000):
+            assert math.floor(1.5) == 1
+            assert increment(1) == 2
+
+    intercepts.register(math.floor, passthrough)
+    intercepts.register(increment, passthrough)
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    intercepts.unregister_all()
+    assert math.floor(1.5) == 1
+    assert increment(1) == 2
+
+
+@pytest.mark.skipif(not Py_GIL_DISABLED, reason="free-threaded builds only")
+@pytest.mark.skipif(THREADS < 2, reason="needs several cores")
+@pytest.mark.parametrize(
+    "obj,args,handler",
+    [
+        (math.floor, (1.5,), intercepts.Count()),
+        (math.floor, (1.5,), passthrough),
+        (increment, (1,), passthrough),
+    ],
+)
+def test_scaling(obj, args, handler):
+    intercepts.register(obj, handler)
+    single = throughput(obj, args, 1)
+    parallel = throughput(obj, args, THREADS)
+    intercepts.unregister(obj)
+    # calls on other cores must not wait for each other
+    assert parallel > single * THREADS / 2
@@ -0,0 +1,88 @@
+import pytest
+
+import intercepts
+
+
+def add(a, b):
+    return a + b
+
+
+def divide(a, b):
+    return a / b
+
+
+def test_before():
+    calls = []
+    intercepts.register(add, before=lambda a, b: calls.append((a, b)))
+    assert add(1, 2) == 3
+    assert calls == [(1, 2)]
+
+
+def test_after():
+    results = []
+    intercepts.register(add, after=results.append)
+    assert add(1, 2) == 3
+    assert results == [3]
+
+
+def test_on_error():
+    errors = []
+    intercepts.register(divide, on_error=errors.append)
+    assert divide(1, 2) == 0.5
+    with pytest.raises(ZeroDivisionError):
+        divide(1, 0)
+    assert [type(error) for error in errors] == [ZeroDivisionError]
+
+
+def test_all_hooks():
+    events = []
+    intercepts.register(
+        divide,
+        before=lambda a, b: events.append("before"),
+        after=lambda result: events.append(result),
+        on_error=lambda error: events.append("error"),
+    )
+    divide(4, 2)
+    with pytest.raises(ZeroDivisionError):
+        divide(1, 0)
+    assert events == ["before", 2.0, "before", "error"]
+    intercepts.unregister(divide)
+    divide(4, 2)
+    assert events.__len__() == 4
+
+
+def test_hooks_signature():
+    intercepts.register(add, after=lambda result: None)
+    assert add.__code__.co_varnames[:2] == ("a", "b")
+    assert add(a=1, b=2) == 3
+
+
+def test_hooks_builtin():
+    results = []
+    intercepts.register(abs, after=results.append)
+    intercepts.register(str.upper, before=results.append)
+    values = [abs(-1), "a".upper()]
+    intercepts.unregister_all()
+    assert values == [1, "A"]
+    assert results == [1, "a"]
+
+
+def test_hooks_stacked():
+    events = []
+    intercepts.register(add, lambda a, b: _(a, b) * 10)
+    intercepts.register(add, after=events.append)
+    intercepts.register(add, before=lambda a, b: events.append("before"))
+    assert add(1, 2) == 30
+    assert events == ["before", 30]
+
+
+def test_hooks_errors():
+    with pytest.raises(ValueError):
+        intercepts.register(add, lambda a, b: _(a, b), before=print)
+    with pytest.raises(ValueError):
+        intercepts.register(add, after=1)
+    with pytest.raises(ValueError):
+        intercepts.Hooks()
+    assert (
+        repr(intercepts.Hooks(after=print)) == "Hooks(after=<built-in function print>)"
+    )
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+import pytest
+
+
+def test_import_is_lazy():
+    # run in a new interpreter, since pytest imports these modules itself
+    code = (
+        "import sys; before = set(sys.modules); import intercepts; "
+        "slow = {'ctypes.util', 'platform', 'subprocess', 'sysconfig'}; "
+        "print(sorted(slow & set(sys.modules) - before))"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.strip() == "[]"
+
+
+def test_import_time():
+    # the time in microseconds that -X importtime reports for each module,
+    # including the modules it imports
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import intercepts"],
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    ).stderr
+    times = {}
+    for line in output.splitlines()[1:]:
+        _, _, cumulative, name = line.replace("|", ":").split(":")
+        times[name.strip()] = int(cumulative)
+    # well above the tens of milliseconds it takes on a slow machine
+    assert times["intercepts"] < 250_000
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="linux only")
+def test_libc_bound_on_first_use():
+    code = (
+        "import intercepts; from intercepts._handlers import linux; "
+        "before = linux._CDLL is None; intercepts.register(abs, lambda x: x); "
+        "print(before, linux._CDLL is not None)"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.split() == ["True", "True"]
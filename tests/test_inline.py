@@ -0,0 +1,116 @@
+import sys
+import traceback
+
+import pytest
+
+import intercepts
+
+
+class Point:
+    def __init__(self, x):
+        self.x = x
+
+    def get_x(self):
+        return self.x
+
+
+def get_x(point):
+    return point.x
+
+
+def caller_name(a, b):
+    return sys._getframe(1).f_code.co_name, a + b
+
+
+def test_inline():
+    calls = []
+    intercepts.register(get_x, intercepts.Observe(calls.append), inline=True)
+    assert get_x(Point(1)) == 1
+    assert calls.__len__() == 1
+    intercepts.unregister(get_x)
+    assert get_x(Point(2)) == 2
+
+
+def test_inline_single_frame():
+    intercepts.register(caller_name, intercepts.Observe(lambda a, b: None))
+    assert caller_name(1, 2)[0] == "_observe_handler"
+    intercepts.unregister(caller_name)
+    intercepts.register(caller_name, intercepts.Observe(lambda a, b: None), inline=True)
+    assert caller_name(1, 2) == ("test_inline_single_frame", 3)
+
+
+def test_inline_method():
+    calls = []
+    point = Point(3)
+    intercepts.register(point.get_x, intercepts.Observe(calls.append), inline=True)
+    assert point.get_x() == 3
+    assert calls == [point]
+
+
+def test_inline_observers():
+    calls = []
+    intercepts.register(
+        get_x, intercepts.Observe(lambda p: calls.append(1)), inline=True
+    )
+    intercepts.register(get_x, intercepts.Observe(lambda p: calls.append(2)))
+    intercepts.register(get_x, lambda p: _(p) * 10)
+    assert get_x(Point(1)) == 10
+    assert calls == [2, 1]
+    intercepts.unregister(get_x, depth=2)
+    assert get_x(Point(1)) == 1
+    assert calls == [2, 1, 1]
+
+
+def test_inline_traceback():
+    def divide(a, b):
+        return a / b
+
+    intercepts.register(divide, intercepts.Observe(lambda a, b: None), inline=True)
+    with pytest.raises(ZeroDivisionError) as excinfo:
+        divide(1, 0)
+    lineno = traceback.extract_tb(excinfo.tb)[-1].lineno
+    assert lineno == divide.__code__.co_firstlineno + 1
+
+
+def test_inline_fallback():
+    def generate(a):
+        yield a
+
+    def closure(a):
+        return lambda: a
+
+    def handles(a):
+        try:
+            return 1 / a
+        except ZeroDivisionError:
+            return None
+
+    codes = {}
+    for func in (generate, closure, handles):
+        intercepts.register(func, intercepts.Observe(lambda *args: None), inline=True)
+        codes[func] = func.__code__.co_name
+    assert set(codes.values()) == {"_observe_handler"}
+    assert list(generate(1)) == [1]
+    assert closure(1)() == 1
+    assert handles(0) is None
+
+
+def test_inline_defaults():
+    def defaults(a, b=1, *, c=2):
+        return a + b + c
+
+    calls = []
+    intercepts.register(
+        defaults,
+        intercepts.Observe(lambda *args, **kwargs: calls.append(args)),
+        inline=True,
+    )
+    assert defaults.__code__.co_name == "defaults"
+    assert defaults(1) == 4
+    assert defaults(1, 2, c=3) == 6
+    assert calls == [(1, 1), (1, 2)]
+
+
+def test_inline_builtin():
+    with pytest.raises(NotImplementedError):
+        intercepts.register(abs, intercepts.Observe(print), inline=True)
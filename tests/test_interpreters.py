@@ -0,0 +1,101 @@
+import array
+import math
+import os
+import sys
+
+import pytest
+
+import intercepts
+
+if sys.version_info < (3, 12):
+    pytest.skip("interpreters with their own GIL need 3.12+", allow_module_level=True)
+try:
+    import _interpreters as interpreters
+except ImportError:
+    interpreters = pytest.importorskip("_xxsubinterpreters")
+
+
+def run(code, isolated=True):
+    # runs code in a new interpreter, and returns what it writes to OUT
+    read, write = os.pipe()
+    if isolated or sys.version_info >= (3, 13):
+        interp = interpreters.create()
+    else:
+        # ctypes only supports interpreters with their own GIL from 3.13
+        interp = interpreters.create(isolated=False)
+    try:
+        code = f"import os, sys\nsys.path[:0] = {sys.path!r}\nOUT = {write}\n{code}"
+        assert interpreters.run_string(interp, code) is None
+    finally:
+        os.close(write)
+        interpreters.destroy(interp)
+    with os.fdopen(read) as output:
+        return output.read()
+
+
+def handler(*args, **kwargs):
+    return "handled", _(*args, **kwargs)
+
+
+def test_shared_type():
+    intercepts.register(dict, handler)
+    assert dict(a=1) == ("handled", {"a": 1})
+    result = run("os.write(OUT, repr(dict(a=1)).encode())")
+    assert result == "{'a': 1}"
+    intercepts.unregister(dict)
+    assert dict(a=1) == {"a": 1}
+
+
+def test_shared_type_policy():
+    intercepts.register(dict, intercepts.Return({}))
+    result = run("os.write(OUT, repr(dict(a=1)).encode())")
+    assert result == "{'a': 1}"
+    assert dict(a=1) == {}
+
+
+def test_register_in_interpreter():
+    intercepts.register(math.floor, handler)
+    result = run(
+        """
+import math
+import intercepts
+
+def handler(num):
+    return _(num) + 10
+
+intercepts.register(math.floor, handler)
+try:
+    intercepts.register(dict, handler)
+except NotImplementedError:
+    os.write(OUT, b"refused ")
+os.write(OUT, repr(math.floor(1.5)).encode())
+intercepts.unregister_all()
+""",
+        isolated=False,
+    )
+    assert result == "refused 11"
+    assert math.floor(1.5) == ("handled", 1)
+
+
+def test_shared_descriptor():
+    result = run(
+        """
+import array
+import intercepts
+
+for obj in [str.upper, list.__len__, array.array.tolist]:
+    try:
+        intercepts.register(obj, lambda *args: _(*args))
+    except NotImplementedError:
+        os.write(OUT, b"refused ")
+    else:
+        os.write(OUT, b"registered ")
+os.write(OUT, repr(len([1, 2])).encode())
+intercepts.unregister_all()
+""",
+        isolated=False,
+    )
+    # the descriptors of static types patch the slots that every interpreter
+    # uses, while those of heap types belong to the interpreter
+    assert result == "refused refused registered 2"
+    assert array.array("i", [1]).tolist() == [1]
@@ -0,0 +1,127 @@
+import math
+import timeit
+
+import pytest
+
+import intercepts
+from intercepts.registration import _HANDLERS
+
+
+def increment(num):
+    return num + 1
+
+
+def handler(*args, **kwargs):
+    return _(*args, **kwargs)
+
+
+class Counter:
+    def increment(self, num):
+        return num + 1
+
+
+@pytest.mark.parametrize("obj", [math.floor, increment, str.upper, frozenset.__len__])
+def test_handlers(obj):
+    assert not intercepts.is_registered(obj)
+    assert intercepts.handlers(obj) == []
+    policy = intercepts.Observe(id)
+    intercepts.register(obj, handler)
+    intercepts.register(obj, policy)
+    assert intercepts.is_registered(obj)
+    assert intercepts.handlers(obj) == [handler, policy]
+    intercepts.unregister(obj, depth=1)
+    assert intercepts.handlers(obj) == [handler]
+    intercepts.unregister(obj)
+    assert not intercepts.is_registered(obj)
+    assert not _HANDLERS
+
+
+def test_handlers_of_options():
+    intercepts.register(math.floor, handler, when=float, every=2)
+    intercepts.register(math.floor, before=id)
+    intercepts.register(math.floor, intercepts.Count())
+    first, second, third = intercepts.handlers(math.floor)
+    assert first is handler
+    assert isinstance(second, intercepts.Observe)
+    assert isinstance(third, intercepts.Count)
+
+
+def test_handlers_of_method():
+    counter = Counter()
+    intercepts.register(counter.increment, handler)
+    assert intercepts.is_registered(counter.increment)
+    assert intercepts.is_registered(Counter.increment)
+    assert intercepts.handlers(counter.increment) == [handler]
+
+
+def test_iter_intercepts():
+    intercepts.register_many([(math.floor, handler), (increment, handler)])
+    intercepts.register(math.floor, intercepts.Return(0))
+    records = list(intercepts.iter_intercepts())
+    assert [(record.obj, record.handler) for record in records] == [
+        (math.floor, handler),
+        (math.floor, intercepts.handlers(math.floor)[1]),
+        (increment, handler),
+    ]
+    # the records of registrations are kept until they are unregistered
+    for record, again in zip(records, intercepts.iter_intercepts()):
+        assert record is again
+    intercepts.unregister(math.floor)
+    assert list(intercepts.iter_intercepts()) == records[2:]
+    intercepts.unregister_all()
+    assert list(intercepts.iter_intercepts()) == []
+
+
+def test_intercepted():
+    policy = intercepts.Observe(id)
+    tracing = intercepts.intercepted(math.floor, handler, keep=True)
+    intercepts.register(math.floor, policy)
+    with tracing:
+        assert intercepts.handlers(math.floor) == [policy, handler]
+    assert intercepts.handlers(math.floor) == [policy, handler]
+    tracing.close()
+    assert intercepts.handlers(math.floor) == [policy]
+    with intercepts.intercepted(math.floor, handler):
+        assert intercepts.handlers(math.floor) == [policy, handler]
+    assert intercepts.handlers(math.floor) == [policy]
+
+
+def test_failed_registration():
+    with pytest.raises(ValueError):
+        intercepts.register_many([(math.floor, handler), (math.ceil, print)])
+    with pytest.raises(NotImplementedError):
+        intercepts.register(math.floor, intercepts.Count(), every=2)
+    assert not intercepts.is_registered(math.floor)
+    assert not _HANDLERS
+    # registrations are recorded before the callable is intercepted, and the
+    # record is removed if intercepting it fails
+    intercepts.register(increment, handler)
+    with pytest.raises(NotImplementedError):
+        intercepts.register(increment, intercepts.Count())
+    with pytest.raises(NotImplementedError):
+        intercepts.register_many(
+            [(math.floor, handler), (increment, intercepts.Count())]
+        )
+    assert intercepts.handlers(increment) == [handler]
+    assert not intercepts.is_registered(math.floor)
+
+
+def test_many_intercepts():
+    functions = [
+        type(increment)(increment.__code__, globals(), f"f{i}") for i in range(2000)
+    ]
+    intercepts.register_many((function, handler) for function in functions)
+    assert sum(1 for _ in intercepts.iter_intercepts()) == 2000
+    seconds = min(
+        timeit.repeat(
+            "is_registered(obj); handlers(obj)",
+            globals={
+                "is_registered": intercepts.is_registered,
+                "handlers": intercepts.handlers,
+                "obj": functions[-1],
+            },
+            number=1000,
+            repeat=5,
+        )
+    )
+    assert seconds / 1000 < 1e-5
@@ -0,0 +1,135 @@
+import functools
+import gc
+import math
+import tracemalloc
+import weakref
+
+import pytest
+
+import intercepts
+from intercepts.registration import _HANDLERS, _TARGETS
+
+CYCLES = 100_000
+# cycles are traced in windows spread over the run, since tracing every
+# allocation makes a cycle several times slower
+WINDOWS = 10
+WINDOW = 1000
+
+
+def increment(num):
+    return num + 1
+
+
+def handler(*args, **kwargs):
+    return _(*args, **kwargs)
+
+
+ADD = functools.partial(increment)
+TARGETS = [
+    (math.floor, (1.5,)),
+    (increment, (1,)),
+    (str.upper, ("a",)),
+    (frozenset.__len__, (frozenset(),)),
+    (ADD, (1,)),
+]
+HANDLERS = [
+    {"handler": handler},
+    {"handler": intercepts.Return(1)},
+    {"handler": intercepts.Observe(id)},
+    {"handler": handler, "every": 2},
+    {"before": id, "after": id},
+]
+
+
+def cycle(i):
+    obj, args = TARGETS[i % len(TARGETS)]
+    intercepts.register(obj, **HANDLERS[i // len(TARGETS) % len(HANDLERS)])
+    obj(*args)
+    intercepts.unregister(obj)
+
+
+def test_flat_memory():
+    # the first cycles fill the caches of compiled handlers
+    for i in range(WINDOW):
+        cycle(i)
+    growth = []
+    for i in range(0, CYCLES, CYCLES // WINDOWS):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            for j in range(i, i + WINDOW):
+                cycle(j)
+            gc.collect()
+            growth.append(tracemalloc.get_traced_memory()[0] - before)
+        finally:
+            tracemalloc.stop()
+        for j in range(i + WINDOW, i + CYCLES // WINDOWS):
+            cycle(j)
+    # the memory of an intercept is freed with it, so that no window keeps
+    # a few bytes for each of its cycles
+    assert max(growth) < WINDOW * 8, growth
+    assert not _HANDLERS
+
+
+@pytest.mark.parametrize("policy", [None, intercepts.Observe(id)])
+def test_freed_function(policy):
+    def make():
+        def inner(num):
+            return num + 1
+
+        return inner
+
+    function = make()
+    intercepts.register(function, handler)
+    if policy is not None:
+        intercepts.register(function, policy)
+    assert function(1) == 2
+    record = next(intercepts.iter_intercepts())
+    ref = weakref.ref(function)
+    del function
+    gc.collect()
+    assert ref() is None
+    assert record.obj is None
+    assert list(intercepts.iter_intercepts()) == []
+    assert not _TARGETS
+
+
+def test_freed_builtin():
+    items = []
+    append = items.append
+    intercepts.register(append, handler)
+    intercepts.register(append, intercepts.Count())
+    append(1)
+    assert items == [1]
+    del append, items
+    gc.collect()
+    assert intercepts.counters() == {}
+    assert not _HANDLERS
+
+
+def test_freed_vectorcall():
+    add = functools.partial(increment)
+    intercepts.register(add, handler)
+    intercepts.register(add, intercepts.Return(0))
+    assert add(1) == 0
+    ref = weakref.ref(add)
+    del add
+    gc.collect()
+    assert ref() is None
+    assert list(intercepts.iter_intercepts()) == []
+
+
+def test_address_reused():
+    def make():
+        return lambda num: num + 1
+
+    intercepts.register(make(), handler)
+    # a function of the same size is usually allocated at the freed address
+    function = make()
+    assert not intercepts.is_registered(function)
+    assert intercepts.handlers(function) == []
+    intercepts.register(function, intercepts.Return(0))
+    assert function(1) == 0
+    assert len(intercepts.handlers(function)) == 1
+    assert len(list(intercepts.iter_intercepts())) == 1
@@ -0,0 +1,132 @@
+import types
+
+import pytest
+
+import intercepts
+
+# Methods of str and list are used by pytest itself, so each test unregisters
+# its handlers before asserting on the results.
+
+
+def handler(self, *args, **kwargs):
+    result = _(self, *args, **kwargs)
+    return "handled", result
+
+
+def test_register_str_join():
+    assert intercepts.register(str.join, handler) is str.join
+    results = [",".join("abc"), str.join("-", "ab")]
+    intercepts.unregister(str.join)
+    assert isinstance(str.join, types.MethodDescriptorType)
+    assert results == [("handled", "a,b,c"), ("handled", "a-b")]
+
+
+def test_register_bound_method():
+    intercepts.register(str.join, handler)
+    join = ",".join
+    result = join("ab")
+    intercepts.unregister(str.join)
+    assert result == ("handled", "a,b")
+
+
+def test_register_noargs():
+    intercepts.register(str.upper, handler)
+    result = "abc".upper()
+    intercepts.unregister(str.upper)
+    assert result == ("handled", "ABC")
+
+
+def test_register_fastcall():
+    intercepts.register(str.startswith, handler)
+    results = ["abc".startswith("b", 1), "abc".startswith("b")]
+    intercepts.unregister(str.startswith)
+    assert results == [("handled", True), ("handled", False)]
+
+
+def test_register_fastcall_keywords():
+    intercepts.register(list.sort, handler)
+    values = [3, 1, 2]
+    result = values.sort(key=lambda x: -x, reverse=True)
+    intercepts.unregister(list.sort)
+    assert result == ("handled", None)
+    assert values == [1, 2, 3]
+
+
+def test_register_many_arguments():
+    intercepts.register(str.replace, handler)
+    result = "aaa".replace("a", "b", 2)
+    intercepts.unregister(str.replace)
+    assert result == ("handled", "bba")
+
+
+def test_register_list_append():
+    def append_all(values):
+        for i in range(100):
+            values.append(i)
+
+    values = []
+    handler = lambda self, value: _(self, value * 2)
+    intercepts.register(list.append, handler)
+    append_all(values)
+    # the registry is appended to while list.append is intercepted
+    intercepts.register_many([(list.append, handler)])
+    registered = intercepts.handlers(list.append)
+    intercepts.unregister_all()
+    assert values == [i * 2 for i in range(100)]
+    assert registered == [handler, handler]
+    assert intercepts.handlers(list.append) == []
+
+
+def test_register_specialized_call_site():
+    def upper_all(values):
+        return [value.upper() for value in values]
+
+    intercepts.register(str.upper, lambda self: _(self) + "!")
+    result = upper_all(["a"] * 100)
+    intercepts.unregister(str.upper)
+    assert result == ["A!"] * 100
+
+
+def test_register_policy():
+    intercepts.register(str.upper, intercepts.Return("X"))
+    intercepts.register(str.lower, intercepts.Redirect(str.upper))
+    intercepts.register(str.title, intercepts.Raise(KeyError))
+    results = ["abc".upper(), "abc".lower()]
+    with pytest.raises(KeyError):
+        "abc".title()
+    intercepts.unregister_all()
+    assert results == ["X", "X"]
+    with pytest.raises(NotImplementedError):
+        intercepts.register(str.strip, intercepts.Count())
+
+
+def test_register_stacked():
+    intercepts.register(str.upper, handler)
+    intercepts.register(str.upper, handler)
+    stacked = "a".upper()
+    intercepts.unregister(str.upper, depth=1)
+    result = "a".upper()
+    intercepts.unregister(str.upper)
+    assert stacked == ("handled", ("handled", "A"))
+    assert result == ("handled", "A")
+
+
+def test_unregister():
+    intercepts.register(str.join, handler)
+    intercepts.unregister(str.join)
+    assert ",".join("abc") == "a,b,c"
+
+
+def test_register_dict_get():
+    # the registry is read with dict.get while it is intercepted
+    intercepts.register(dict.get, lambda self, *args: "changed")
+    intercepts.register(dict.get, lambda self, *args: _(self, *args))
+    result = {"a": 1}.get("a")
+    registered = intercepts.handlers(dict.get).__len__()
+    intercepts.pause(dict.get)
+    paused = {"a": 1}.get("a")
+    intercepts.resume(dict.get)
+    intercepts.unregister(dict.get, depth=1)
+    intercepts.unregister_all()
+    assert (result, registered, paused) == ("changed", 2, 1)
+    assert {"a": 1}.get("a") == 1
@@ -0,0 +1,157 @@
+import time
+import timeit
+
+import intercepts
+
+
+def handler(*args, **kwargs):
+    return "handled", _(*args, **kwargs)
+
+
+def increment(num):
+    return num + 1
+
+
+class Values(list):
+    pass
+
+
+def test_pause_builtin():
+    intercepts.register(abs, handler)
+    intercepts.pause(abs)
+    assert abs(-1) == 1
+    intercepts.pause(abs)
+    intercepts.resume(abs)
+    assert abs(-1) == ("handled", 1)
+    intercepts.resume(abs)
+    assert abs(-1) == ("handled", 1)
+
+
+def test_pause_function():
+    code = increment.__code__
+    intercepts.register(increment, handler)
+    handler_code = increment.__code__
+    intercepts.pause(increment)
+    assert increment.__code__ is code
+    assert increment(1) == 2
+    intercepts.resume(increment)
+    assert increment.__code__ is handler_code
+    assert increment(1) == ("handled", 2)
+
+
+def test_pause_descriptors():
+    intercepts.register(str.swapcase, handler)
+    intercepts.register(frozenset.__len__, intercepts.Return(0))
+    intercepts.register(Values, handler)
+    for obj in (str.swapcase, frozenset.__len__, Values):
+        intercepts.pause(obj)
+    assert ("a".swapcase(), len(frozenset([1])), Values([1])) == ("A", 1, [1])
+    for obj in (str.swapcase, frozenset.__len__, Values):
+        intercepts.resume(obj)
+    assert ("a".swapcase(), len(frozenset([1])), Values([1])) == (
+        ("handled", "A"),
+        0,
+        ("handled", [1]),
+    )
+
+
+def test_register_while_paused():
+    intercepts.register(abs, lambda x: _(x) + 1)
+    intercepts.pause(abs)
+    intercepts.register(abs, lambda x: _(x) * 10)
+    intercepts.register(abs, intercepts.Return(5))
+    assert abs(-1) == 1
+    intercepts.unregister(abs, depth=1)
+    assert abs(-1) == 1
+    intercepts.resume(abs)
+    assert abs(-1) == 20
+    intercepts.pause(abs)
+    intercepts.unregister(abs)
+    intercepts.resume(abs)
+    assert abs(-1) == 1
+
+
+def test_intercepted():
+    intercepts.register(abs, lambda x: _(x) + 1)
+    tracing = intercepts.intercepted(abs, lambda x: _(x) * 10, keep=True)
+    assert abs(-1) == 2
+    with tracing as obj:
+        assert obj is abs
+        assert abs(-1) == 20
+    assert abs(-1) == 2
+    with tracing:
+        assert abs(-1) == 20
+    intercepts.unregister(abs, depth=1)
+    with tracing:
+        assert abs(-1) == 20
+    intercepts.unregister(abs)
+    assert abs(-1) == 1
+
+
+def test_intercepted_once():
+    for obj, args, result in [(increment, (1,), 2), (abs, (-1,), 1)]:
+        for i in range(300):
+            with intercepts.intercepted(obj, lambda *args: _(*args) * 10):
+                assert obj(*args) == result * 10
+            assert obj(*args) == result
+            assert intercepts.handlers(obj) == []
+    assert not intercepts.is_registered(abs)
+
+
+def test_intercepted_layers():
+    tracing = intercepts.intercepted(abs, lambda x: _(x) * 10, keep=True)
+    with tracing:
+        intercepts.register(abs, lambda x: _(x) + 1)
+        assert abs(-1) == 11
+    # the handlers registered after this one are not switched off with it
+    assert abs(-1) == 2
+    with tracing:
+        assert abs(-1) == 11
+    tracing.close()
+    assert abs(-1) == 2
+    assert len(intercepts.handlers(abs)) == 1
+
+
+def test_intercepted_options():
+    calls = []
+    tracing = intercepts.intercepted(increment, before=calls.append, when=int)
+    for _ in range(2):
+        with tracing:
+            increment(1)
+            increment(1.5)
+        increment(2)
+    assert calls == [1, 1]
+
+
+def test_intercepted_swaps_state():
+    code = increment.__code__
+    tracing = intercepts.intercepted(increment, handler)
+    with tracing:
+        assert increment(1) == ("handled", 2)
+        handled = increment.__code__
+    # the newest layer is switched off by swapping back the original code
+    assert increment.__code__ is code
+    assert increment(1) == 2
+    with tracing:
+        assert increment.__code__ is handled
+        assert increment(1) == ("handled", 2)
+    tracing.close()
+    assert increment.__code__ is code
+    assert intercepts.handlers(increment) == []
+
+
+def test_intercepted_fast():
+    for obj in [abs, increment, str.upper, frozenset.__len__, Values]:
+        tracing = intercepts.intercepted(obj, handler)
+        with tracing:
+            pass
+        timer = timeit.Timer("with tracing: pass", globals=locals())
+        # the fastest of many runs, spread out over up to a few seconds, so
+        # that a busy machine does not slow down all of them
+        number, seconds, deadline = 1000, 1.0, time.perf_counter() + 3
+        while seconds / number >= 2e-6 and time.perf_counter() < deadline:
+            seconds = min([seconds] + timer.repeat(repeat=20, number=number))
+        # entering and exiting a block each take less than a microsecond
+        assert seconds / number < 2e-6, obj
+        tracing.close()
+    assert abs(-1) == 1
@@ -0,0 +1,236 @@
+import math
+import sys
+import threading
+
+import pytest
+
+import intercepts
+
+
+def increment(num):
+    return num + 1
+
+
+def python_calls(func, *args):
+    calls = []
+
+    def profile(frame, event, arg):
+        if event == "call":
+            calls.append(frame.f_code.co_name)
+
+    sys.setprofile(profile)
+    try:
+        func(*args)
+    except Exception:
+        pass
+    finally:
+        sys.setprofile(None)
+    return [name for name in calls if name != "python_calls"]
+
+
+def test_return_builtin():
+    value = object()
+    intercepts.register(sorted, intercepts.Return(value))
+    assert sorted([3, 1, 2]) is value
+    assert sorted([3, 1, 2], key=None, reverse=True) is value
+    assert python_calls(sorted, [3, 1, 2]) == []
+    intercepts.unregister(sorted)
+    assert sorted([3, 1, 2]) == [1, 2, 3]
+
+
+def test_return_refcount():
+    value = object()
+    intercepts.register(abs, intercepts.Return(value))
+    refcount = sys.getrefcount(value)
+    results = [abs(-1) for _ in range(100)]
+    assert sys.getrefcount(value) == refcount + 100
+    del results
+    assert sys.getrefcount(value) == refcount
+
+
+def test_return_function():
+    intercepts.register(increment, intercepts.Return(None))
+    assert increment(41) is None
+    intercepts.unregister(increment)
+    assert increment(41) == 42
+
+
+def test_raise_builtin_type():
+    intercepts.register(abs, intercepts.Raise(KeyError))
+    with pytest.raises(KeyError):
+        abs(-1)
+    assert python_calls(abs, -1) == []
+
+
+def test_raise_builtin_instance():
+    intercepts.register(math.sqrt, intercepts.Raise(ValueError("no", 1)))
+    for _ in range(3):
+        with pytest.raises(ValueError) as exc_info:
+            math.sqrt(4.0)
+        assert exc_info.value.args == ("no", 1)
+        assert exc_info.value.__traceback__.tb_next is None
+
+
+def test_raise_function():
+    intercepts.register(increment, intercepts.Raise(ValueError("no")))
+    with pytest.raises(ValueError, match="no"):
+        increment(41)
+
+
+def test_redirect_builtin_direct():
+    intercepts.register(math.floor, intercepts.Redirect(math.ceil))
+    assert math.floor(1.5) == 2
+    intercepts.register(min, intercepts.Redirect(max))
+    assert min(1, 3, 2) == 3
+    assert min([1, 3, 2], key=lambda x: -x) == 1
+    intercepts.unregister_all()
+    assert math.floor(1.5) == 1
+
+
+def test_redirect_builtin_convention():
+    intercepts.register(abs, intercepts.Redirect(str))
+    assert abs(-1) == "-1"
+    intercepts.register(sorted, intercepts.Redirect(increment))
+    assert sorted(41) == 42
+
+
+def test_redirect_intercepted_target():
+    intercepts.register(math.ceil, lambda x: "handled")
+    intercepts.register(math.floor, intercepts.Redirect(math.ceil))
+    assert math.floor(1.5) == "handled"
+    intercepts.unregister(math.ceil)
+    assert math.floor(1.5) == 2
+
+
+def test_redirect_function():
+    intercepts.register(increment, intercepts.Redirect(abs))
+    assert increment(-41) == 41
+
+
+def test_policy_function_signature():
+    def func(a, /, b, *args, c, **kwargs):
+        return a, b, args, c, kwargs
+
+    calls = []
+    intercepts.register(
+        func, intercepts.Observe(lambda *args, **kwargs: calls.append(args))
+    )
+    assert func.__code__.co_varnames[:5] == ("a", "b", "c", "args", "kwargs")
+    assert func(1, b=2, c=3) == (1, 2, (), 3, {})
+    assert func(1, 2, 5, c=3, e=7) == (1, 2, (5,), 3, {"e": 7})
+    assert calls == [(1, 2), (1, 2, 5)]
+    intercepts.register(func, intercepts.Redirect(lambda *args, **kwargs: kwargs))
+    assert func(1, 2, c=3) == {"c": 3}
+
+
+def test_policy_function_defaults():
+    def func(a, b=2):
+        return a, b
+
+    # the handler takes the parameters of the function, with its defaults
+    intercepts.register(func, intercepts.Redirect(lambda *args: args))
+    assert func.__code__.co_varnames[:2] == ("a", "b")
+    assert func(1) == (1, 2)
+    assert func(1, 3) == (1, 3)
+    intercepts.register(func, intercepts.Return(None))
+    assert func(1) is None
+
+
+def test_policy_function_kwdefaults():
+    def func(a, *, b=2):
+        return a, b
+
+    calls = []
+    intercepts.register(
+        func, intercepts.Observe(lambda *args, **kwargs: calls.append(kwargs))
+    )
+    assert func.__code__.co_varnames[:2] == ("a", "b")
+    assert func(1) == (1, 2)
+    assert func(1, b=3) == (1, 3)
+    assert calls == [{"b": 2}, {"b": 3}]
+    intercepts.register(func, intercepts.Redirect(lambda *args, **kwargs: kwargs))
+    assert func(1) == {"b": 2}
+
+
+def test_policy_function_shadowed_name():
+    def func(_target, _observer=None):
+        return _target
+
+    intercepts.register(func, intercepts.Observe(lambda *args: None))
+    intercepts.register(func, intercepts.Redirect(lambda *args: args))
+    assert func(1) == (1,)
+    assert func.__code__.co_varnames[:2] == ("args", "kwargs")
+
+
+def test_policy_specialized_call_site():
+    def call_len():
+        return len("abc")
+
+    intercepts.register(len, intercepts.Return(-1))
+    result = [call_len() for _ in range(100)]
+    intercepts.unregister(len)
+    assert result == [-1] * 100
+
+
+def test_policy_errors():
+    with pytest.raises(ValueError):
+        intercepts.Raise(1)
+    with pytest.raises(ValueError):
+        intercepts.Redirect(1)
+    with pytest.raises(ValueError):
+        intercepts.register(abs, intercepts.Redirect(abs))
+
+
+def test_count_builtin():
+    intercepts.register(math.floor, intercepts.Count())
+    assert [math.floor(1.5) for _ in range(100)] == [1] * 100
+    assert python_calls(math.floor, 1.5) == []
+    assert intercepts.counters()[math.floor] == (101, 0)
+    intercepts.unregister(math.floor)
+    assert math.floor not in intercepts.counters()
+
+
+def test_count_timed():
+    intercepts.register(sorted, intercepts.Count(timed=True))
+    assert sorted([3, 1, 2], reverse=True) == [3, 2, 1]
+    calls, ticks = intercepts.counters()[sorted]
+    assert calls == 1
+    assert ticks > 0
+
+
+def test_count_specialized_call_site():
+    def check(value):
+        return isinstance(value, int)
+
+    intercepts.register(isinstance, intercepts.Count())
+    results = [check(i) for i in range(100)]
+    calls = intercepts.counters()[isinstance].calls
+    intercepts.unregister(isinstance)
+    assert results == [True] * 100
+    assert calls >= 100
+
+
+def test_count_threads():
+    def work():
+        for _ in range(10000):
+            math.ceil(1.5)
+
+    intercepts.register(math.ceil, intercepts.Count())
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert intercepts.counters()[math.ceil].calls == 40000
+
+
+def test_count_stacked():
+    intercepts.register(abs, lambda x: -_(x))
+    intercepts.register(abs, intercepts.Count())
+    assert abs(-2) == -2
+    assert intercepts.counters()[abs].calls == 1
+
+
+def test_count_function():
+    with pytest.raises(NotImplementedError):
+        intercepts.register(increment, intercepts.Count())
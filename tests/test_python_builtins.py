@@ -51,24 +51,9 @@ class TestObject:
         (bin, (-10003,), {}),
         (bin, (-2,), {}),
         (bin, (0,), {}),
-        pytest.param(
-            bool,
-            (),
-            {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
-        ),
-        pytest.param(
-            bytearray,
-            (),
-            {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
-        ),
-        pytest.param(
-            bytes,
-            (),
-            {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
-        ),
+        (bool, (), {}),
+        (bytearray, (), {}),
+        (bytes, (), {}),
         (callable, (int,), {}),
         (callable, (lambda x: x,), {}),
         (callable, (0,), {}),
@@ -82,24 +67,14 @@ class TestObject:
             classmethod,
             (),
             {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
+            marks=pytest.mark.xfail(reason="'classmethod' raises without arguments"),
         ),
         (compile, ("print('hello world')", "<test>", "exec"), {}),
         (compile, ("print('hello world')", "<test>", "eval"), {}),
         (compile, ("print('hello world')", "<test>", "single"), {}),
-        pytest.param(
-            complex,
-            (),
-            {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
-        ),
+        (complex, (), {}),
         (delattr, (TestObject(), "test_attr"), {}),
-        pytest.param(
-            dict,
-            (),
-            {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
-        ),
+        (dict, (), {}),
         (dir, (TestObject(),), {}),
         (dir, (handler,), {}),
         (dir, ("string test",), {}),
@@ -122,7 +97,9 @@ class TestObject:
             enumerate,
             ((),),
             {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
+            marks=pytest.mark.xfail(
+                reason="result of 'enumerate' is a new object that does not compare equal"
+            ),
         ),
         (eval, ("print('hello world')",), {}),
         (eval, ("[0, 1, 2, 3, 4]",), {}),
@@ -135,25 +112,17 @@ class TestObject:
             filter,
             (lambda x: x),
             {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
-        ),
-        pytest.param(
-            float,
-            (),
-            {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
+            marks=pytest.mark.xfail(
+                reason="result of 'filter' is a new object that does not compare equal"
+            ),
         ),
+        (float, (), {}),
         (format, ("test",), {}),
         (format, (0.0,), {}),
         (format, (0.0, "f"), {}),
         (format, (0.0, ".8f"), {}),
         (format, (TestObject(), ""), {}),
-        pytest.param(
-            frozenset,
-            (),
-            {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
-        ),
+        (frozenset, (), {}),
         (getattr, (TestObject(), "test_attr"), {}),
         (getattr, ([], "append"), {}),
         (getattr, (0, "__add__"), {}),
@@ -170,12 +139,7 @@ class TestObject:
         (hex, (0,), {}),
         (id, (0,), {}),
         (id, (id,), {}),
-        pytest.param(
-            int,
-            (),
-            {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
-        ),
+        (int, (), {}),
         (isinstance, (0, int), {}),
         (isinstance, (100.9, int), {}),
         (isinstance, (handler, type(handler)), {}),
@@ -183,12 +147,7 @@ class TestObject:
         (issubclass, (object, TestObject), {}),
         (len, ([],), {}),
         (len, ("test",), {}),
-        pytest.param(
-            list,
-            (),
-            {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
-        ),
+        (list, (), {}),
         pytest.param(
             locals,
             (),
@@ -199,24 +158,23 @@ class TestObject:
             map,
             (lambda x: x, []),
             {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
+            marks=pytest.mark.xfail(
+                reason="result of 'map' is a new object that does not compare equal"
+            ),
         ),
         pytest.param(
             map,
             (lambda x: x + 1, range(100)),
             {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
+            marks=pytest.mark.xfail(
+                reason="result of 'map' is a new object that does not compare equal"
+            ),
         ),
         (max, (range(10),), {}),
         (max, (1, 2, 3, 4, 9), {}),
         (max, ([],), {"default": None}),
         (max, ([(0, 0), (0, 1), (2, -1)],), {"key": lambda s: s[1]}),
-        pytest.param(
-            memoryview,
-            (b"test",),
-            {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
-        ),
+        (memoryview, (b"test",), {}),
         (min, (range(10),), {}),
         (min, (1, 2, 3, 4, 9), {}),
         (min, ([],), {"default": None}),
@@ -227,7 +185,9 @@ class TestObject:
             object,
             (),
             {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
+            marks=pytest.mark.xfail(
+                reason="result of 'object' is a new object that does not compare equal"
+            ),
         ),
         (oct, (12,), {}),
         (oct, (-1,), {}),
@@ -247,14 +207,11 @@ class TestObject:
             property,
             (),
             {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
-        ),
-        pytest.param(
-            range,
-            (10,),
-            {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
+            marks=pytest.mark.xfail(
+                reason="result of 'property' is a new object that does not compare equal"
+            ),
         ),
+        (range, (10,), {}),
         (repr, (0,), {}),
         (repr, (TestObject,), {}),
         (repr, (TestObject(),), {}),
@@ -262,24 +219,16 @@ class TestObject:
             reversed,
             ([],),
             {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
+            marks=pytest.mark.xfail(
+                reason="result of 'reversed' is a new object that does not compare equal"
+            ),
         ),
         (round, (0,), {}),
         (round, (0.124125151,), {}),
         (round, (54124.08912748, 4), {}),
-        pytest.param(
-            set,
-            (),
-            {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
-        ),
+        (set, (), {}),
         (setattr, (TestObject(), "test_attr", 0), {}),
-        pytest.param(
-            slice,
-            (10,),
-            {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
-        ),
+        (slice, (10,), {}),
         (sorted, ([],), {}),
         (sorted, (range(100),), {"reverse": True}),
         (sorted, ([(0, 0), (1, -1), (2, 3), (3, -2)],), {"key": lambda x: x[1]}),
@@ -287,14 +236,11 @@ class TestObject:
             staticmethod,
             (TestObject.test_attr,),
             {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
-        ),
-        pytest.param(
-            str,
-            (),
-            {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
+            marks=pytest.mark.xfail(
+                reason="result of 'staticmethod' is a new object that does not compare equal"
+            ),
         ),
+        (str, (), {}),
         (sum, ([],), {}),
         (sum, ([], 100), {}),
         (sum, ([3, 5, 6, 1, 6, 1, 4, 3, 7],), {}),
@@ -302,19 +248,14 @@ class TestObject:
             super,
             (),
             {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
-        ),
-        pytest.param(
-            tuple,
-            (),
-            {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
+            marks=pytest.mark.xfail(reason="'super' raises without arguments"),
         ),
+        (tuple, (), {}),
         pytest.param(
             type,
             (),
             {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
+            marks=pytest.mark.xfail(reason="'type' raises without arguments"),
         ),
         (vars, (TestObject(),), {}),
         pytest.param(
@@ -327,7 +268,9 @@ class TestObject:
             zip,
             (),
             {},
-            marks=pytest.mark.xfail(reason="Unsupported type: <class 'type'>"),
+            marks=pytest.mark.xfail(
+                reason="result of 'zip' is a new object that does not compare equal"
+            ),
         ),
         (__import__, ("builtins",), {}),
     ],
@@ -0,0 +1,66 @@
+import math
+
+import pytest
+
+import intercepts
+
+
+def increment(num):
+    return num + 1
+
+
+def handler(*args, **kwargs):
+    return "handled", _(*args, **kwargs)
+
+
+def test_register_many():
+    objs = [math.floor, math.ceil, increment]
+    assert intercepts.register_many((obj, handler) for obj in objs) == objs
+    assert math.floor(1.5) == ("handled", 1)
+    assert math.ceil(1.5) == ("handled", 2)
+    assert increment(1) == ("handled", 2)
+    assert intercepts.unregister_many(objs) == objs
+    assert (math.floor(1.5), math.ceil(1.5), increment(1)) == (1, 2, 2)
+
+
+def test_register_many_policies():
+    intercepts.register_many(
+        [(math.floor, intercepts.Return(0)), (math.ceil, intercepts.Count())]
+    )
+    assert (math.floor(1.5), math.ceil(1.5)) == (0, 2)
+    assert intercepts.counters()[math.ceil].calls == 1
+
+
+def test_register_many_checks_first():
+    with pytest.raises(ValueError):
+        intercepts.register_many([(math.floor, handler), (math.ceil, print)])
+    with pytest.raises(NotImplementedError):
+        intercepts.register_many([(math.floor, handler), (1, handler)])
+    assert math.floor(1.5) == 1
+
+
+def test_register_many_rollback():
+    intercepts.register(math.floor, lambda x: -_(x))
+    with pytest.raises(NotImplementedError):
+        intercepts.register_many(
+            [
+                (math.floor, handler),
+                (increment, handler),
+                (str.upper, intercepts.Count()),
+            ]
+        )
+    assert math.floor(1.5) == -1
+    assert increment(1) == 2
+
+
+def test_unregister_many_depth():
+    intercepts.register_many([(math.floor, handler), (math.floor, handler)])
+    intercepts.unregister_many([math.floor], depth=1)
+    assert math.floor(1.5) == ("handled", 1)
+
+
+def test_unregister_many_unsupported():
+    intercepts.register(math.floor, handler)
+    with pytest.raises(NotImplementedError):
+        intercepts.unregister_many([math.floor, 1])
+    assert math.floor(1.5) == ("handled", 1)
@@ -0,0 +1,134 @@
+import random
+import sys
+
+import pytest
+
+import intercepts
+from intercepts._handlers import get_addr
+from intercepts.policies import _Sample
+from intercepts.registration import _HANDLERS
+
+
+def handler(*args, **kwargs):
+    return "handled", _(*args, **kwargs)
+
+
+def increment(num):
+    return num + 1
+
+
+def test_every_function():
+    intercepts.register(increment, handler, every=3)
+    results = [increment(i) for i in range(6)]
+    assert results == [1, 2, ("handled", 3), 4, 5, ("handled", 6)]
+    intercepts.unregister(increment)
+    assert increment(1) == 2
+
+
+def test_every_function_one_frame():
+    calls = []
+
+    def profile(frame, event, arg):
+        if event == "call":
+            calls.append(frame.f_code.co_name)
+
+    intercepts.register(increment, handler, every=1000)
+    sys.setprofile(profile)
+    try:
+        increment(1)
+    finally:
+        sys.setprofile(None)
+    # the function is only inlined into the countdown when asked to
+    assert calls == ["_sample_handler", "increment"]
+    intercepts.unregister(increment)
+    calls.clear()
+    intercepts.register(increment, handler, every=1000, inline=True)
+    sys.setprofile(profile)
+    try:
+        increment(1)
+    finally:
+        sys.setprofile(None)
+    # unsampled calls run the body of the function after the countdown
+    assert calls == ["increment"]
+
+
+def test_every_builtin():
+    intercepts.register(abs, handler, every=2)
+    results = [abs(-i) for i in range(4)]
+    # the countdown is in the trampoline, rather than a python handler
+    (layer,) = _HANDLERS[get_addr(abs), type(abs)]
+    assert isinstance(layer[1][0], _Sample)
+    intercepts.unregister(abs)
+    assert results == [0, ("handled", 1), 2, ("handled", 3)]
+    assert abs(-1) == 1
+
+
+@pytest.mark.parametrize(
+    "func, args",
+    [(sorted, ([2, 1],)), (max, (1, 2)), (divmod, (7, 2)), (globals, ())],
+)
+def test_every_calling_conventions(func, args):
+    expected = func(*args)
+    intercepts.register(func, handler, every=2)
+    results = [func(*args) for _ in range(4)]
+    intercepts.unregister(func)
+    assert results == [expected, ("handled", expected)] * 2
+
+
+def test_sample_rate():
+    random.seed(0)
+    calls = []
+    intercepts.register(abs, before=calls.append, sample=1 / 10)
+    intercepts.register(increment, before=calls.append, sample=1 / 10)
+    for i in range(10000):
+        abs(i)
+        increment(-i)
+    intercepts.unregister_all()
+    assert 800 < sum(1 for i in calls if i >= 0) < 1200
+    assert 800 < sum(1 for i in calls if i <= 0) < 1200
+
+
+def test_sample_all():
+    intercepts.register(abs, handler, sample=1)
+    intercepts.register(increment, handler, sample=1.0)
+    assert (abs(-1), abs(-2)) == (("handled", 1), ("handled", 2))
+    assert increment(1) == ("handled", 2)
+
+
+def test_sample_stacked():
+    intercepts.register(abs, lambda x: _(x) + 1, every=2)
+    intercepts.register(abs, lambda x: _(x) * 10)
+    assert [abs(-1), abs(-1)] == [10, 20]
+    intercepts.unregister(abs, depth=1)
+    assert [abs(-1), abs(-1)] == [1, 2]
+    intercepts.register(abs, lambda x: _(x) * 10)
+    intercepts.register(abs, lambda x: _(x) + 1, every=2)
+    # the first sampler is still counting down below the other handlers
+    assert [abs(-1), abs(-1)] == [10, 21]
+
+
+def test_sample_when():
+    calls = []
+    intercepts.register(abs, before=calls.append, when=int, every=2)
+    for value in (-1, -1.5, -2, -2.5, -3, -4):
+        abs(value)
+    assert calls == [-2, -4]
+
+
+def test_sample_policy():
+    intercepts.register(abs, intercepts.Return(0), every=2)
+    assert [abs(-1), abs(-1)] == [1, 0]
+
+
+def test_sample_errors():
+    with pytest.raises(ValueError):
+        intercepts.register(abs, handler, sample=0)
+    with pytest.raises(ValueError):
+        intercepts.register(abs, handler, sample=1.5)
+    with pytest.raises(ValueError):
+        intercepts.register(abs, handler, every=0)
+    with pytest.raises(ValueError):
+        intercepts.register(abs, handler, sample=0.5, every=2)
+    with pytest.raises(NotImplementedError):
+        intercepts.register(abs, intercepts.Count(), every=2)
+    assert abs(-1) == 1
@@ -0,0 +1,132 @@
+import asyncio
+import sys
+import threading
+
+import pytest
+
+import intercepts
+
+
+def handler(*args, **kwargs):
+    return "handled", _(*args, **kwargs)
+
+
+def increment(num):
+    return num + 1
+
+
+def test_scope_builtin():
+    scope = intercepts.Scope()
+    intercepts.register(abs, handler, scope=scope)
+    assert abs(-1) == 1
+    with scope:
+        assert abs(-1) == ("handled", 1)
+        with scope:
+            assert scope.active
+        assert abs(-1) == ("handled", 1)
+    assert not scope.active
+    assert abs(-1) == 1
+
+
+def python_calls(func, *args):
+    calls = []
+
+    def profile(frame, event, arg):
+        if event == "call":
+            calls.append(frame.f_code.co_name)
+
+    sys.setprofile(profile)
+    try:
+        func(*args)
+    finally:
+        sys.setprofile(None)
+    return calls
+
+
+def test_scope_builtin_guard():
+    scope = intercepts.Scope()
+    intercepts.register(abs, handler, scope=scope)
+    # no python code runs while no context is in the scope
+    assert python_calls(abs, -1) == []
+    with scope:
+        assert python_calls(abs, -1) == ["_scope_handler", "handler"]
+
+
+def test_scope_function_one_frame():
+    scope = intercepts.Scope()
+    intercepts.register(increment, handler, scope=scope)
+    # the function is only inlined into the check when asked to
+    assert python_calls(increment, 1) == ["_scope_handler", "increment"]
+    intercepts.unregister(increment)
+    intercepts.register(increment, handler, scope=scope, inline=True)
+    # calls outside the scope run the body of the function after the check
+    assert python_calls(increment, 1) == ["increment"]
+    assert increment(1) == 2
+    with scope:
+        assert increment(1) == ("handled", 2)
+
+
+def test_scope_threads():
+    scope = intercepts.Scope()
+    intercepts.register(abs, handler, scope=scope)
+    results = {}
+    entered = threading.Event()
+    called = threading.Event()
+
+    def traced():
+        with scope:
+            entered.set()
+            called.wait()
+            results["traced"] = abs(-1)
+
+    def untraced():
+        entered.wait()
+        results["untraced"] = abs(-1)
+        called.set()
+
+    threads = [threading.Thread(target=traced), threading.Thread(target=untraced)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {"traced": ("handled", 1), "untraced": 1}
+
+
+def test_scope_tasks():
+    scope = intercepts.Scope()
+    intercepts.register(increment, handler, scope=scope)
+
+    async def traced():
+        with scope:
+            await asyncio.sleep(0)
+            return increment(1), await asyncio.create_task(untraced())
+
+    async def untraced():
+        await asyncio.sleep(0)
+        return increment(2)
+
+    async def main():
+        return await asyncio.gather(traced(), untraced())
+
+    # tasks created in the scope inherit it
+    assert asyncio.run(main()) == [(("handled", 2), ("handled", 3)), 3]
+
+
+def test_scope_with_other_options():
+    scope = intercepts.Scope()
+    calls = []
+    intercepts.register(abs, before=calls.append, when=int, every=2, scope=scope)
+    for value in (-1, -2, -1.5):
+        abs(value)
+    with scope:
+        for value in (-3, -4, -2.5, -5, -6):
+            abs(value)
+    assert calls == [-4, -6]
+
+
+def test_scope_errors():
+    with pytest.raises(ValueError):
+        intercepts.register(abs, handler, scope=object())
+    with pytest.raises(NotImplementedError):
+        intercepts.register(abs, intercepts.Count(), scope=intercepts.Scope())
+    assert abs(-1) == 1
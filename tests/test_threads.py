@@ -0,0 +1,112 @@
+import functools
+import math
+import sys
+import threading
+
+import intercepts
+
+
+def increment(num):
+    return num + 1
+
+
+def passthrough(*args, **kwargs):
+    return _(*args, **kwargs)
+
+
+def observe(*args):
+    pass
+
+
+SCOPE = intercepts.Scope()
+ADD = functools.partial(increment)
+TARGETS = [
+    (math.floor, (1.5,), 1),
+    (math.hypot, (3, 4), 5.0),
+    (increment, (1,), 2),
+    (str.swapcase, ("a",), "A"),
+    (frozenset.__len__, (frozenset((1, 2)),), 2),
+    (ADD, (1,), 2),
+]
+OPTIONS = [
+    {},
+    {"before": observe},
+    {"every": 2},
+    {"sample": 0.5},
+    {"when": object},
+    {"scope": SCOPE},
+]
+
+
+def hammer(obj, args, expected, stop, errors):
+    while not stop.is_set():
+        try:
+            for _ in range(100):
+                result = obj(*args)
+                if result != expected:
+                    errors.append((obj, result))
+        except BaseException as exc:
+            errors.append((obj, exc))
+
+
+def test_register_while_called():
+    stop = threading.Event()
+    errors = []
+    threads = [
+        threading.Thread(target=hammer, args=(*TARGETS[i % len(TARGETS)], stop, errors))
+        for i in range(32)
+    ]
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-4)
+    try:
+        for thread in threads:
+            thread.start()
+        for rounds in range(len(TARGETS) * len(OPTIONS)):
+            obj, _, _ = TARGETS[rounds % len(TARGETS)]
+            options = OPTIONS[rounds // len(TARGETS)]
+            if "before" in options:
+                intercepts.register(obj, **options)
+            else:
+                intercepts.register(obj, passthrough, **options)
+            if obj is math.floor:
+                intercepts.register(obj, intercepts.Count())
+            with SCOPE:
+                intercepts.pause(obj)
+                intercepts.resume(obj)
+            with intercepts.intercepted(obj, passthrough):
+                pass
+            intercepts.unregister(obj, depth=rounds % 2 or None)
+            if rounds % len(TARGETS) == 0:
+                intercepts.unregister_all()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        sys.setswitchinterval(switch_interval)
+    assert not errors
+    for obj, args, expected in TARGETS:
+        assert obj(*args) == expected
+
+
+def test_register_from_threads():
+    errors = []
+
+    def register(obj, args, expected):
+        try:
+            for _ in range(50):
+                intercepts.register(obj, passthrough)
+                if obj(*args) != expected:
+                    errors.append(obj)
+                intercepts.unregister(obj, depth=1)
+        except BaseException as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=register, args=target) for target in TARGETS * 4]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    for obj, args, expected in TARGETS:
+        assert obj(*args) == expected
+        intercepts.unregister(obj)
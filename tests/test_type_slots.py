@@ -0,0 +1,128 @@
+import types
+
+import pytest
+
+import intercepts
+
+# Slot wrappers of builtin types are used by pytest itself, so each test
+# unregisters its handlers before asserting on the results, and handlers only
+# change the results for the objects used in the test.
+
+
+class Values(list):
+    pass
+
+
+def test_register_len():
+    values = [1, 2]
+
+    def handler(self):
+        return _(self) + 1 if self is values else _(self)
+
+    assert intercepts.register(list.__len__, handler) is list.__len__
+    results = [len(values), values.__len__(), list.__len__(values), len([1])]
+    intercepts.unregister(list.__len__)
+    assert isinstance(list.__len__, types.WrapperDescriptorType)
+    assert results == [3, 3, 3, 1]
+    assert len(values) == 2
+
+
+def test_register_subclass():
+    intercepts.register(
+        list.__len__, lambda self: _(self) * 10 if type(self) is not list else _(self)
+    )
+
+    class NewValues(list):
+        pass
+
+    results = [len(Values([1])), len(NewValues([1, 2])), len([1])]
+    intercepts.unregister(list.__len__)
+    assert results == [10, 20, 1]
+    assert len(Values([1])) == 1
+
+
+def test_register_hash():
+    obj = object()
+    intercepts.register(object.__hash__, lambda self: 7 if self is obj else _(self))
+    result = hash(obj)
+    intercepts.unregister(object.__hash__)
+    assert result == 7
+    assert hash(obj) != 7
+
+
+def test_register_binary_operator():
+    def add(a, b):
+        return a + b
+
+    intercepts.register(int.__add__, lambda a, b: "added" if a == 41 else _(a, b))
+    results = [add(41, 1), add(1, 1)]
+    intercepts.unregister(int.__add__)
+    assert results == ["added", 2]
+    assert add(41, 1) == 42
+
+
+def test_register_richcompare():
+    # comparing floats in the handler would call the handler again
+    intercepts.register(float.__eq__, lambda a, b: repr(a) == "0.5" or _(a, b))
+    results = [0.5 == 1.5, 1.5 == 1.5, 1.5 == 2.5]
+    intercepts.unregister(float.__eq__)
+    assert results == [True, True, False]
+
+
+def test_register_keywords():
+    class Point:
+        def __init__(self, x, y=0):
+            self.x, self.y = x, y
+
+    def handler(cls, *args, **kwargs):
+        obj = _(cls, *args, **kwargs)
+        if cls is Point:
+            obj.y += 1
+        return obj
+
+    intercepts.register(type.__call__, handler)
+    point = Point(1, y=2)
+    intercepts.unregister(type.__call__)
+    assert (point.x, point.y) == (1, 3)
+
+
+def test_register_method_descriptor_slot():
+    values = {"a": 1}
+
+    def get(mapping, key):
+        return mapping[key]
+
+    intercepts.register(
+        dict.__getitem__,
+        lambda self, key: -_(self, key) if self is values else _(self, key),
+    )
+    result = get(values, "a")
+    intercepts.unregister(dict.__getitem__)
+    assert result == -1
+    assert get(values, "a") == 1
+
+
+def test_register_policy():
+    intercepts.register(frozenset.__len__, intercepts.Return(5))
+    result = len(frozenset())
+    intercepts.register(frozenset.__len__, intercepts.Raise(KeyError))
+    with pytest.raises(KeyError):
+        len(frozenset())
+    intercepts.unregister_all()
+    assert result == 5
+    assert len(frozenset([1])) == 1
+    with pytest.raises(NotImplementedError):
+        intercepts.register(frozenset.__len__, intercepts.Count())
+
+
+def test_register_stacked():
+    values = [9]
+    intercepts.register(list.__len__, lambda self: _(self) + (self is values))
+    intercepts.register(list.__len__, lambda self: _(self) + 10 * (self is values))
+    stacked = len(values)
+    intercepts.unregister(list.__len__, depth=1)
+    result = len(values)
+    intercepts.unregister(list.__len__)
+    assert stacked == 12
+    assert result == 2
+    assert len(values) == 1
@@ -0,0 +1,97 @@
+import functools
+import operator
+
+import pytest
+
+import intercepts
+
+
+def handler(*args, **kwargs):
+    return "handled", _(*args, **kwargs)
+
+
+def increment(num):
+    return num + 1
+
+
+class Point:
+    def __init__(self, x, y=0):
+        self.x, self.y = x, y
+
+
+def test_register_partial():
+    func = functools.partial(max, 1)
+    assert intercepts.register(func, handler) is func
+    assert func(5) == ("handled", 5)
+    assert func(3, key=lambda x: -x) == ("handled", 1)
+    intercepts.unregister(func)
+    assert func(5) == 5
+
+
+def test_register_itemgetter():
+    getter = operator.itemgetter(1)
+    intercepts.register(getter, lambda obj: _(obj) * 2)
+    assert getter("ab") == "bb"
+    intercepts.unregister(getter)
+    assert getter("ab") == "b"
+
+
+def test_register_builtin_type():
+    def make():
+        return dict(a=1)
+
+    intercepts.register(dict, handler)
+    results = [make() for _ in range(100)]
+    intercepts.unregister(dict)
+    assert results == [("handled", {"a": 1})] * 100
+    assert make() == {"a": 1}
+
+
+def test_register_class():
+    intercepts.register(Point, lambda *args, **kwargs: _(*args, **kwargs).x)
+    assert Point(1, y=2) == 1
+    intercepts.unregister(Point)
+    assert isinstance(Point(1), Point)
+
+
+def test_register_policy():
+    getter = operator.itemgetter(0)
+    intercepts.register(getter, intercepts.Return(None))
+    assert getter([1]) is None
+    intercepts.register(getter, intercepts.Raise(KeyError))
+    with pytest.raises(KeyError):
+        getter([1])
+    intercepts.register(getter, intercepts.Redirect(len))
+    assert getter([1]) == 1
+    intercepts.unregister(getter)
+    assert getter([1]) == 1
+    with pytest.raises(NotImplementedError):
+        intercepts.register(getter, intercepts.Count())
+
+
+def test_register_stacked():
+    func = functools.partial(max, 1)
+    intercepts.register(func, lambda *args: _(*args) + 1)
+    intercepts.register(func, lambda *args: _(*args) * 10)
+    assert func(2) == 30
+    intercepts.unregister(func, depth=1)
+    assert func(2) == 3
+    intercepts.unregister_all()
+    assert func(2) == 2
+
+
+def test_register_caller():
+    # partials of functions are called through their vectorcall function
+    func = functools.partial(increment)
+    # the handler calls the original through a builtin of its own, which is
+    # not affected by intercepting other builtins
+    intercepts.register(sorted, handler)
+    intercepts.register(func, lambda *args: _)
+    caller = func()
+    assert isinstance(caller, type(sorted))
+    assert caller is not sorted
+    assert caller.__name__ == "partial"
+    assert caller(5) == 6
+    assert sorted([2, 1]) == ("handled", [1, 2])
+    intercepts.unregister_all()
+    assert func(5) == 6
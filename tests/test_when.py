@@ -0,0 +1,103 @@
+import json
+import threading
+
+import pytest
+
+import intercepts
+
+
+def handler(*args, **kwargs):
+    return "handled", _(*args, **kwargs)
+
+
+def test_when_predicate():
+    intercepts.register(sorted, handler, when=lambda values, **kwargs: len(values) > 2)
+    assert sorted([2, 1]) == [1, 2]
+    assert sorted([3, 2, 1], reverse=True) == ("handled", [3, 2, 1])
+
+
+def test_when_types():
+    calls = []
+    intercepts.register(
+        json.loads, before=lambda s, **kwargs: calls.append(s), when=bytes
+    )
+    assert json.loads("[1]") == [1]
+    assert json.loads(b"[2]") == [2]
+    assert calls == [b"[2]"]
+
+
+def test_when_types_cached():
+    class Values(list):
+        pass
+
+    filtered = intercepts.register(abs, handler, when={int, list})
+    intercepts.register(len, handler, when=[list])
+    results = [abs(-1), abs(-1.5), len(Values([1])), len("a"), len(Values())]
+    intercepts.unregister_all()
+    assert results == [("handled", 1), 1.5, ("handled", 1), 1, ("handled", 0)]
+    assert filtered is abs
+
+
+def test_when_types_threads():
+    def identity(value):
+        return value
+
+    # new types are decided by several threads at once
+    classes = [type(f"Int{i}", (int,), {}) for i in range(100)]
+    classes += [type(f"Str{i}", (str,), {}) for i in range(100)]
+    errors = []
+
+    def call():
+        for cls in classes:
+            handled = isinstance(identity(cls()), tuple)
+            if handled != issubclass(cls, int):
+                errors.append(cls)
+
+    intercepts.register(identity, handler, when=int)
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+
+def test_when_no_arguments():
+    def func(*args):
+        return args
+
+    intercepts.register(func, handler, when=type(None))
+    assert func() == ("handled", ())
+    assert func(1) == (1,)
+
+
+def test_when_function_signature():
+    def add(a, b):
+        return a + b
+
+    intercepts.register(add, lambda a, b: _(a, b) * 10, when=lambda a, b: a > 0)
+    assert add.__code__.co_varnames[:2] == ("a", "b")
+    assert (add(1, 2), add(-1, 2)) == (30, 1)
+
+
+def test_when_policy():
+    intercepts.register(abs, intercepts.Return(0), when=lambda x: x < -10)
+    assert (abs(-1), abs(-11)) == (1, 0)
+
+
+def test_when_stacked():
+    intercepts.register(abs, lambda x: _(x) + 1, when=float)
+    intercepts.register(abs, lambda x: _(x) * 10, when=int)
+    assert (abs(-1), abs(-1.5)) == (10, 2.5)
+    intercepts.unregister(abs, depth=1)
+    assert (abs(-1), abs(-1.5)) == (1, 2.5)
+
+
+def test_when_errors():
+    with pytest.raises(ValueError):
+        intercepts.register(abs, handler, when=1)
+    with pytest.raises(ValueError):
+        intercepts.register(abs, handler, when=[int, 1])
+    with pytest.raises(NotImplementedError):
+        intercepts.register(abs, intercepts.Count(), when=int)
+    assert abs(-1) == 1